@@ -40,6 +40,12 @@ parser.add_argument('-d', '--disable-tweets',
                     action='store_false',
                     help="Disable tweets. Can be used for testing without Twitter "
                          "API credentials.")
+parser.add_argument('-e', '--engine',
+                    choices=('sync', 'async'),
+                    default='async',
+                    help="Main loop to run. 'async' polls and tweets independently and geocodes "
+                         "and screenshots spots concurrently. 'sync' runs the original loop, which "
+                         "pauses polling while tweeting. Defaults to async.")
 parser.add_argument('-v', '--verbose',
                     action='store_true',
                     help="Print debug messages.")
@@ -64,6 +70,7 @@ try:
                        watchlist_path=args.watchlist,
                        image_dir=args.imagedir,
                        user_agent=USER_AGENT,
-                       enable_tweets=args.disable_tweets)
+                       enable_tweets=args.disable_tweets,
+                       engine_type=args.engine)
 except KeyboardInterrupt:
     logger.critical("Exiting!")
@@ -3,20 +3,40 @@ about active aircraft Also contains code to filter valid aircraft spots based on
 asb.config and watchlist.csv """
 
 import logging
+import os
+import threading
 from time import time
 import configparser
 import csv
-import requests
 from pathlib import Path
 from collections import deque
+from collections.abc import Mapping
+from typing import Callable
+from .capture import CaptureWriter, ReplaySource
+from .httpclient import HttpClient
+from .regions import SpotRegion, RegionQuery, coalesce_regions
+from .seen import SeenCache, SqliteSeenStore
+from .sbs import DEFAULT_SBS_PORT, SbsSource
+from .sources import AircraftSource, AircraftJsonSource, FusedSource, RapidApiSource
+from .snapshot import SnapshotDiff, SnapshotTracker
+from .watchlist import WatchlistRules, diff_watchlists
+from .watchlist_cache import CsvFingerprint, load_cache, write_cache
 
 logger = logging.getLogger(__name__)
 
+# names of the Spotter attributes holding each watchlist row type
+WATCHLIST_ATTRIBUTES = ('watchlist_ia', 'watchlist_ir', 'watchlist_rn', 'watchlist_rp',
+                        'watchlist_tc', 'watchlist_tp')
+# number of changed keys listed in the INFO log message for each kind of watchlist change. The
+# full list is logged at DEBUG level.
+WATCHLIST_CHANGE_SAMPLE = 10
+
 
 class AircraftSpot:
     """
     Class for storing individual aircraft spot information fetched from ADSB exchange API. Converts
-    string data from API response into correct types and does some sanity checks.
+    string data from API response into correct types and does some sanity checks. Each field is
+    parsed once, and instances use __slots__ since wide-radius polls create many of them.
 
     Args:
             raw_aircraft: Dictionary generated from ADSBX API JSON reply, representing one aircraft
@@ -24,6 +44,10 @@ class AircraftSpot:
             ValueError: If raw strings returned by the API cannot be coerced into expected types
     """
 
+    __slots__ = ('hex_code', 'type_code', 'reg', 'grounded', 'altitude_ft', 'military',
+                 'interesting', 'coordinates', 'speed_string', 'callsign', 'description',
+                 'image_path', 'region')
+
     def __init__(self, raw_aircraft: dict[str, str]):
         self.hex_code: str = str(raw_aircraft['hex'])  # ICAO transponder hex address
         try:
@@ -34,19 +58,22 @@ class AircraftSpot:
             self.reg: str = str(raw_aircraft['r']).strip()
         except KeyError:
             self.reg: str = 'unknown'
+        self.altitude_ft: int = 0
         try:
-            if raw_aircraft['alt_baro'] == 'ground':
+            altitude = raw_aircraft['alt_baro']
+            if altitude == 'ground':
                 self.grounded: bool = True
             else:
                 self.grounded: bool = False
-                self.altitude_ft: int | None = int(raw_aircraft['alt_baro'])
+                self.altitude_ft: int = int(altitude)
         except (KeyError, ValueError):
             logger.warning(f"Could not parse altitude for aircraft w/ hex {self.hex_code}")
-            self.altitude_ft: int = 0
             self.grounded: bool = False
-        if 'dbFlags' in raw_aircraft:
-            self.military: bool = bool(int(raw_aircraft['dbFlags']) & 1)
-            self.interesting: bool = bool(int(raw_aircraft['dbFlags']) & 2)
+        db_flags = raw_aircraft.get('dbFlags')
+        if db_flags is not None:
+            db_flags = int(db_flags)
+            self.military: bool = bool(db_flags & 1)
+            self.interesting: bool = bool(db_flags & 2)
         else:
             self.military: bool = False
             self.interesting: bool = False
@@ -59,71 +86,45 @@ class AircraftSpot:
         #  true air speed and indicated air speed in that order. If none are reported, describe
         #  speed as unknown.
         for n, k in (("ground", 'gs'), ("true air", 'tas'), ("indicated air", 'ias')):
-            try:
-                self.speed_string: str = f"{n} speed {raw_aircraft[k]} kts"
+            speed = raw_aircraft.get(k)
+            if speed is not None:
+                self.speed_string: str = f"{n} speed {speed} kts"
                 break
-            except KeyError:
-                continue
         else:
             logger.warning(f"Could not parse speed for aircraft w/ hex {self.hex_code}")
             self.speed_string: str = 'speed unknown'
-        try:
-            if raw_aircraft['flight'].strip() != self.reg:
-                self.callsign: str | None = str(raw_aircraft['flight'].strip())
-            else:
-                self.callsign: str | None = None
-        except KeyError:
+        flight = raw_aircraft.get('flight')
+        if flight is not None and flight.strip() != self.reg:
+            self.callsign: str | None = str(flight.strip())
+        else:
             self.callsign: str | None = None
         self.description: str | None = None  # custom text description pulled from watchlist
         self.image_path: Path | None = None  # path to custom image file pulled from watchlist
-
-    def update_from_watchlist(self,
-                              search_key: str,
-                              watchlist: dict[str, dict[str, str]],
-                              image_dir: str):
-        """Check watchlist for custom description and image path. If present, update description
-        and image path.
-
-        Args:
-            search_key: Key used to search watchlist. Can be a registration number, ICAO hex code
-                or an ICAO type code
-            watchlist: Watchlist dictionary, consisting of keys which can be registration number,
-                ICAO hex code or an ICAO type code, and values which are dictionaries containing
-                'desc' and 'img' key/value pairs for custom descriptions and image paths.
-            image_dir: String containing relative or absolute path of image directory containing
-                images defined in watchlist.
-            """
-        if watchlist[search_key]['desc'] != '':
-            self.description = watchlist[search_key]['desc']
-        image_filename = watchlist[search_key]['img']
-        # Check if file exists at path defined by image_path, then update self.image_path
-        if image_filename != '':
-            full_path = Path(image_dir) / image_filename
-            if full_path.is_file():
-                self.image_path = full_path
-            else:
-                logger.error(f"Cannot add image to aircraft with hex {self.hex_code}. "
-                             f"No file found at {full_path}.")
+        self.region: str | None = None  # name of spotting region the aircraft was spotted in
 
 
 class Coordinates:
     """Class for storing latitude/longitude coordinates, with simple sanity checks"""
 
+    __slots__ = ('latitude', 'longitude')
+
     def __init__(self, latitude: str, longitude: str):
         try:
-            if float(latitude) > 90 or float(latitude) < -90:
+            latitude_value = float(latitude)
+            if latitude_value > 90 or latitude_value < -90:
                 raise ValueError
         except ValueError:
             raise ValueError(f"'{latitude}' is an invalid latitude value. Must "
                              f"be a float between -90 and 90.")
-        self.latitude: float = float(latitude)
+        self.latitude: float = latitude_value
         try:
-            if float(longitude) > 180 or float(longitude) < -180:
+            longitude_value = float(longitude)
+            if longitude_value > 180 or longitude_value < -180:
                 raise ValueError
         except ValueError:
             raise ValueError(f"'{longitude}' is an invalid longitude value. Must "
-                                 f"be a float between -180 and 180.")
-        self.longitude: float = float(longitude)
+                             f"be a float between -180 and 180.")
+        self.longitude: float = longitude_value
 
 
 class Spotter:
@@ -135,7 +136,9 @@ class Spotter:
                  config_parsed: configparser.ConfigParser,
                  watchlist_path: str,
                  image_dir: str,
-                 user_agent: str):
+                 user_agent: str,
+                 http_client: HttpClient | None = None,
+                 clock: Callable[[], float] | None = None):
         """
         Args:
             config_parsed: ConfigParser object, generated from the config/ini file whose path is
@@ -144,27 +147,65 @@ class Spotter:
              line argument when airspotbot is started.
             image_dir: String containing relative or absoluter path to directory of images.
             user_agent: User agent string used in API requests.
+            http_client: Optional shared HttpClient used for API requests. If not specified, the
+             Spotter creates its own.
+            clock: Optional function returning the current time in seconds since the epoch, used
+             for spot times and cooldowns. Defaults to time.time, or to the replay time when
+             replaying a capture.
         """
         self.user_agent = user_agent
+        self._http = http_client if http_client is not None else HttpClient(user_agent)
         self.watchlist_path = watchlist_path
         self.image_dir = image_dir
         self.watchlist_rn = {}
         self.watchlist_tc = {}
         self.watchlist_ia = {}
-        self.seen = {}
+        self.watchlist_ir = {}  # ICAO address ranges, keyed by e.g. AE0000-AFFFFF
+        self.watchlist_rp = {}  # registration number prefixes
+        self.watchlist_tp = {}  # type code wildcards, keyed by e.g. C13*
+        self.rules: WatchlistRules | None = None  # compiled from watchlists and spotting flags
+        self.watchlist_reload = True  # reload the watchlist when the file changes
+        self._watchlist_mtime: int | None = None
+        self._reload_thread: threading.Thread | None = None
+        # watchlists and rules rebuilt by the reload thread, waiting to be swapped in
+        self._pending_watchlist: tuple[dict[str, Mapping], WatchlistRules, list[str]] | None = \
+            None
+        self.watchlist_cache_path = ''  # compiled watchlist cache file, disabled if empty
+        self.seen = SeenCache()  # hex codes of spotted aircraft, oldest spot first
         self.adsb_interval_seconds = 60  # interval to check adsb_exchange
         self.cooldown_seconds = 3600  # cooldown interval (seconds)
         # lat/lon coordinates of center of spot radius
         self.spot_center_coordinates: Coordinates | None = None
         self.radius_nautical_miles = 1  # radius of circle to check for spots (nautical miles)
+        # spotting regions: the [ADSB] circle plus any [REGION <name>] sections, and the
+        #  coalesced ADSBx query circles that cover them
+        self.regions: list[SpotRegion] = []
+        self.region_queries: list[RegionQuery] = []
+        self.urls: list[str] = []
         self.adsb_api_key = None
         self.spot_queue: deque[AircraftSpot] = deque()
         self.spot_unknown = True  # always spot unknown reg #s
         self.spot_mil = True  # always spot mil-format serial numbers
         self.spot_interesting = True  # always spot aircraft designated "interesting"
+        # classify each poll into entered/left/updated/unchanged aircraft, and only run the
+        #  spotting rules on entered and updated ones
+        self.snapshot_diff = True
+        self.snapshot = SnapshotTracker()
+        self.last_snapshot: SnapshotDiff | None = None  # classification of the latest poll
+        self._evaluated_rules: WatchlistRules | None = None  # rules the snapshot was checked with
+        # hex codes that were in the seen list when the snapshot last evaluated them
+        self._evaluated_seen: set[str] = set()
+        # hex codes whose data could not be parsed when last evaluated, e.g. because they had no
+        #  position yet. They are evaluated on every poll until they parse.
+        self._unparsed: set[str] = set()
         self.url = ""
         self.headers = {}
+        self.source: AircraftSource | None = None  # ADSBx API or local receiver
+        self.clock: Callable[[], float] = time
+        self.capture: CaptureWriter | None = None  # records every poll, if record_capture is set
         self._validate_adsb_config(config_parsed)
+        if clock is not None:
+            self.clock = clock
         self._read_watchlist()
 
     def _validate_adsb_config(self, config_parsed: configparser.ConfigParser):
@@ -189,6 +230,14 @@ class Spotter:
             except ValueError as cooldown_error:
                 raise ValueError(
                     "cooldown must be an integer value") from cooldown_error
+            try:
+                seen_store_path = config_parsed.get('ADSB', 'seen_store').strip()
+            except configparser.NoOptionError:
+                seen_store_path = ''
+            if seen_store_path:
+                # spotted aircraft are persisted, so they are not tweeted again after a restart
+                logger.info(f"Persisting spotted aircraft to {seen_store_path}")
+                self.seen = SeenCache(store=SqliteSeenStore(seen_store_path))
             self.spot_center_coordinates = Coordinates(config_parsed.get('ADSB', 'lat'),
                                                        config_parsed.get('ADSB', 'long'))
             logger.debug(f"Set spotting coordinates to: {self.spot_center_coordinates.latitude}, "
@@ -201,19 +250,92 @@ class Spotter:
             except ValueError as radius_error:
                 raise ValueError('Error in configuration file: radius value must be an integer '
                                  'between 1 and 250') from radius_error
-            self.adsb_api_key = config_parsed.get('ADSB', 'adsb_api_key').strip()
-            logger.debug(f'Setting API key value to {self.adsb_api_key}')
-            # create url and headers for RapidAPI request
-            logger.debug("Setting api endpoint to rapidapi")
-            self.url = f"https://adsbexchange-com1.p.rapidapi.com/v2/" \
-                       f"lat/{self.spot_center_coordinates.latitude}/lon/" \
-                       f"{self.spot_center_coordinates.longitude}/dist/{self.radius_nautical_miles}/"
-            logger.debug(f"API request url: {self.url}")
-            self.headers = {
-                'User-Agent': self.user_agent,
-                'X-RapidAPI-Host': "adsbexchange-com1.p.rapidapi.com",
-                'X-RapidAPI-Key': self.adsb_api_key
-            }
+            self.regions = [SpotRegion('main',
+                                       self.spot_center_coordinates.latitude,
+                                       self.spot_center_coordinates.longitude,
+                                       self.radius_nautical_miles)]
+            self.regions.extend(self._read_extra_regions(config_parsed))
+            # several sources can be listed, separated by commas, and are fused into one
+            adsb_sources = [name.strip().lower() for name in
+                            config_parsed.get('ADSB', 'adsb_source',
+                                              fallback='rapidapi').split(',')]
+            if len(set(adsb_sources)) != len(adsb_sources):
+                raise ValueError("Bad value in config file for ADSB/adsb_source. Each source "
+                                 "can only be listed once.")
+            sources = []
+            for adsb_source in adsb_sources:
+                if adsb_source == 'aircraft_json':
+                    # aircraft are read from a local receiver and filtered by region locally, so
+                    #  no API key or query urls are needed
+                    aircraft_json = config_parsed.get('ADSB', 'aircraft_json').strip()
+                    logger.debug(f"Setting aircraft source to aircraft.json at {aircraft_json}")
+                    sources.append(AircraftJsonSource(aircraft_json, self.regions,
+                                                      http_client=self._http))
+                elif adsb_source == 'sbs':
+                    # aircraft are streamed from a local decoder's SBS-1 output and filtered by
+                    #  region locally, so no API key or query urls are needed
+                    sbs_host = config_parsed.get('ADSB', 'sbs_host',
+                                                 fallback='localhost').strip()
+                    try:
+                        sbs_port = int(config_parsed.get('ADSB', 'sbs_port',
+                                                         fallback=str(DEFAULT_SBS_PORT)))
+                        if not 0 < sbs_port < 65536:
+                            raise ValueError
+                    except ValueError as port_error:
+                        raise ValueError('Error in configuration file: sbs_port value must be an '
+                                         'integer between 1 and 65535') from port_error
+                    logger.debug(f"Setting aircraft source to SBS-1 feed at "
+                                 f"{sbs_host}:{sbs_port}")
+                    sources.append(SbsSource(sbs_host, sbs_port, self.regions))
+                elif adsb_source == 'replay':
+                    # aircraft are replayed from a capture recorded with record_capture, and the
+                    #  Spotter's clock follows the replay so cooldowns expire as they did live
+                    replay_capture = config_parsed.get('ADSB', 'replay_capture').strip()
+                    try:
+                        replay_speed = float(config_parsed.get('ADSB', 'replay_speed',
+                                                               fallback='1'))
+                        if replay_speed < 0:
+                            raise ValueError
+                    except ValueError as speed_error:
+                        raise ValueError('Error in configuration file: replay_speed value must '
+                                         'be 0 or a positive number') from speed_error
+                    logger.debug(f"Setting aircraft source to capture {replay_capture} at "
+                                 f"{replay_speed}x speed")
+                    replay_source = ReplaySource(replay_capture, replay_speed)
+                    self.clock = replay_source.now
+                    sources.append(replay_source)
+                elif adsb_source == 'rapidapi':
+                    self.adsb_api_key = config_parsed.get('ADSB', 'adsb_api_key').strip()
+                    logger.debug(f'Setting API key value to {self.adsb_api_key}')
+                    # create urls and headers for RapidAPI request. Overlapping regions are
+                    #  coalesced into as few lat/lon/dist queries as possible
+                    logger.debug("Setting api endpoint to rapidapi")
+                    self.region_queries = coalesce_regions(self.regions)
+                    self.urls = [f"https://adsbexchange-com1.p.rapidapi.com/v2/"
+                                 f"lat/{q.latitude}/lon/{q.longitude}/"
+                                 f"dist/{q.radius_nautical_miles}/"
+                                 for q in self.region_queries]
+                    self.url = self.urls[0]
+                    if len(self.regions) > 1:
+                        logger.info(f"{len(self.regions)} spotting regions are covered by "
+                                    f"{len(self.region_queries)} API queries")
+                    logger.debug(f"API request url(s): {self.urls}")
+                    self.headers = {
+                        'User-Agent': self.user_agent,
+                        'X-RapidAPI-Host': "adsbexchange-com1.p.rapidapi.com",
+                        'X-RapidAPI-Key': self.adsb_api_key
+                    }
+                    sources.append(RapidApiSource(self._http, self.region_queries, self.urls,
+                                                  self.headers))
+                else:
+                    raise ValueError("Bad value in config file for ADSB/adsb_source. Must be "
+                                     "'rapidapi', 'aircraft_json', 'sbs' or 'replay', or a comma "
+                                     "separated list of them.")
+            if len(sources) == 1:
+                self.source = sources[0]
+            else:
+                logger.info(f"Fusing aircraft from {len(sources)} sources")
+                self.source = FusedSource(sources)
             if config_parsed.get('ADSB', 'spot_unknown').lower() == 'y':
                 logger.debug('Set spot_unknown to True')
                 self.spot_unknown = True
@@ -238,17 +360,117 @@ class Spotter:
                 self.spot_interesting = False
             else:
                 raise ValueError()
+            try:
+                snapshot_diff = config_parsed.get('ADSB', 'snapshot_diff').lower()
+            except configparser.NoOptionError:
+                snapshot_diff = 'y'
+            if snapshot_diff in ('y', 'n'):
+                self.snapshot_diff = snapshot_diff == 'y'
+                logger.debug(f'Set snapshot_diff to {self.snapshot_diff}')
+            else:
+                raise ValueError("Bad value in config file for ADSB/snapshot_diff. Must be "
+                                 "'y' or 'n'.")
+            try:
+                self.watchlist_cache_path = config_parsed.get('ADSB', 'watchlist_cache').strip()
+            except configparser.NoOptionError:
+                pass
+            try:
+                record_capture = config_parsed.get('ADSB', 'record_capture').strip()
+            except configparser.NoOptionError:
+                record_capture = ''
+            if record_capture:
+                logger.info(f"Recording every poll to capture file {record_capture}")
+                self.capture = CaptureWriter(record_capture)
+            try:
+                watchlist_reload = config_parsed.get('ADSB', 'watchlist_reload').lower()
+            except configparser.NoOptionError:
+                watchlist_reload = 'y'
+            if watchlist_reload in ('y', 'n'):
+                self.watchlist_reload = watchlist_reload == 'y'
+                logger.debug(f'Set watchlist_reload to {self.watchlist_reload}')
+            else:
+                raise ValueError("Bad value in config file for ADSB/watchlist_reload. Must be "
+                                 "'y' or 'n'.")
         except (configparser.NoOptionError, configparser.NoSectionError) as config_error:
             logger.critical('Configuration file error, missing section and/or option',
                             exc_info=True)
             raise KeyboardInterrupt
 
+    @staticmethod
+    def _read_extra_regions(config_parsed: configparser.ConfigParser) -> list[SpotRegion]:
+        """
+        Read additional spotting regions from config file sections named "REGION <name>", each
+        containing lat, long and radius options with the same meaning as in the [ADSB] section.
+
+        Args:
+            config_parsed: ConfigParser object, generated from the config/ini file whose path is
+            specified when airspotbot is started.
+
+        Returns:
+            List of SpotRegion objects, empty if no region sections are present
+
+        Raises:
+            ValueError: If a region section contains an invalid lat, long or radius value
+        """
+        extra_regions = []
+        for section in config_parsed.sections():
+            if not section.upper().startswith('REGION '):
+                continue
+            region_name = section[len('REGION '):].strip()
+            region_center = Coordinates(config_parsed.get(section, 'lat'),
+                                        config_parsed.get(section, 'long'))
+            try:
+                region_radius = int(config_parsed.get(section, 'radius'))
+                if 250 < region_radius or region_radius < 1:
+                    raise ValueError
+            except ValueError as radius_error:
+                raise ValueError(f'Error in configuration file: radius value of region '
+                                 f'"{region_name}" must be an integer between 1 and '
+                                 f'250') from radius_error
+            logger.debug(f'Adding spotting region "{region_name}": {region_center.latitude}, '
+                         f'{region_center.longitude}, radius {region_radius}')
+            extra_regions.append(SpotRegion(region_name,
+                                            region_center.latitude,
+                                            region_center.longitude,
+                                            region_radius))
+        return extra_regions
+
     def _read_watchlist(self):
         """
         Load aircraft to watch from watchlist csv file at self.watchlist_path, populating
-        self.watchlist_rn, self.watchlist_tc and self.watchlist_ia dictionaries
+        self.watchlist_rn, self.watchlist_tc, self.watchlist_ia, self.watchlist_ir,
+        self.watchlist_rp and self.watchlist_tp dictionaries, then compile them with the spotting
+        flags from the config file into self.rules
+        """
+        self._watchlist_mtime = self._watchlist_file_mtime()
+        watchlists = self._parse_watchlist()
+        self._install_watchlist(watchlists, self._compile_rules(watchlists))
+
+    def _parse_watchlist(self) -> dict[str, Mapping]:
+        """
+        Read the watchlist csv file at self.watchlist_path without modifying the Spotter. If a
+        watchlist cache is configured, the compiled watchlist is mapped from the cache instead
+        when it is up-to-date, and is written to the cache after parsing the csv file otherwise.
+
+        Returns:
+            Dictionary mapping the name of each watchlist attribute (see WATCHLIST_ATTRIBUTES) to
+            its watchlist dictionary (or read-only MappedWatchlist, if loaded from the cache)
         """
+        fingerprint = None
+        if self.watchlist_cache_path:
+            try:
+                fingerprint = CsvFingerprint.of_file(self.watchlist_path)
+            except OSError:
+                pass
+        if fingerprint is not None:
+            cached_watchlists = load_cache(self.watchlist_cache_path, fingerprint)
+            if cached_watchlists is not None:
+                logger.info(f'Loading compiled watchlist from {self.watchlist_cache_path}')
+                self._log_watchlist_summary(cached_watchlists)
+                return cached_watchlists
         logger.info(f'Loading watchlist from {self.watchlist_path}')
+        watchlist_rn, watchlist_tc, watchlist_ia = {}, {}, {}
+        watchlist_ir, watchlist_rp, watchlist_tp = {}, {}, {}
         try:
             with open(self.watchlist_path) as watchlist_file:
                 csv_reader = csv.reader(watchlist_file, delimiter=',')
@@ -262,25 +484,41 @@ class Spotter:
                             # If the expected value of "Key" is present, move to the next row
                             continue
                         if row[1] == 'RN':
-                            self.watchlist_rn[row[0]] = {'desc': row[3].strip(),
-                                                         'img': row[4].strip()}
-                            logger.info(
-                                f'Added {row[0]} to reg num watchlist. Description: "{row[3]}",'
-                                f' image: {row[4]}')
+                            watchlist_rn[row[0]] = {'desc': row[3].strip(),
+                                                    'img': row[4].strip()}
                         elif row[1] == 'TC':
                             mil_only = bool(row[2].lower() == 'y')
-                            self.watchlist_tc[row[0]] = {'desc': row[3].strip(),
-                                                         'img': row[4].strip(),
-                                                         'mil_only': mil_only}
-                            logger.info(
-                                f'Added {row[0]} to type code watchlist. Military only: {mil_only} '
-                                f'Description: "{row[3]}", image: {row[4]}')
+                            watchlist_tc[row[0]] = {'desc': row[3].strip(),
+                                                    'img': row[4].strip(),
+                                                    'mil_only': mil_only}
                         elif row[1] == 'IA':
-                            self.watchlist_ia[row[0]] = {'desc': row[3].strip(),
-                                                         'img': row[4].strip()}
-                            logger.info(
-                                f'Added {row[0]} to ICAO address watchlist. Description: "{row[3]}", '
-                                f'image: {row[4]}')
+                            watchlist_ia[row[0]] = {'desc': row[3].strip(),
+                                                    'img': row[4].strip()}
+                        elif row[1] == 'IR':
+                            range_start, range_end = (int(bound, 16) for bound in
+                                                      row[0].split('-'))
+                            if not 0 <= range_start <= range_end <= 0xFFFFFF:
+                                raise ValueError
+                            watchlist_ir[row[0]] = {'desc': row[3].strip(),
+                                                    'img': row[4].strip(),
+                                                    'start': range_start,
+                                                    'end': range_end}
+                        elif row[1] == 'RP':
+                            if row[0] == '':
+                                raise ValueError
+                            watchlist_rp[row[0]] = {'desc': row[3].strip(),
+                                                    'img': row[4].strip()}
+                        elif row[1] == 'TP':
+                            # only a single trailing wildcard is supported, e.g. C13*
+                            type_prefix = row[0].removesuffix('*')
+                            if type_prefix == '' or '*' in type_prefix or \
+                                    not row[0].endswith('*'):
+                                raise ValueError
+                            mil_only = bool(row[2].lower() == 'y')
+                            watchlist_tp[row[0]] = {'desc': row[3].strip(),
+                                                    'img': row[4].strip(),
+                                                    'mil_only': mil_only,
+                                                    'prefix': type_prefix}
                         else:
                             # if none of these are true, watchlist file is likely invalid
                             # so raise an exception
@@ -291,15 +529,125 @@ class Spotter:
                                        f"please check the watchlist file. This error is usually "
                                        f"caused by missing columns in a row.")
                         continue
+                    except ValueError as watchlist_error:
+                        row_error_count += 1
+                        logger.warning(f"Invalid key {row[0]} in row {row_count} of "
+                                       f"{self.watchlist_path}. IR keys must be a range of hex "
+                                       f"addresses such as AE0000-AFFFFF, and TP keys must end "
+                                       f"with a single * wildcard such as C13*.")
+                        continue
                 if row_error_count > 0:
                     logger.warning(f"Generated {row_error_count} while reading watchlist file")
         except FileNotFoundError:
             logger.warning(f"Watchlist file not found at {self.watchlist_path}. Aircraft will "
                            f"only be spotted based on rules in asb.config.")
-        finally:
-            logger.info(
-                f'Added {len(self.watchlist_rn) + len(self.watchlist_tc) + len(self.watchlist_ia)}'
-                f' entries to the watchlist')
+        watchlists = {'watchlist_ia': watchlist_ia, 'watchlist_ir': watchlist_ir,
+                      'watchlist_rn': watchlist_rn, 'watchlist_rp': watchlist_rp,
+                      'watchlist_tc': watchlist_tc, 'watchlist_tp': watchlist_tp}
+        self._log_watchlist_summary(watchlists)
+        if fingerprint is not None:
+            try:
+                write_cache(self.watchlist_cache_path, watchlists, fingerprint)
+                logger.info(f'Wrote compiled watchlist to {self.watchlist_cache_path}')
+            except OSError:
+                logger.warning(f'Could not write compiled watchlist to '
+                               f'{self.watchlist_cache_path}', exc_info=True)
+        return watchlists
+
+    @staticmethod
+    def _log_watchlist_summary(watchlists: dict[str, Mapping]):
+        """Log the number of watchlist entries of each row type"""
+        entry_count = sum(len(watchlist) for watchlist in watchlists.values())
+        counts = ', '.join(f'{len(watchlists[attribute])} {row_type}'
+                           for row_type, attribute in (('IA', 'watchlist_ia'),
+                                                       ('IR', 'watchlist_ir'),
+                                                       ('RN', 'watchlist_rn'),
+                                                       ('RP', 'watchlist_rp'),
+                                                       ('TC', 'watchlist_tc'),
+                                                       ('TP', 'watchlist_tp')))
+        logger.info(f'Added {entry_count} entries to the watchlist ({counts})')
+
+    def _compile_rules(self, watchlists: dict[str, Mapping]) -> WatchlistRules:
+        """Compile watchlists returned by _parse_watchlist with the spotting flags, and report
+        any watchlist images missing from the image directory"""
+        rules = WatchlistRules(watchlists['watchlist_ia'], watchlists['watchlist_rn'],
+                               watchlists['watchlist_tc'], self.image_dir, self.spot_unknown,
+                               self.spot_mil, self.spot_interesting,
+                               watchlist_ir=watchlists['watchlist_ir'],
+                               watchlist_rp=watchlists['watchlist_rp'],
+                               watchlist_tp=watchlists['watchlist_tp'])
+        if rules.missing_images:
+            logger.warning(f"{len(rules.missing_images)} image file(s) named in the watchlist "
+                           f"were not found in {self.image_dir}: "
+                           f"{', '.join(sorted(rules.missing_images))}. Spots of these "
+                           f"watchlist entries will be tweeted without an image.")
+        return rules
+
+    def _install_watchlist(self, watchlists: dict[str, Mapping], rules: WatchlistRules):
+        """Replace the Spotter's watchlists and compiled rules"""
+        for attribute in WATCHLIST_ATTRIBUTES:
+            setattr(self, attribute, watchlists[attribute])
+        self.rules = rules
+
+    def _watchlist_file_mtime(self) -> int | None:
+        """Return the modification time of the watchlist file in ns, or None if it is missing"""
+        try:
+            return os.stat(self.watchlist_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _reload_watchlist(self):
+        """
+        Parse and compile the watchlist file, and work out what changed. Runs in a background
+        thread started by _check_watchlist_reload, so a large watchlist never delays a poll. The
+        result is left in self._pending_watchlist, to be swapped in and logged at the start of
+        the next check_spots cycle.
+        """
+        try:
+            watchlists = self._parse_watchlist()
+            changes = []
+            for attribute in WATCHLIST_ATTRIBUTES:
+                added, removed, changed = diff_watchlists(getattr(self, attribute),
+                                                          watchlists[attribute])
+                for label, keys in (('Added', added), ('Removed', removed),
+                                    ('Changed', changed)):
+                    if keys:
+                        summary = f"{label} {len(keys)} {attribute} entries: " \
+                                  f"{', '.join(keys[:WATCHLIST_CHANGE_SAMPLE])}"
+                        if len(keys) > WATCHLIST_CHANGE_SAMPLE:
+                            summary += f" and {len(keys) - WATCHLIST_CHANGE_SAMPLE} more"
+                        changes.append((summary, f"{label} {attribute} entries: "
+                                                 f"{', '.join(keys)}"))
+            self._pending_watchlist = (watchlists, self._compile_rules(watchlists), changes)
+        except Exception:
+            logger.error(f"Error reloading watchlist from {self.watchlist_path}, keeping the "
+                         f"current watchlist", exc_info=True)
+
+    def _check_watchlist_reload(self):
+        """
+        Called at the start of each check_spots cycle. Swaps in a watchlist rebuilt by the
+        reload thread, if one is ready, and starts a new reload if the watchlist file's
+        modification time has changed since it was last read.
+        """
+        pending = self._pending_watchlist
+        if pending is not None:
+            self._pending_watchlist = None
+            watchlists, rules, changes = pending
+            for summary, full_change in changes:
+                logger.info(summary)
+                logger.debug(full_change)
+            self._install_watchlist(watchlists, rules)
+            logger.info(f"Reloaded watchlist from {self.watchlist_path}")
+        if not self.watchlist_reload or (self._reload_thread is not None and
+                                         self._reload_thread.is_alive()):
+            return
+        mtime = self._watchlist_file_mtime()
+        if mtime != self._watchlist_mtime:
+            logger.info(f"Watchlist file {self.watchlist_path} has changed, reloading")
+            self._watchlist_mtime = mtime
+            self._reload_thread = threading.Thread(target=self._reload_watchlist,
+                                                   name='watchlist-reload', daemon=True)
+            self._reload_thread.start()
 
     def _append_craft(self, spotted_aircraft: AircraftSpot):
         """
@@ -313,7 +661,7 @@ class Spotter:
             hex_code = spotted_aircraft.hex_code
             logger.info(f'Aircraft added to queue. ICAO #: {hex_code}')
             self.spot_queue.append(spotted_aircraft)
-            self.seen[hex_code] = time()
+            self.seen[hex_code] = self.clock()
         except ValueError:
             logger.warning("Error adding aircraft to queue. Value could not be coerced to expected"
                            "type.", exc_info=True)
@@ -321,15 +669,77 @@ class Spotter:
     def _check_seen(self):
         """
         Before checking for new spots, this function is run to remove aircraft from the self.seen
-        dictionary, so aircraft that loiter longer than the cooldown time will generate new tweets
+        cache, so aircraft that loiter longer than the cooldown time will generate new tweets.
+        Only entries whose cooldown has expired are examined.
+        """
+        for seen_id in self.seen.expire(self.clock() - self.cooldown_seconds):
+            logger.debug(f'Removing {seen_id} from seen list, cooldown time exceeded')
+        logger.debug(f'{len(self.seen)} aircraft in seen list, '
+                     f'{self.seen.evictions} removed since startup')
+
+    def _may_qualify(self, raw_aircraft: dict) -> bool:
+        """
+        Cheap pre-filter applied to raw aircraft data before an AircraftSpot is created. Reads
+        only the hex, r, t, dbFlags and alt_baro keys and applies the same compiled rules as
+        check_spots, so aircraft that are already seen, grounded or match no spotting rule are
+        rejected without being fully parsed.
+
+        Args:
+            raw_aircraft: Dictionary generated from ADSBX API JSON reply, representing one aircraft
+
+        Returns:
+            False if the aircraft cannot meet the spotting criteria, True if it may. Malformed
+            data returns True, so that the full parse can report it.
+        """
+        hex_code = raw_aircraft.get('hex')
+        if hex_code is None:
+            return True
+        hex_code = str(hex_code)
+        if hex_code in self.seen or raw_aircraft.get('alt_baro') == 'ground':
+            return False
+        reg = raw_aircraft.get('r')
+        reg = str(reg).strip() if reg is not None else 'unknown'
+        type_code = raw_aircraft.get('t')
+        type_code = str(type_code).strip() if type_code is not None else 'Unknown aircraft type'
+        try:
+            db_flags = int(raw_aircraft.get('dbFlags', 0))
+        except (TypeError, ValueError):
+            return True
+        return self.rules.match(hex_code, reg, type_code,
+                                bool(db_flags & 1), bool(db_flags & 2)) is not None
+
+    def _changed_aircraft(self, aircraft_nearby: list[tuple[dict, str | None]]) \
+            -> list[tuple[dict, str | None]]:
+        """
+        Classify a poll against the previous one with self.snapshot, and return the aircraft
+        that need to go through the spotting rules: aircraft that entered or changed, unchanged
+        aircraft that have left the seen list since they were last evaluated (e.g. because their
+        cooldown expired), unchanged aircraft whose data could not be parsed last time, or every
+        aircraft if the watchlist was reloaded.
+
+        Args:
+            aircraft_nearby: List of (raw aircraft dictionary, region name) tuples
+
+        Returns:
+            List of the (raw aircraft dictionary, region name) tuples to evaluate
         """
-        del_list = []
-        for seen_id, seen_time_seconds in self.seen.items():
-            if seen_time_seconds < time() - self.cooldown_seconds:
-                logger.debug(f'Removing {seen_id} from seen list, cooldown time exceeded')
-                del_list.append(seen_id)
-        for item_to_delete in del_list:
-            del self.seen[item_to_delete]
+        diff = self.snapshot.update(aircraft_nearby)
+        self.last_snapshot = diff
+        self._evaluated_seen.difference_update(diff.left)
+        self._unparsed.difference_update(diff.left)
+        if self.rules is not self._evaluated_rules:
+            self._evaluated_rules = self.rules
+            return aircraft_nearby
+        skipped = {raw_aircraft['hex'] for raw_aircraft, _ in diff.unchanged
+                   if raw_aircraft['hex'] not in self._unparsed
+                   and (raw_aircraft['hex'] not in self._evaluated_seen
+                        or raw_aircraft['hex'] in self.seen)}
+        # keep the order of the API response
+        changed = [(raw_aircraft, region_name) for raw_aircraft, region_name in aircraft_nearby
+                   if raw_aircraft.get('hex') not in skipped]
+        logger.debug(f"{len(changed)} of {len(aircraft_nearby)} aircraft entered or changed "
+                     f"since the last poll")
+        return changed
 
     def check_spots(self):
         """
@@ -337,36 +747,34 @@ class Spotter:
         and configurable global spotting rules (such as military or unknown reg. no.).
         Aircraft that meet spotting criteria are passed to self._append_craft function.
         """
-        logger.info(
-            f'Checking for aircraft via ADSBX API (endpoint: RapidAPI)')
-        try:
-            response = requests.request("GET", self.url, headers=self.headers,
-                                        timeout=4)
-            response.raise_for_status()
-            logger.debug(f'ADSBX API request successful, response took '
-                         f'{response.elapsed.total_seconds():0.3f} seconds')
-            aircraft_nearby = response.json()['ac']
-            if aircraft_nearby is None:
-                # prevent an empty list of spots from creating a TypeError in the next for loop
-                logger.info('No aircraft detected in spotting area')
-                aircraft_nearby = []
-            else:
-                logger.info(f'API returned {len(aircraft_nearby)} aircraft in spotting area')
-        except (requests.exceptions.HTTPError, requests.exceptions.Timeout,
-                AttributeError) as err:
-            logger.error('Error with ADSB Exchange API request', exc_info=True)
-            aircraft_nearby = []
+        self._check_watchlist_reload()
+        aircraft_nearby = self.source.fetch()
+        if self.capture is not None:
+            self.capture.write(self.clock(), aircraft_nearby)
         self._check_seen()  # clear off aircraft from the seen list if cooldown on them has expired
-        for raw_aircraft in aircraft_nearby:
+        total_count = len(aircraft_nearby)
+        if self.snapshot_diff:
+            aircraft_nearby = self._changed_aircraft(aircraft_nearby)
+        candidate_count = 0
+        for raw_aircraft, region_name in aircraft_nearby:
+            # skip the full parse of aircraft that cannot possibly meet the spotting criteria
+            if not self._may_qualify(raw_aircraft):
+                continue
+            candidate_count += 1
             try:
                 logger.debug(
                     f'Received ADSBX data for aircraft w/ hex code {raw_aircraft["hex"]}. '
                     f'Full data: {raw_aircraft}')
                 # Attempt to process raw API response into sanitized AircraftSpot
                 aircraft = AircraftSpot(raw_aircraft)
+                aircraft.region = region_name
             except (ValueError, KeyError):
-                logger.error(f"Error processing raw aircraft data, skipping. Raw data: {raw_aircraft}", exc_info=True)
+                logger.error(f"Error processing raw aircraft data, skipping. Raw data: "
+                             f"{raw_aircraft}", exc_info=True)
+                if raw_aircraft.get('hex') is not None:
+                    self._unparsed.add(raw_aircraft['hex'])
                 continue
+            self._unparsed.discard(aircraft.hex_code)
             # Once an instance of AircraftSpot is successfully created, run through spotting logic
             #  to see if it should be added to the tweet queue
             if aircraft.hex_code in self.seen:
@@ -376,56 +784,32 @@ class Spotter:
             if aircraft.grounded:
                 logger.debug(f'{aircraft.hex_code} is grounded, skipping')
                 continue
-            if aircraft.hex_code in self.watchlist_ia:
-                # if the aircraft's ICAO address is on the watchlist, add it to the queue
-                logger.debug(f'{aircraft.hex_code} in watchlist, adding to spot queue')
-                aircraft.update_from_watchlist(aircraft.hex_code, self.watchlist_ia, self.image_dir)
-                self._append_craft(aircraft)
-            elif aircraft.reg in self.watchlist_rn:
-                # if the aircraft's registration number is on the watchlist, add it to the queue
-                logger.debug(f'{aircraft.reg} in watchlist, adding to spot queue')
-                aircraft.update_from_watchlist(aircraft.reg, self.watchlist_rn, self.image_dir)
-                self._append_craft(aircraft)
-            elif aircraft.type_code in self.watchlist_tc:
-                if self.watchlist_tc[aircraft.type_code]['mil_only'] is True and aircraft.military:
-                    logger.debug(
-                        f'{aircraft.type_code} in watchlist as military-only and this one is '
-                        f'military, adding to spot queue')
-                    aircraft.update_from_watchlist(aircraft.type_code,
-                                                   self.watchlist_tc,
-                                                   self.image_dir)
-                    self._append_craft(aircraft)
-                elif self.watchlist_tc[aircraft.type_code]['mil_only'] is True and \
-                        not aircraft.military:
-                    logger.debug(
-                        f'{aircraft.type_code} in watchlist as military-only, but this one isn\'t '
-                        f'military, not adding to spot queue')
-                    continue
-                else:
-                    logger.debug(
-                        f'{aircraft.type_code} in watchlist, adding to spot queue')
-                    aircraft.update_from_watchlist(aircraft.type_code,
-                                                   self.watchlist_tc,
-                                                   self.image_dir)
-                    self._append_craft(aircraft)
-            elif aircraft.reg == 'unknown' and self.spot_unknown is True:
-                # if there's no registration number and spot_unknown is set, add to tweet queue
-                logger.info('Unknown registration number, adding to spot queue')
-                self._append_craft(aircraft)
-            elif aircraft.military and self.spot_mil is True:
-                # if craft is designated military by ADS-B exchange and spot_mil is set,
-                # add to tweet queue
-                logger.debug(
-                    "Aircraft is designated as military, adding to spot queue")
-                self._append_craft(aircraft)
-            elif aircraft.interesting and self.spot_interesting is True:
-                # if craft is designated military by ADS-B exchange and spot_mil is set,
-                # add to tweet queue
-                logger.debug(
-                    "Aircraft is designated as interesting, adding to spot queue")
-                self._append_craft(aircraft)
-            else:
-                # if none of these criteria are met, iterate to next aircraft in the list
+            rule_match = self.rules.match(aircraft.hex_code, aircraft.reg, aircraft.type_code,
+                                          aircraft.military, aircraft.interesting)
+            if rule_match is None:
+                # if none of the spotting rules match, iterate to next aircraft in the list
                 logger.debug(
                     f"{aircraft.hex_code} did not meet any spotting criteria, not added to queue")
                 continue
+            logger.debug(f"{aircraft.hex_code} matched rule: {rule_match.reason}, adding to spot "
+                         f"queue")
+            rule_match.apply_to(aircraft)
+            self._append_craft(aircraft)
+        if self.snapshot_diff:
+            for raw_aircraft, _ in aircraft_nearby:
+                hex_code = raw_aircraft.get('hex')
+                if hex_code in self.seen:
+                    self._evaluated_seen.add(hex_code)
+                else:
+                    self._evaluated_seen.discard(hex_code)
+        logger.debug(f"{candidate_count} of {total_count} aircraft passed the spotting pre-filter")
+        # write this cycle's changes to the seen list to disk in one batch, if persistence is
+        # enabled
+        self.seen.flush()
+
+    def close(self):
+        """Close the aircraft source and the capture file, if recording. Called when the bot
+        shuts down."""
+        self.source.close()
+        if self.capture is not None:
+            self.capture.close()
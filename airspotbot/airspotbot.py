@@ -4,11 +4,14 @@ airspotbot's tweets. It also has the main program loop of airspotbot, so executi
 starts airspotbot.
 """
 
+import asyncio
 import configparser
 import logging
 from time import sleep, time
 import tweepy
-from . import adsbget, location, screenshot
+from . import adsbget, engine, location, screenshot
+from .httpclient import HttpClient
+from .sources import STREAMING_MIN_POLL_SECONDS
 import os.path as path
 from io import BytesIO
 from pathlib import Path
@@ -36,12 +39,14 @@ class SpotBot:
     def __init__(self,
                  config_parsed: configparser.ConfigParser,
                  user_agent: str,
-                 enable_tweets: bool):
+                 enable_tweets: bool,
+                 http_client: HttpClient | None = None):
         """
         Args:
             config_parsed: ConfigParser object, generated from the config/ini file whose path is
              specified as a command line argument when airspotbot is started.
             user_agent: User agent string used in API requests
+            http_client: Optional shared HttpClient, passed to the Locator for geocoding requests
         """
         self.user_agent = user_agent
         self.tweet_interval_seconds = 5
@@ -61,7 +66,9 @@ class SpotBot:
             logger.warning("Tweeting is disabled, did not create Twitter API connection")
         if self.enable_screenshot:
             self.screenshotter = screenshot.Screenshotter(self.zoom_level)
-        self._loc = location.Locator(config_parsed=config_parsed, user_agent=self.user_agent)
+        self._loc = location.Locator(config_parsed=config_parsed,
+                                     user_agent=self.user_agent,
+                                     http_client=http_client)
 
     def _read_logging_config(self, config_parsed: configparser.ConfigParser):
         """
@@ -186,48 +193,85 @@ class SpotBot:
             logger.critical('Configuration file error', exc_info=True)
             raise KeyboardInterrupt
 
-    def tweet_spot(self, aircraft: adsbget.AircraftSpot):
+    def describe_location(self, aircraft: adsbget.AircraftSpot) -> str:
         """
-        Generate tweet based on aircraft data returned in dictionary format from the adsbget
-        module's Spotter.spot_queue list of dictionaries.
+        Generate the location description for an aircraft spot using the Locator. Depending on
+        the location type this may involve a reverse geocoding request.
 
         Args:
             aircraft: adsbget.AircraftSpot object generated from ADSBX API JSON reply,
             representing one aircraft
 
-        Raises:
-            KeyboardInterrupt: Exits the main application loop if there is an error when sending
-            a tweet or interacting with the Twitter API
+        Returns:
+            String containing the location description
+        """
+        return self._loc.get_location_description(str(aircraft.coordinates.latitude),
+                                                  str(aircraft.coordinates.longitude))
+
+    def capture_screenshot(self, hex_code: str) -> bytes | None:
+        """
+        Capture a screenshot of the aircraft on globe.adsbexchange.com, if screenshots and tweets
+        are both enabled.
+
+        Args:
+            hex_code: ICAO hex address of the aircraft
+
+        Returns:
+            PNG screenshot as binary data, or None if no screenshot was captured
+        """
+        if not (self._enable_tweets and self.enable_screenshot):
+            return None
+        return self.screenshotter.get_globe_screenshot(hex_code)
+
+    @staticmethod
+    def compose_tweet(aircraft: adsbget.AircraftSpot, location_description: str) -> str | None:
+        """
+        Generate tweet text for an aircraft spot.
+
+        Args:
+            aircraft: adsbget.AircraftSpot object generated from ADSBX API JSON reply,
+            representing one aircraft
+            location_description: String describing the location of the aircraft
+
+        Returns:
+            Tweet text, or None if the generated text is too long to tweet
         """
         hex_code: str = aircraft.hex_code
         type_code: str = aircraft.type_code
         reg_num: str = aircraft.reg
-        latitude_degrees: float = aircraft.coordinates.latitude
-        longitude_degrees: float = aircraft.coordinates.longitude
         description: str | None = aircraft.description
         altitude_feet: int = aircraft.altitude_ft
         speed: str = aircraft.speed_string
         callsign: str | None = aircraft.callsign
-        image_path: Path | None = aircraft.image_path
         link = f'https://globe.adsbexchange.com/?icao={hex_code}'
-        location_description = self._loc.get_location_description(str(latitude_degrees),
-                                                                  str(longitude_degrees))
         tweet = f"{description if description else type_code}" \
                 f"{', callsign ' + callsign if callsign else ''}, hex ID {hex_code.upper()}, RN {reg_num}, is " \
                 f"{location_description}. Altitude {altitude_feet} ft, {speed}. {link}"
         logger.info(f"Generated tweet text: {tweet}")
         if len(tweet) <= 280:
-            valid_tweet = True
-        else:
-            logger.error(f"Tweet is too long: {len(tweet)}/280 characters. Skipping!")
-            valid_tweet = False
-        if self._enable_tweets and valid_tweet:
+            return tweet
+        logger.error(f"Tweet is too long: {len(tweet)}/280 characters. Skipping!")
+        return None
+
+    def publish(self,
+                aircraft: adsbget.AircraftSpot,
+                tweet: str | None,
+                screenshot_binary: bytes | None):
+        """
+        Upload media and send a tweet that was generated by compose_tweet.
+
+        Args:
+            aircraft: adsbget.AircraftSpot object the tweet was generated for
+            tweet: Tweet text, or None if the tweet could not be generated
+            screenshot_binary: PNG screenshot as binary data, or None if there is no screenshot
+        """
+        image_path: Path | None = aircraft.image_path
+        if self._enable_tweets and tweet is not None:
             uploaded_media_ids = []
-            # generate and upload screenshot image
+            # upload screenshot image
             if self.enable_screenshot:
                 # initialize a binary stream to write then read the png screenshot, all in memory
                 with BytesIO() as b:
-                    screenshot_binary = self.screenshotter.get_globe_screenshot(hex_code)
                     if screenshot_binary:
                         b.write(screenshot_binary)
                         b.seek(0)  # set byte stream position to the start
@@ -268,12 +312,31 @@ class SpotBot:
                 self._client = self._initialize_twitter_api()
                 self._v1_api = self._initialize_twitter_api_v1()
 
+    def tweet_spot(self, aircraft: adsbget.AircraftSpot):
+        """
+        Generate tweet based on aircraft data returned in dictionary format from the adsbget
+        module's Spotter.spot_queue list of dictionaries.
+
+        Args:
+            aircraft: adsbget.AircraftSpot object generated from ADSBX API JSON reply,
+            representing one aircraft
+
+        Raises:
+            KeyboardInterrupt: Exits the main application loop if there is an error when sending
+            a tweet or interacting with the Twitter API
+        """
+        location_description = self.describe_location(aircraft)
+        tweet = self.compose_tweet(aircraft, location_description)
+        screenshot_binary = self.capture_screenshot(aircraft.hex_code) if tweet else None
+        self.publish(aircraft, tweet, screenshot_binary)
+
 
 def run_bot(config_path: str,
             watchlist_path: str,
             image_dir: str,
             user_agent: str,
-            enable_tweets: bool):
+            enable_tweets: bool,
+            engine_type: str = 'async'):
     """
     Main program loop of airspotbot. Handles initial configuration and instantiation of
      config, SpotBot and Spotter objects. After this, runs an infinite loop for checking ADSBX API
@@ -286,37 +349,58 @@ def run_bot(config_path: str,
         user_agent: User agent string used in API requests
         enable_tweets: Boolean, if True enables Twitter authentication and creation of tweets.
           Otherwise, tweet text will only be printed to the log.
+        engine_type: "async" runs the asyncio engine from engine.py, which polls and tweets as
+          independent stages. "sync" runs the synchronous main loop below, which does not poll
+          while it is working through the tweet queue.
     """
 
     config = read_config(config_path)
+    # one pooled HTTP client is shared by all modules, so connections to each API host are reused
+    http_client = HttpClient(user_agent=user_agent, config_parsed=config)
     bot = SpotBot(config_parsed=config,
                   user_agent=user_agent,
-                  enable_tweets=enable_tweets)
+                  enable_tweets=enable_tweets,
+                  http_client=http_client)
     spots = adsbget.Spotter(config_parsed=config,
                             watchlist_path=watchlist_path,
                             image_dir=image_dir,
-                            user_agent=user_agent)
-    bot_time_seconds = time()
-    spot_time_seconds = time()
-    # set startup boolean to immediately check for aircraft and tweet when bot first starts
-    startup = True
-    # perpetually loop through checking aircraft spots and tweeting according to interval in config
-    while True:
-        if time() > spot_time_seconds + spots.adsb_interval_seconds or startup:
-            startup = False
-            spots.check_spots()
-            spot_time_seconds = time()
-            logger.info(f"{len(spots.spot_queue)} spots in tweet queue.")
-            first_spot_in_queue = True
-            while spots.spot_queue:
-                if not first_spot_in_queue:
-                    logger.debug(f"Waiting {bot.tweet_interval_seconds} before next tweet")
-                    sleep(bot.tweet_interval_seconds)
-                spot = spots.spot_queue.popleft()
-                bot.tweet_spot(spot)
-                first_spot_in_queue = False
-        else:
-            sleep(0.2)
+                            user_agent=user_agent,
+                            http_client=http_client)
+    try:
+        if engine_type == 'async':
+            logger.info("Starting asyncio engine")
+            asyncio.run(engine.AsyncSpotEngine(bot, spots, config).run())
+            return
+        bot_time_seconds = time()
+        spot_time_seconds = time()
+        # set startup boolean to immediately check for aircraft and tweet when bot first starts
+        startup = True
+        update_ready = False
+        # perpetually loop through checking aircraft spots and tweeting according to interval in
+        #  config
+        while True:
+            if time() > spot_time_seconds + spots.adsb_interval_seconds or startup or \
+                    (update_ready and time() > spot_time_seconds + STREAMING_MIN_POLL_SECONDS):
+                startup = False
+                update_ready = False
+                spots.check_spots()
+                spot_time_seconds = time()
+                logger.info(f"{len(spots.spot_queue)} spots in tweet queue.")
+                first_spot_in_queue = True
+                while spots.spot_queue:
+                    if not first_spot_in_queue:
+                        logger.debug(f"Waiting {bot.tweet_interval_seconds} before next tweet")
+                        sleep(bot.tweet_interval_seconds)
+                    spot = spots.spot_queue.popleft()
+                    bot.tweet_spot(spot)
+                    first_spot_in_queue = False
+            else:
+                # streaming sources return early when a new aircraft appears, so it is checked
+                #  without waiting for the rest of adsb_interval
+                update_ready = spots.source.wait_for_update(0.2) or update_ready
+    finally:
+        # close the capture file, if recording, so its last record is complete
+        spots.close()
 
 
 def read_config(config_path: str) -> configparser.ConfigParser:
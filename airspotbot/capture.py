@@ -0,0 +1,227 @@
+"""
+This module contains the record-and-replay capture format of airspotbot. In record mode, the
+Spotter appends the aircraft returned by its source on every poll to a capture file, and
+ReplaySource feeds a capture back through a Spotter, at the original speed, N times faster or one
+poll at a time. This reproduces the exact sequence of polls behind a production incident, and
+lets a full day of traffic be run through the spotting rules in seconds without network access.
+
+A capture file starts with CAPTURE_MAGIC, followed by one record per poll:
+
+    timestamp (float64, seconds since the epoch) | compressed length (uint32) | payload
+
+both little-endian, where the payload is the poll's list of [raw aircraft dictionary, region name]
+pairs as UTF-8 JSON, compressed on its own with zlib. Every record is complete as soon as it is
+written, so a bot that is killed loses at most the record it was writing. A record cut short this
+way is removed when the next recording session opens the file, before new records are appended.
+"""
+
+import json
+import logging
+import os
+import struct
+import zlib
+from time import time
+from typing import Callable, Iterator
+
+from .sources import AircraftSource
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_MAGIC = b'ASBCAP\x02\n'
+_RECORD_HEADER = struct.Struct('<dI')
+# captures are written continuously, so favour speed over the last few percent of compression
+CAPTURE_COMPRESSLEVEL = 6
+
+
+class CaptureWriter:
+    """
+    Appends polls to a capture file.
+
+    simple usage example:
+
+    capture = CaptureWriter('captures/polls.asbcap')
+    capture.write(time(), aircraft_nearby)
+    capture.close()
+    """
+
+    def __init__(self, capture_path: str):
+        """
+        Args:
+            capture_path: Path of the capture file. Created if it does not exist, otherwise new
+                records are appended to it.
+
+        Raises:
+            ValueError: If the file exists and is not a capture file
+        """
+        self.capture_path = capture_path
+        self.record_count = 0
+        new_file = not os.path.exists(capture_path) or os.path.getsize(capture_path) == 0
+        self._file = open(capture_path, 'w+b' if new_file else 'r+b')
+        if new_file:
+            self._file.write(CAPTURE_MAGIC)
+        else:
+            try:
+                self._truncate_incomplete_record()
+            except ValueError:
+                self._file.close()
+                raise
+        self._encoder = json.JSONEncoder(separators=(',', ':'))
+
+    def _truncate_incomplete_record(self):
+        """Check the magic of an existing file, and remove a record left incomplete by a
+        previous session that was killed while writing it, so new records follow the last
+        complete one. Only the record headers are read."""
+        file_size = self._file.seek(0, os.SEEK_END)
+        self._file.seek(0)
+        if self._file.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            raise ValueError(f"{self.capture_path} is not an airspotbot capture file")
+        position = len(CAPTURE_MAGIC)
+        while position + _RECORD_HEADER.size <= file_size:
+            self._file.seek(position)
+            _, length = _RECORD_HEADER.unpack(self._file.read(_RECORD_HEADER.size))
+            if position + _RECORD_HEADER.size + length > file_size:
+                break
+            position += _RECORD_HEADER.size + length
+        if position < file_size:
+            logger.warning(f"Capture file {self.capture_path} ends with an incomplete record, "
+                           f"removing it")
+            self._file.truncate(position)
+        self._file.seek(position)
+
+    def write(self, timestamp: float, aircraft_nearby: list[tuple[dict, str | None]]):
+        """
+        Append one poll to the capture. The record is written and flushed in one piece, so a
+        crash loses at most the record being written.
+
+        Args:
+            timestamp: Time of the poll, in seconds since the epoch
+            aircraft_nearby: List of (raw aircraft dictionary, region name) tuples, as returned
+                by AircraftSource.fetch
+        """
+        payload = zlib.compress(self._encoder.encode(aircraft_nearby).encode(),
+                                CAPTURE_COMPRESSLEVEL)
+        self._file.write(_RECORD_HEADER.pack(timestamp, len(payload)) + payload)
+        self._file.flush()
+        self.record_count += 1
+
+    def close(self):
+        self._file.close()
+
+
+def read_capture(capture_path: str) -> Iterator[tuple[float, list[tuple[dict, str | None]]]]:
+    """
+    Read the polls in a capture file, one at a time.
+
+    Args:
+        capture_path: Path of the capture file
+
+    Yields:
+        (timestamp, aircraft_nearby) of each recorded poll, in the order they were recorded
+
+    Raises:
+        ValueError: If the file is not a capture file
+    """
+    with open(capture_path, 'rb') as capture_file:
+        if capture_file.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            raise ValueError(f"{capture_path} is not an airspotbot capture file")
+        while True:
+            header = capture_file.read(_RECORD_HEADER.size)
+            if not header:
+                return
+            try:
+                timestamp, length = _RECORD_HEADER.unpack(header)
+                payload = capture_file.read(length)
+                if len(payload) < length:
+                    raise EOFError
+                aircraft_nearby = json.loads(zlib.decompress(payload))
+            except (EOFError, struct.error, zlib.error, ValueError):
+                logger.warning(f"Capture file {capture_path} ends with an incomplete or damaged "
+                               f"record, ignoring it")
+                return
+            yield timestamp, [(raw_aircraft, region_name)
+                              for raw_aircraft, region_name in aircraft_nearby]
+
+
+class ReplaySource(AircraftSource):
+    """
+    Aircraft source replaying a capture file.
+
+    With a speed of 0, every fetch returns the next recorded poll, so the capture can be run
+    through a Spotter as fast as it can process it. With a positive speed, replay time runs that
+    many times faster than the wall clock from the first fetch, and every fetch returns the
+    latest poll recorded at or before the current replay time, as a live source would.
+
+    The source is also the Spotter's clock during replay: now() returns the replay time, so
+    cooldowns expire as they did when the capture was recorded.
+    """
+
+    def __init__(self, capture_path: str, speed: float = 1.0,
+                 wall_clock: Callable[[], float] = time):
+        """
+        Args:
+            capture_path: Path of the capture file
+            speed: Replay speed relative to real time, or 0 to replay one poll per fetch
+            wall_clock: Function returning the current time in seconds, used to pace the replay
+
+        Raises:
+            ValueError: If the speed is negative or the file is not a capture file
+        """
+        if speed < 0:
+            raise ValueError("Replay speed must be 0 or a positive number")
+        self.capture_path = capture_path
+        self.description = f'capture {capture_path}'
+        self.speed = speed
+        self.wall_clock = wall_clock
+        self.finished = False
+        self.replayed_count = 0
+        self._records = read_capture(capture_path)
+        self._next_record: tuple[float, list] | None = None
+        self._current_time: float | None = None
+        self._aircraft: list[tuple[dict, str | None]] = []
+        self._start: tuple[float, float] | None = None  # wall clock and capture time at start
+        self._peek()  # read the first record now, so an invalid capture file fails early
+
+    def now(self) -> float:
+        """Current replay time, in seconds since the epoch"""
+        if self._current_time is None:
+            self._peek()
+            if self._next_record is None:
+                return self.wall_clock()
+            return self._next_record[0]
+        return self._current_time
+
+    def _peek(self) -> tuple[float, list] | None:
+        """Return the next record without consuming it, or None at the end of the capture"""
+        if self._next_record is None and not self.finished:
+            self._next_record = next(self._records, None)
+            if self._next_record is None:
+                self.finished = True
+                logger.info(f"Finished replaying {self.replayed_count} polls from "
+                            f"{self.capture_path}")
+        return self._next_record
+
+    def _consume(self):
+        self._current_time, self._aircraft = self._next_record
+        self.snapshot_time = self._current_time
+        self._next_record = None
+        self.replayed_count += 1
+
+    def fetch(self) -> list[tuple[dict, str | None]]:
+        if self.speed == 0:
+            if self._peek() is None:
+                return []
+            self._consume()
+            return self._aircraft
+        if self._start is None:
+            if self._peek() is None:
+                return []
+            self._start = (self.wall_clock(), self._next_record[0])
+        start_wall, start_capture = self._start
+        replay_time = start_capture + (self.wall_clock() - start_wall) * self.speed
+        replayed_count = self.replayed_count
+        while self._peek() is not None and self._next_record[0] <= replay_time:
+            self._consume()
+        self._current_time = replay_time
+        if self.finished and self.replayed_count == replayed_count:
+            return []
+        return self._aircraft
@@ -0,0 +1,234 @@
+"""
+This module contains the asyncio polling engine of airspotbot, an alternative to the synchronous
+main loop in airspotbot.run_bot. Polling and publishing run as independent pipeline stages:
+
+    poll (every adsb_interval) -> bounded spot queue -> enrich (geocode + screenshot,
+    concurrently) -> publish (one tweet per tweet_interval)
+
+so a large publish backlog never delays the next ADSBx poll, and a slow geocoder or Selenium call
+no longer holds up the whole pipeline. Polls are scheduled at fixed times so the polling cadence
+does not drift.
+
+Blocking calls (requests, Selenium, tweepy) are run in worker threads. Geocoding concurrency and
+the size of the spot queue can be set in the optional [ENGINE] section of the config file.
+Screenshots are always captured one at a time since they share a single browser instance.
+"""
+
+import asyncio
+import configparser
+import logging
+from typing import TYPE_CHECKING
+
+from . import adsbget
+from .sources import STREAMING_MIN_POLL_SECONDS
+
+if TYPE_CHECKING:
+    from .airspotbot import SpotBot
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_QUEUE_SIZE = 50
+
+
+class AsyncSpotEngine:
+    """
+    Runs airspotbot's main loop on an asyncio event loop.
+
+    simple usage example:
+
+    engine = AsyncSpotEngine(bot, spots, some_configparser_object)
+    asyncio.run(engine.run())
+    """
+
+    def __init__(self,
+                 bot: "SpotBot",
+                 spots: adsbget.Spotter,
+                 config_parsed: configparser.ConfigParser | None = None):
+        """
+        Args:
+            bot: SpotBot object used to geocode, screenshot and tweet spots
+            spots: Spotter object used to poll the ADSBx API
+            config_parsed: Optional ConfigParser object. If it contains an [ENGINE] section,
+             engine options are read from it.
+        """
+        self.bot = bot
+        self.spots = spots
+        self.max_concurrency = DEFAULT_MAX_CONCURRENCY
+        self.queue_size = DEFAULT_QUEUE_SIZE
+        # queues and semaphores are created in run(), as they must belong to the running loop
+        self._enrich_semaphore: asyncio.Semaphore | None = None
+        self._screenshot_semaphore: asyncio.Semaphore | None = None
+        # spots waiting to be enriched
+        self._spot_queue: asyncio.Queue | None = None
+        # enrichment tasks waiting to be published, in the order the spots were queued
+        self._publish_queue: asyncio.Queue | None = None
+        self._last_publish_time: float | None = None
+        if config_parsed is not None:
+            self._read_engine_config(config_parsed)
+
+    def _read_engine_config(self, config_parsed: configparser.ConfigParser):
+        """
+        Read options from the optional [ENGINE] section of the config file.
+
+        Args:
+            config_parsed: ConfigParser object, generated from the config/ini file whose path is
+             specified as a command line argument when airspotbot is started.
+
+        Raises:
+            ValueError: If max_concurrency or queue_size is not a positive integer
+        """
+        for option in ('max_concurrency', 'queue_size'):
+            try:
+                value = int(config_parsed.get('ENGINE', option))
+                if value < 1:
+                    raise ValueError
+                setattr(self, option, value)
+            except (configparser.NoOptionError, configparser.NoSectionError):
+                pass
+            except ValueError as engine_error:
+                raise ValueError(f"Bad value in config file for ENGINE/{option}. Must be a "
+                                 f"positive integer.") from engine_error
+        logger.debug(f"Async engine max concurrency set to {self.max_concurrency}, spot queue "
+                     f"size set to {self.queue_size}")
+
+    async def _poll(self) -> list[adsbget.AircraftSpot]:
+        """Run one ADSBx poll in a worker thread and return the newly queued spots"""
+        await asyncio.to_thread(self.spots.check_spots)
+        new_spots = list(self.spots.spot_queue)
+        self.spots.spot_queue.clear()
+        logger.info(f"{len(new_spots)} spots in tweet queue.")
+        return new_spots
+
+    async def _describe_location(self, aircraft: adsbget.AircraftSpot) -> str:
+        async with self._enrich_semaphore:
+            return await asyncio.to_thread(self.bot.describe_location, aircraft)
+
+    async def _capture_screenshot(self, aircraft: adsbget.AircraftSpot) -> bytes | None:
+        async with self._screenshot_semaphore:
+            return await asyncio.to_thread(self.bot.capture_screenshot, aircraft.hex_code)
+
+    async def _enrich(self, aircraft: adsbget.AircraftSpot) \
+            -> tuple[adsbget.AircraftSpot, str | None, bytes | None]:
+        """
+        Geocode and screenshot a spot concurrently, then compose its tweet.
+
+        Returns:
+            Tuple of (aircraft, tweet text or None, screenshot binary or None), which are the
+            arguments of SpotBot.publish
+        """
+        location_description, screenshot_binary = await asyncio.gather(
+            self._describe_location(aircraft), self._capture_screenshot(aircraft))
+        tweet = self.bot.compose_tweet(aircraft, location_description)
+        return aircraft, tweet, screenshot_binary
+
+    async def _wait_for_poll(self, delay: float) -> bool:
+        """
+        Wait delay seconds until the next scheduled poll. A streaming aircraft source can end the
+        wait early when a new aircraft appears, after at least STREAMING_MIN_POLL_SECONDS, so the
+        aircraft is checked without waiting for the rest of adsb_interval.
+
+        Returns:
+            True if the wait was ended early by the aircraft source
+        """
+        source = self.spots.source
+        if not source.streaming:
+            await asyncio.sleep(delay)
+            return False
+        loop = asyncio.get_running_loop()
+        earliest_poll_time = loop.time() + min(delay, STREAMING_MIN_POLL_SECONDS)
+        if not await asyncio.to_thread(source.wait_for_update, delay):
+            return False
+        await asyncio.sleep(max(0.0, earliest_poll_time - loop.time()))
+        return True
+
+    async def _poll_stage(self, max_cycles: int | None):
+        """
+        Producer stage: poll the ADSBx API every adsb_interval_seconds and put new spots on the
+        bounded spot queue. Polls are scheduled at fixed times relative to startup, so neither
+        the time taken by a poll nor the publish backlog delays the next one.
+
+        If the spot queue is full, the spot is dropped and removed from the Spotter's seen list,
+        so the aircraft will be spotted again on a later poll once there is room in the queue.
+
+        Args:
+            max_cycles: Optional number of polls to run, after which this stage waits for the
+             queued spots to be published and returns. Runs forever if None.
+        """
+        loop = asyncio.get_running_loop()
+        next_poll_time = loop.time()
+        cycle_count = 0
+        polled_early = False
+        while max_cycles is None or cycle_count < max_cycles:
+            for aircraft in await self._poll():
+                try:
+                    self._spot_queue.put_nowait(aircraft)
+                except asyncio.QueueFull:
+                    logger.warning(f"Spot queue is full, dropping {aircraft.hex_code} until a "
+                                   f"later poll")
+                    self.spots.seen.pop(aircraft.hex_code, None)
+            logger.info(f"{self._spot_queue.qsize()} spots waiting to be published.")
+            cycle_count += 1
+            if not polled_early:
+                # an early poll leaves the next scheduled poll in place
+                next_poll_time += self.spots.adsb_interval_seconds
+            delay = next_poll_time - loop.time()
+            if delay < 0:
+                logger.warning(f"Poll overran the ADSBx interval by {-delay:0.1f} seconds")
+                next_poll_time = loop.time()
+                delay = 0
+            if max_cycles is None or cycle_count < max_cycles:
+                polled_early = await self._wait_for_poll(delay)
+        await self._spot_queue.join()
+        await self._publish_queue.join()
+
+    async def _enrich_stage(self):
+        """
+        Take spots off the spot queue and start enriching them. The publish queue is bounded by
+        max_concurrency, which limits how far enrichment runs ahead of publishing.
+        """
+        while True:
+            aircraft = await self._spot_queue.get()
+            await self._publish_queue.put(asyncio.create_task(self._enrich(aircraft)))
+            self._spot_queue.task_done()
+
+    async def _publish_stage(self):
+        """Consumer stage: publish enriched spots in order, at most one per
+        tweet_interval_seconds"""
+        loop = asyncio.get_running_loop()
+        while True:
+            enrich_task = await self._publish_queue.get()
+            publish_args = await enrich_task
+            if self._last_publish_time is not None:
+                delay = self._last_publish_time + self.bot.tweet_interval_seconds - loop.time()
+                if delay > 0:
+                    logger.debug(f"Waiting {delay:0.1f} seconds before next tweet")
+                    await asyncio.sleep(delay)
+            await asyncio.to_thread(self.bot.publish, *publish_args)
+            self._last_publish_time = loop.time()
+            self._publish_queue.task_done()
+
+    async def run(self, max_cycles: int | None = None):
+        """
+        Run the poll, enrich and publish stages until the poll stage finishes or any stage
+        raises an exception.
+
+        Args:
+            max_cycles: Optional number of polls to run. After the last poll, returns once all
+             queued spots are published. Runs forever if None.
+        """
+        self._enrich_semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._screenshot_semaphore = asyncio.Semaphore(1)
+        self._spot_queue = asyncio.Queue(maxsize=self.queue_size)
+        self._publish_queue = asyncio.Queue(maxsize=self.max_concurrency)
+        stages = [asyncio.create_task(self._poll_stage(max_cycles)),
+                  asyncio.create_task(self._enrich_stage()),
+                  asyncio.create_task(self._publish_stage())]
+        try:
+            done, _ = await asyncio.wait(stages, return_when=asyncio.FIRST_COMPLETED)
+            for stage in done:
+                stage.result()  # re-raise any exception from a stage
+        finally:
+            for stage in stages:
+                stage.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
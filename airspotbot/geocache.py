@@ -0,0 +1,263 @@
+"""
+This module contains the in-memory reverse geocoding cache used by the Locator. Aircraft spotted
+around a fixed spotting location keep resolving to the same few neighbourhoods and points of
+interest, so geocoding results are cached by the geohash cell of the aircraft's position. A repeat
+lookup in the same cell then costs a dictionary access instead of one or two requests to Pelias
+or 3geonames, and does not take a token from the geocoder's token-bucket rate limiter, so cache
+hits never wait for the limiter to refill.
+
+The cell size is set by the geohash precision: 5 characters is a cell of about 4.9 x 4.9 km, 6
+characters about 1.2 x 0.6 km and 7 characters about 150 x 150 m (at the equator, cells get
+narrower towards the poles). The cache is bounded in size with least-recently-used eviction, and
+entries expire after a time-to-live so changes to the geocoder's data are eventually picked up.
+
+Results can also be kept on disk in a SqliteGeocodeStore, so a restarted bot starts with the
+results of earlier runs, and several bots on one host share their lookups. The store is read
+through on a miss in the in-memory cache, and new results are written back by a background
+thread, so a lookup never waits for a disk write.
+"""
+
+import json
+import logging
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from time import monotonic, time
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_TTL_SECONDS = 86400
+DEFAULT_GEOHASH_PRECISION = 6
+_GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash(latitude: float, longitude: float, precision: int = DEFAULT_GEOHASH_PRECISION) -> str:
+    """
+    Encode a position as a geohash.
+
+    Args:
+        latitude: Latitude in decimal degrees (-90 to 90)
+        longitude: Longitude in decimal degrees (-180 to 180)
+        precision: Number of characters of the geohash, from 1 to 12
+
+    Returns:
+        Geohash string of the cell containing the position
+    """
+    latitude_range = [-90.0, 90.0]
+    longitude_range = [-180.0, 180.0]
+    characters = []
+    bits = 0
+    bit_count = 0
+    even_bit = True  # bits alternate between longitude and latitude, starting with longitude
+    while len(characters) < precision:
+        value, value_range = (longitude, longitude_range) if even_bit else \
+            (latitude, latitude_range)
+        middle = (value_range[0] + value_range[1]) / 2
+        if value >= middle:
+            bits = bits * 2 + 1
+            value_range[0] = middle
+        else:
+            bits = bits * 2
+            value_range[1] = middle
+        even_bit = not even_bit
+        bit_count += 1
+        if bit_count == 5:
+            characters.append(_GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(characters)
+
+
+class GeocodeCache:
+    """
+    Size-bounded, time-limited cache of reverse geocoding results, keyed by geohash cell. Safe to
+    use from the async engine's concurrent geocoding threads.
+
+    simple usage example:
+
+    cache = GeocodeCache(max_size=1024, ttl_seconds=86400, precision=6)
+    cell = cache.cell(latitude, longitude)
+    result = cache.get(cell)
+    if result is None:
+        result = reverse_geocode(latitude, longitude)
+        cache.put(cell, result)
+    """
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 precision: int = DEFAULT_GEOHASH_PRECISION,
+                 clock: Callable[[], float] = monotonic):
+        """
+        Args:
+            max_size: Maximum number of cached cells. The least recently used cell is evicted
+                when a new one is added to a full cache.
+            ttl_seconds: Time after which a cached result expires
+            precision: Geohash precision of the cells, from 1 to 12 characters
+            clock: Function returning the current time in seconds
+        """
+        if max_size < 1:
+            raise ValueError("Geocode cache size must be at least 1")
+        if not 1 <= precision <= 12:
+            raise ValueError("Geohash precision must be between 1 and 12")
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.precision = precision
+        self.clock = clock
+        self._entries: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0  # entries removed to make room for new ones
+        self.expirations = 0  # entries removed because their TTL had passed
+
+    def cell(self, latitude: float | str, longitude: float | str) -> str:
+        """Return the cache key of the cell containing a position"""
+        return geohash(float(latitude), float(longitude), self.precision)
+
+    def get(self, cell: str):
+        """
+        Return the cached result for a cell, or None if there is none or it has expired. Counts
+        a hit or a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(cell)
+            if entry is not None:
+                expiry_time, result = entry
+                if expiry_time > self.clock():
+                    self._entries.move_to_end(cell)
+                    self.hits += 1
+                    return result
+                del self._entries[cell]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, cell: str, result):
+        """Cache the result for a cell, evicting the least recently used cell if the cache is
+        full"""
+        with self._lock:
+            self._entries[cell] = (self.clock() + self.ttl_seconds, result)
+            self._entries.move_to_end(cell)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        """Return the current number of entries and the hit, miss, eviction and expiration
+        counts"""
+        return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'expirations': self.expirations}
+
+
+class SqliteGeocodeStore:
+    """
+    Persistent store of reverse geocoding results, keyed by geocoding backend and geohash cell,
+    in a SQLite database in WAL mode. WAL mode lets several airspotbot processes read the
+    database while one of them writes, and writers wait for each other rather than failing.
+
+    Results are written by a background thread, which commits everything queued since its last
+    write in one transaction. Expiry times are wall clock times, so they mean the same in every
+    process sharing the database.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 clock: Callable[[], float] = time):
+        """
+        Args:
+            db_path: Path of the SQLite database file, created if it does not exist
+            ttl_seconds: Time after which a stored result expires
+            clock: Function returning the current time in seconds since the epoch
+        """
+        self.db_path = str(db_path)
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.write_errors = 0
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        # lookups run in the async engine's worker threads, so the connection used for reads is
+        #  shared between threads and guarded by a lock
+        self._lock = threading.Lock()
+        self._connection = self._connect()
+        with self._lock, self._connection:
+            self._connection.execute('CREATE TABLE IF NOT EXISTS geocode '
+                                     '(backend TEXT NOT NULL, cell TEXT NOT NULL, '
+                                     'result TEXT NOT NULL, expires REAL NOT NULL, '
+                                     'PRIMARY KEY (backend, cell))')
+            deleted = self._connection.execute('DELETE FROM geocode WHERE expires <= ?',
+                                               (self.clock(),)).rowcount
+        logger.info(f"Opened geocode store {self.db_path}, removed {deleted} expired results")
+        self._writes: queue.Queue[tuple[str, str, str, float] | None] = queue.Queue()
+        self._writer = threading.Thread(target=self._write_back, name='geocode-store',
+                                        daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        # wait up to 10 seconds for another process's write to finish
+        connection = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def get(self, backend: str, cell: str):
+        """Return the stored result for a backend and cell, or None if there is none or it has
+        expired"""
+        try:
+            with self._lock:
+                row = self._connection.execute(
+                    'SELECT result FROM geocode WHERE backend = ? AND cell = ? AND expires > ?',
+                    (backend, cell, self.clock())).fetchone()
+        except sqlite3.Error:
+            logger.error(f"Error reading geocode store {self.db_path}", exc_info=True)
+            return None
+        return None if row is None else json.loads(row[0])
+
+    def put(self, backend: str, cell: str, result):
+        """Queue a result to be written to the store by the background thread"""
+        self._writes.put((backend, cell, json.dumps(result), self.clock() + self.ttl_seconds))
+
+    def _write_back(self):
+        """Background thread writing queued results, in one transaction per batch"""
+        connection = self._connect()
+        running = True
+        while running:
+            batch = [self._writes.get()]
+            while True:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [row for row in batch if row is not None]
+            running = len(rows) == len(batch)  # None is queued by close()
+            try:
+                if rows:
+                    with connection:
+                        connection.executemany('INSERT OR REPLACE INTO geocode VALUES '
+                                               '(?, ?, ?, ?)', rows)
+            except sqlite3.Error:
+                self.write_errors += 1
+                logger.error(f"Error writing to geocode store {self.db_path}", exc_info=True)
+            finally:
+                for _ in batch:
+                    self._writes.task_done()
+        connection.close()
+
+    def flush(self):
+        """Wait until all queued results have been written"""
+        self._writes.join()
+
+    def close(self):
+        """Write any queued results and close the store"""
+        self._writes.put(None)
+        self._writer.join()
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,158 @@
+"""
+This module contains the shared HTTP client layer used for all of airspotbot's outbound API calls
+(ADSBx via RapidAPI, Pelias and 3geonames). Rather than opening a new TCP+TLS connection for each
+request with requests.get(), the HttpClient class keeps one pooled keep-alive requests.Session per
+upstream host, so repeated polls and geocoding lookups reuse existing connections.
+
+Timeouts and connection pool sizes can be set globally or per host in the optional [HTTP] section
+of the config file, for example:
+
+    [HTTP]
+    timeout = 4
+    pool_size = 4
+    timeout.api.3geonames.org = 8
+    pool_size.adsbexchange-com1.p.rapidapi.com = 2
+"""
+
+import configparser
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT_SECONDS = 4.0
+DEFAULT_POOL_SIZE = 4
+
+
+class HttpClient:
+    """Class holding one pooled, keep-alive requests.Session per upstream host. A single instance
+    is created in run_bot and shared between the Spotter and Locator objects.
+
+    simple usage example:
+
+    client = HttpClient(user_agent="airspotbot/x.y.z")
+    response = client.get("https://api.3geonames.org/51.5,-0.07.json")
+    response.raise_for_status()
+    """
+
+    def __init__(self, user_agent: str, config_parsed: configparser.ConfigParser | None = None):
+        """
+        Args:
+            user_agent: User agent string sent with every request made through this client
+            config_parsed: Optional ConfigParser object. If it contains an [HTTP] section, the
+             default and per-host timeouts and pool sizes are read from it.
+        """
+        self.user_agent = user_agent
+        self.default_timeout_seconds = DEFAULT_TIMEOUT_SECONDS
+        self.default_pool_size = DEFAULT_POOL_SIZE
+        self.host_timeouts: dict[str, float] = {}
+        self.host_pool_sizes: dict[str, int] = {}
+        self._sessions: dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+        if config_parsed is not None:
+            self._read_http_config(config_parsed)
+
+    def _read_http_config(self, config_parsed: configparser.ConfigParser):
+        """
+        Read timeouts and connection pool sizes from the optional [HTTP] section of the config
+        file. Options named "timeout" and "pool_size" set the defaults, options with a host name
+        suffix (e.g. "timeout.api.3geonames.org") override them for that host only.
+
+        Args:
+            config_parsed: ConfigParser object, generated from the config/ini file whose path is
+             specified as a command line argument when airspotbot is started.
+
+        Raises:
+            ValueError: If a timeout or pool size in the [HTTP] section is not a positive number
+        """
+        if not config_parsed.has_section('HTTP'):
+            return
+        for option, value in config_parsed.items('HTTP'):
+            setting, _, host = option.partition('.')
+            try:
+                if setting == 'timeout':
+                    timeout = float(value)
+                    if timeout <= 0:
+                        raise ValueError
+                    if host:
+                        self.host_timeouts[host] = timeout
+                    else:
+                        self.default_timeout_seconds = timeout
+                elif setting == 'pool_size':
+                    pool_size = int(value)
+                    if pool_size < 1:
+                        raise ValueError
+                    if host:
+                        self.host_pool_sizes[host] = pool_size
+                    else:
+                        self.default_pool_size = pool_size
+            except ValueError as http_error:
+                raise ValueError(f"Bad value in config file for HTTP/{option}: '{value}'. Must be "
+                                 f"a positive number.") from http_error
+        logger.debug(f"HTTP client defaults: timeout {self.default_timeout_seconds} s, "
+                     f"pool size {self.default_pool_size}. Per-host timeouts: "
+                     f"{self.host_timeouts}, per-host pool sizes: {self.host_pool_sizes}")
+
+    def timeout_for(self, url: str) -> float:
+        """Return the configured request timeout (seconds) for the host of the given url"""
+        return self.host_timeouts.get(urlsplit(url).hostname, self.default_timeout_seconds)
+
+    def pool_size_for(self, url: str) -> int:
+        """Return the configured number of pooled connections for the host of the given url"""
+        return self.host_pool_sizes.get(urlsplit(url).hostname, self.default_pool_size)
+
+    def session_for(self, url: str) -> requests.Session:
+        """
+        Return the pooled session for the scheme/host/port of the given url, creating it on first
+        use.
+
+        Args:
+            url: Full url of the request that will be made with the session
+
+        Returns:
+            requests.Session object with a keep-alive connection pool for that host
+        """
+        split_url = urlsplit(url)
+        session_key = f"{split_url.scheme}://{split_url.netloc}"
+        with self._lock:
+            session = self._sessions.get(session_key)
+            if session is None:
+                pool_size = self.pool_size_for(url)
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+                session.mount(f"{session_key}/", adapter)
+                session.headers.update({'User-Agent': self.user_agent,
+                                        'Accept-Encoding': 'gzip, deflate',
+                                        'Connection': 'keep-alive'})
+                self._sessions[session_key] = session
+                logger.debug(f"Created HTTP session for {session_key} with pool size {pool_size}")
+        return session
+
+    def get(self, url: str, headers: dict[str, str] | None = None,
+            timeout: float | None = None, **kwargs) -> requests.Response:
+        """
+        Send a GET request over the pooled session for the url's host.
+
+        Args:
+            url: Url to request
+            headers: Optional extra headers, merged over the session's default headers
+            timeout: Optional timeout in seconds, overriding the configured timeout for this host
+            **kwargs: Passed through to requests.Session.get()
+
+        Returns:
+            requests.Response object
+        """
+        if timeout is None:
+            timeout = self.timeout_for(url)
+        return self.session_for(url).get(url, headers=headers, timeout=timeout, **kwargs)
+
+    def close(self):
+        """Close all pooled sessions and their connections"""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
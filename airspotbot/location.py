@@ -6,36 +6,53 @@ descriptions in tweets of spotted aircraft.
 Based on settings read from the airspotbot config file, the Locator.get_location_description()
 method will return a manually-specified string, a nicely formatted string of latitude/longitude
 coordinates, or a description of the nearby area and/or points of interest. This last option is
-provided by either Pelias or 3geonames reverse geocoding API endpoints. For more information on this
-Pelias endpoint, see https://github.com/pelias/documentation/blob/master/reverse.md. For more info
-on the 3geonames API, see https://3geonames.org/api.
+provided by either Pelias or 3geonames reverse geocoding API endpoints, or offline by a local index
+of places built from a GeoNames dump (see placeindex.py). For more information on this Pelias
+endpoint, see https://github.com/pelias/documentation/blob/master/reverse.md. For more info on the
+3geonames API, see https://3geonames.org/api.
 """
 
 import configparser
 import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
 import requests
-from time import sleep
+from .geocache import (GeocodeCache, SqliteGeocodeStore, geohash, DEFAULT_CACHE_SIZE,
+                       DEFAULT_GEOHASH_PRECISION, DEFAULT_TTL_SECONDS)
+from .httpclient import HttpClient
+from .ratelimit import TokenBucket
+from .placeindex import (PlaceIndex, build_place_index, index_is_stale, read_geonames,
+                         DEFAULT_MAX_DISTANCE_KM)
 
 logger = logging.getLogger(__name__)
 
+# requests per second to the free 3geonames API, unless set by geonames_rate_limit
+GEONAMES_RATE_LIMIT = 1.0
+
 
 class Locator:
     """Class for generating location descriptions, using either manual description, coordinates,
-    pelias reverse geocoder or 3geonames reverse geocoder"""
+    pelias reverse geocoder, 3geonames reverse geocoder or an offline place index"""
 
-    def __init__(self, config_parsed: configparser.ConfigParser, user_agent: str):
+    def __init__(self,
+                 config_parsed: configparser.ConfigParser,
+                 user_agent: str,
+                 http_client: HttpClient | None = None):
         """
         Args:
             config_parsed: ConfigParser object, generated from the config/ini file whose path is
              specified as a command line argument when airspotbot is started.
             user_agent: User agent string used in API requests
+            http_client: Optional shared HttpClient used for geocoding requests. If not
+             specified, the Locator creates its own.
          """
         self.user_agent = user_agent
+        self._http = http_client if http_client is not None else HttpClient(user_agent)
         self.location_type = 'MANUAL'
         self.location_manual_description = ''
         self.pelias_host = ''
         self.pelias_port = 0
-        self.pelias_url = ''
         self.pelias_valid_layers = ('venue',
                                     'address',
                                     'street',
@@ -51,6 +68,17 @@ class Locator:
                                     'coarse')
         self.pelias_point_layer = ''
         self.pelias_area_layer = ''
+        # runs the area layer query while the point layer is queried in the calling thread
+        self._pelias_executor: ThreadPoolExecutor | None = None
+        # reverse geocoding results by geohash cell, in memory and on disk. None if disabled
+        self.geocode_cache: GeocodeCache | None = None
+        self.geocode_store: SqliteGeocodeStore | None = None
+        self.geocode_precision = DEFAULT_GEOHASH_PRECISION
+        self.offline_index: PlaceIndex | None = None
+        # rate limiters shared by all lookups to each geocoding API, None if not limited
+        self.pelias_rate_limiter: TokenBucket | None = None
+        self.geonames_rate_limiter: TokenBucket | None = None
+        self.offline_max_distance = DEFAULT_MAX_DISTANCE_KM
         self._validate_location_config(config_parsed)
 
     def _validate_location_config(self, config_parsed: configparser.ConfigParser):
@@ -61,17 +89,19 @@ class Locator:
              specified as a command line argument when airspotbot is started.
 
         Raises:
-            configparser.NoOptionError: This exception is raised if pelias location type is set but
-             other necessary options are not.
+            configparser.NoOptionError: This exception is raised if pelias or offline location
+             type is set but other necessary options are not.
          """
         try:
             self.location_type = str(config_parsed.get('LOCATION', 'location_type')).upper()
             # check location_type is populated with a valid value
             assert self.location_type != ''
-            assert self.location_type in ('MANUAL', 'COORDINATE', 'PELIAS', '3GEONAMES')
+            assert self.location_type in ('MANUAL', 'COORDINATE', 'PELIAS', '3GEONAMES',
+                                          'OFFLINE')
         except (configparser.NoOptionError, configparser.NoSectionError, AssertionError):
             logger.warning("Location type is not set in config, defaulting to coordinate. Valid "
-                           "options are 'manual', 'coordinate', or 'pelias'")
+                           "options are 'manual', 'coordinate', 'pelias', '3geonames' or "
+                           "'offline'")
             self.location_type = 'COORDINATE'
         if self.location_type == 'MANUAL':
             logger.info("Location type set to manual")
@@ -113,7 +143,7 @@ class Locator:
             # make sure we can connect to the pelias host over http
             try:
                 logger.info(f"Testing Pelias API at {pelias_test_url}")
-                test_result = requests.get(pelias_test_url, headers={'User-Agent': self.user_agent})
+                test_result = self._http.get(pelias_test_url)
                 test_result.raise_for_status()
                 # once we know we can connect to the host, make sure the response looks right
                 try:
@@ -127,7 +157,8 @@ class Locator:
                     logger.error('Pelias API response was not as expected, reverting location'
                                  ' type to coordinates')
                     self.location_type = 'COORDINATES'
-            except (requests.exceptions.ConnectionError, requests.exceptions.HTTPError) as conn_err:
+            except (requests.exceptions.ConnectionError, requests.exceptions.HTTPError,
+                    requests.exceptions.Timeout) as conn_err:
                 logger.error('Error connecting to Pelias API, reverting location type to'
                              ' coordinates', exc_info=True)
                 self.location_type = 'COORDINATES'
@@ -161,10 +192,184 @@ class Locator:
                                f' https://github.com/pelias/documentation/blob/master/reverse.md'
                                f' for supported layers.')
                 self.pelias_point_layer = None
+            if self.pelias_point_layer is not None and self.pelias_area_layer is not None:
+                # one worker per pooled connection to the Pelias host
+                pool_size = self._http.pool_size_for(self.pelias_host)
+                self._pelias_executor = ThreadPoolExecutor(max_workers=pool_size,
+                                                           thread_name_prefix='pelias')
+            self.pelias_rate_limiter = self._read_rate_limit_config(config_parsed, 'pelias', 0,
+                                                                    'Pelias')
         elif self.location_type == '3GEONAMES':
             logger.info("Location type set to 3geonames")
+            self.geonames_rate_limiter = self._read_rate_limit_config(
+                config_parsed, 'geonames', GEONAMES_RATE_LIMIT, '3geonames')
+        elif self.location_type == 'OFFLINE':
+            logger.info("Location type set to offline")
+            self._configure_offline_index(config_parsed)
         elif self.location_type == 'COORDINATE':
             logger.info("Location type set to coordinate")
+        if self.location_type in ('PELIAS', '3GEONAMES'):
+            self._configure_geocode_cache(config_parsed)
+
+    def _configure_offline_index(self, config_parsed: configparser.ConfigParser):
+        """
+        Set up the offline place index from the offline_places (GeoNames dump) and offline_index
+        options. The index is built from the dump if it does not exist or is older than the
+        dump, and is memory-mapped on the first lookup.
+
+        Raises:
+            configparser.NoOptionError: If neither offline_places nor offline_index is set
+        """
+        dump_path = config_parsed.get('LOCATION', 'offline_places', fallback='') or None
+        index_path = config_parsed.get('LOCATION', 'offline_index', fallback='') or None
+        if dump_path is None and index_path is None:
+            logger.error('offline is selected as the location type, but neither offline_places'
+                         ' nor offline_index is set in config file. Please enter the path of a'
+                         ' GeoNames dump file')
+            raise configparser.NoOptionError("offline_places", "LOCATION")
+        if index_path is None:
+            index_path = f'{dump_path}.asbidx'
+        try:
+            self.offline_max_distance = float(config_parsed.get(
+                'LOCATION', 'offline_max_distance', fallback=str(DEFAULT_MAX_DISTANCE_KM)))
+            if self.offline_max_distance <= 0:
+                raise ValueError
+        except ValueError:
+            logger.warning(f"Invalid value for LOCATION/offline_max_distance, using default of "
+                           f"{DEFAULT_MAX_DISTANCE_KM}")
+            self.offline_max_distance = DEFAULT_MAX_DISTANCE_KM
+        try:
+            if index_is_stale(index_path, dump_path):
+                if dump_path is None:
+                    raise FileNotFoundError(f"Place index {index_path} does not exist")
+                logger.info(f"Building place index {index_path} from {dump_path}")
+                build_place_index(read_geonames(dump_path), index_path)
+        except OSError:
+            logger.error('Error building offline place index, reverting location type to'
+                         ' coordinates', exc_info=True)
+            self.location_type = 'COORDINATE'
+            return
+        self.offline_index = PlaceIndex(index_path)
+
+    @staticmethod
+    def _read_rate_limit_config(config_parsed: configparser.ConfigParser, backend: str,
+                                default_rate: float, name: str) -> TokenBucket | None:
+        """
+        Create the rate limiter for a geocoding API from the optional <backend>_rate_limit
+        (requests per second, 0 for no limit) and <backend>_rate_burst options. Invalid values
+        fall back to the defaults.
+
+        Returns:
+            TokenBucket, or None if the rate limit is 0
+        """
+        try:
+            rate = float(config_parsed.get('LOCATION', f'{backend}_rate_limit',
+                                           fallback=str(default_rate)))
+            if rate < 0:
+                raise ValueError
+        except ValueError:
+            logger.warning(f"Invalid value for LOCATION/{backend}_rate_limit, using default of "
+                           f"{default_rate}")
+            rate = default_rate
+        try:
+            burst = int(config_parsed.get('LOCATION', f'{backend}_rate_burst', fallback='1'))
+            if burst < 1:
+                raise ValueError
+        except ValueError:
+            logger.warning(f"Invalid value for LOCATION/{backend}_rate_burst, using default of 1")
+            burst = 1
+        if rate == 0:
+            return None
+        logger.info(f"Limiting {name} requests to {rate} per second, in bursts of up to {burst}")
+        return TokenBucket(rate, burst, name)
+
+    def _configure_geocode_cache(self, config_parsed: configparser.ConfigParser):
+        """
+        Create the reverse geocoding caches from the optional geocode_cache_size,
+        geocode_cache_ttl, geocode_cache_precision and geocode_cache_path options. Invalid values
+        fall back to the defaults. A geocode_cache_size of 0 disables the in-memory cache, and
+        the on-disk store is only used if geocode_cache_path is set.
+        """
+        settings = {}
+        for option, default, minimum, maximum in (
+                ('geocode_cache_size', DEFAULT_CACHE_SIZE, 0, None),
+                ('geocode_cache_ttl', DEFAULT_TTL_SECONDS, 1, None),
+                ('geocode_cache_precision', DEFAULT_GEOHASH_PRECISION, 1, 12)):
+            try:
+                value = int(config_parsed.get('LOCATION', option, fallback=str(default)))
+                if value < minimum or (maximum is not None and value > maximum):
+                    raise ValueError
+            except ValueError:
+                logger.warning(f"Invalid value for LOCATION/{option}, using default of {default}")
+                value = default
+            settings[option] = value
+        self.geocode_precision = settings['geocode_cache_precision']
+        if settings['geocode_cache_size'] == 0:
+            logger.info("In-memory reverse geocoding cache disabled")
+        else:
+            logger.info(f"Caching up to {settings['geocode_cache_size']} reverse geocoding "
+                        f"results for {settings['geocode_cache_ttl']} seconds, by geohash cells "
+                        f"of {settings['geocode_cache_precision']} characters")
+            self.geocode_cache = GeocodeCache(settings['geocode_cache_size'],
+                                              settings['geocode_cache_ttl'],
+                                              settings['geocode_cache_precision'])
+        store_path = config_parsed.get('LOCATION', 'geocode_cache_path', fallback='').strip()
+        if store_path:
+            try:
+                self.geocode_store = SqliteGeocodeStore(store_path,
+                                                        settings['geocode_cache_ttl'])
+            except sqlite3.Error:
+                logger.error(f"Error opening geocode store {store_path}, results will not be "
+                             f"stored on disk", exc_info=True)
+
+    @property
+    def _geocode_backend(self) -> str:
+        """Name of the geocoding backend and settings, keying results in the on-disk store"""
+        if self.location_type == 'PELIAS':
+            return f'pelias {self.pelias_host}:{self.pelias_port} ' \
+                   f'{self.pelias_area_layer} {self.pelias_point_layer}'
+        return self.location_type.lower()
+
+    def _cached_geocode(self, reverse_geocode, latitude_degrees: str, longitude_degrees: str,
+                        is_result: Callable[[object], bool]):
+        """
+        Look up a position in the in-memory cache, then in the on-disk store, calling the reverse
+        geocoder if neither has a result. Only results accepted by is_result are cached, so a
+        failed request is retried on the next lookup in the same cell.
+
+        Args:
+            reverse_geocode: Reverse geocoding method, taking latitude and longitude strings
+            latitude_degrees: String representing latitude value in decimal degrees (-90 to 90)
+            longitude_degrees: String representing longitude value in decimal degrees (-180 to 180)
+            is_result: Function returning whether a geocoder response is a cacheable result
+
+        Returns:
+            Geocoder response, from a cache or from reverse_geocode
+        """
+        if self.geocode_cache is None and self.geocode_store is None:
+            return reverse_geocode(latitude_degrees, longitude_degrees)
+        cell = geohash(float(latitude_degrees), float(longitude_degrees), self.geocode_precision)
+        if self.geocode_cache is not None:
+            geocode = self.geocode_cache.get(cell)
+            if geocode is not None:
+                logger.debug(f"Reverse geocoding cache hit for cell {cell}")
+                return geocode
+        if self.geocode_store is not None:
+            geocode = self.geocode_store.get(self._geocode_backend, cell)
+            if geocode is not None:
+                logger.debug(f"Reverse geocoding store hit for cell {cell}")
+                if self.geocode_cache is not None:
+                    self.geocode_cache.put(cell, geocode)
+                return geocode
+        geocode = reverse_geocode(latitude_degrees, longitude_degrees)
+        if is_result(geocode):
+            if self.geocode_cache is not None:
+                self.geocode_cache.put(cell, geocode)
+            if self.geocode_store is not None:
+                self.geocode_store.put(self._geocode_backend, cell, geocode)
+        if self.geocode_cache is not None:
+            logger.debug(f"Reverse geocoding cache: {self.geocode_cache.stats()}")
+        return geocode
 
     def get_location_description(self, latitude_degrees: str, longitude_degrees: str):
         """
@@ -184,7 +389,9 @@ class Locator:
         if self.location_type == 'MANUAL':
             return self.location_manual_description  # return string specified in config file
         elif self.location_type == 'PELIAS':
-            geocode = self._reverse_geocode_pelias(latitude_degrees, longitude_degrees)
+            geocode = self._cached_geocode(
+                self._reverse_geocode_pelias, latitude_degrees, longitude_degrees,
+                self._is_complete_pelias_result)
             if geocode['area'] is None and geocode['point'] is None:
                 logger.warning("No reverse geocoding results returned, defaulting to coordinate"
                                " location")
@@ -195,7 +402,9 @@ class Locator:
                 return f"over {geocode['area']}"
             return f"over {geocode['area']}, near {geocode['point']}"
         elif self.location_type == '3GEONAMES':
-            geocode = self._reverse_geocode_geonames(latitude_degrees, longitude_degrees)
+            geocode = self._cached_geocode(
+                self._reverse_geocode_geonames, latitude_degrees, longitude_degrees,
+                lambda g: isinstance(g, dict) and 'nearest' in g)
             try:
                 if geocode['nearest']['name'] != geocode['nearest']['city']:
                     return f"near {geocode['nearest']['name']}, {geocode['nearest']['city']}"
@@ -211,10 +420,71 @@ class Locator:
             except TypeError:
                 logger.warning("Did not receive result from 3geonames reverse geocoder, falling "
                                "back to coordinate string")
+        elif self.location_type == 'OFFLINE':
+            try:
+                place, city = self.offline_index.nearest(float(latitude_degrees),
+                                                         float(longitude_degrees),
+                                                         self.offline_max_distance)
+            except (OSError, ValueError):
+                logger.error("Error reading offline place index, falling back to coordinate "
+                             "string", exc_info=True)
+                return f"near {coord_string}"
+            if place is None:
+                logger.info("No place found within offline_max_distance, falling back to "
+                            "coordinate string")
+            elif city is None or city == place:
+                return f"near {place}"
+            else:
+                return f"near {place}, {city}"
         return f"near {coord_string}"
 
+    def _query_pelias_layer(self, pelias_url: str, layer: str, feature: str) -> str | None:
+        """
+        Request the nearest feature of one layer from Pelias
+
+        Args:
+            pelias_url: Url of the reverse geocoding request, without the layers parameter
+            layer: Pelias layer to query
+            feature: Name of the feature used in log messages, "point" or "area"
+
+        Returns:
+            Name of the nearest feature, or None if Pelias did not return one or the request
+            was skipped by the rate limiter
+
+        Raises:
+            requests.exceptions.RequestException: If the request fails or times out
+        """
+        if self.pelias_rate_limiter is not None and not self.pelias_rate_limiter.acquire():
+            return None
+        pelias_result = self._http.get(pelias_url + f"&layers={layer}")
+        if pelias_result.status_code == 429 and self.pelias_rate_limiter is not None:
+            self.pelias_rate_limiter.back_off()
+        pelias_result.raise_for_status()
+        if self.pelias_rate_limiter is not None:
+            self.pelias_rate_limiter.reset_back_off()
+        logger.debug(f"Pelias {feature} response took "
+                     f"{pelias_result.elapsed.total_seconds():0.3f} seconds")
+        try:
+            return pelias_result.json()["features"][0]["properties"]["name"]
+        except (AttributeError, KeyError, IndexError):
+            logger.warning(f"No {feature} feature found")
+            return None
+
+    def _is_complete_pelias_result(self, geocode) -> bool:
+        """
+        Return whether every configured Pelias layer returned a feature. A partial result, e.g.
+        when the rate limiter skipped the request for one layer, is not cached, so the missing
+        layer is queried again on the next lookup in the same cell.
+        """
+        return ((self.pelias_point_layer is None or geocode['point'] is not None)
+                and (self.pelias_area_layer is None or geocode['area'] is not None))
+
     def _reverse_geocode_pelias(self, latitude_degrees: str, longitude_degrees: str):
         """
+        Query the point and area layers of Pelias. If both layers are set, the two requests are
+        sent concurrently over the pooled connections to the Pelias host, so a lookup takes as
+        long as the slower of the two rather than their sum.
+
         Args:
             latitude_degrees: String representing latitude value in decimal degrees (-90 to 90)
             longitude_degrees: String representing longitude value in decimal degrees (-180 to 180)
@@ -224,40 +494,30 @@ class Locator:
             human-readable names of the nearest point and area to the specified coordinates, or None
             if the geocoder returns no result.
         """
-        self.pelias_url = \
-            f'{self.pelias_host}:{self.pelias_port}/v1/reverse?point.lat={latitude_degrees}&point.lon={longitude_degrees}'
-        geo_results = {}
+        # use a local url so concurrent lookups from the async engine do not interfere
+        pelias_url = f'{self.pelias_host}:{self.pelias_port}/v1/reverse?' \
+                     f'point.lat={latitude_degrees}&point.lon={longitude_degrees}'
+        geo_results = {'point': None, 'area': None}
         try:
-            if self.pelias_point_layer is not None:
-                pelias_result = requests.get(self.pelias_url + f"&layers={self.pelias_point_layer}",
-                                             headers={'User-Agent': self.user_agent})
-                pelias_result.raise_for_status()
-                logger.debug(f"Pelias response took {pelias_result.elapsed.total_seconds():0.3f} "
-                             f"seconds")
-                try:
-                    point_name = pelias_result.json()["features"][0]["properties"]["name"]
-                except (AttributeError, KeyError, IndexError):
-                    logger.warning("No point feature found")
-                    point_name = None
-            else:
-                point_name = None
-            if self.pelias_area_layer is not None:
-                pelias_result = requests.get(self.pelias_url + f"&layers={self.pelias_area_layer}",
-                                             headers={'User-Agent': self.user_agent})
-                pelias_result.raise_for_status()
-                logger.debug(f"Pelias response took {pelias_result.elapsed.total_seconds():0.3f} "
-                             f"seconds")
-                try:
-                    area_name = pelias_result.json()["features"][0]["properties"]["name"]
-                except (AttributeError, KeyError, IndexError):
-                    logger.warning("No area feature found")
-                    area_name = None
-            else:
-                area_name = None
-            geo_results['point'] = point_name
-            geo_results['area'] = area_name
+            area_query = None
+            if self.pelias_area_layer is not None and self._pelias_executor is not None:
+                area_query = self._pelias_executor.submit(
+                    self._query_pelias_layer, pelias_url, self.pelias_area_layer, 'area')
+            try:
+                if self.pelias_point_layer is not None:
+                    geo_results['point'] = self._query_pelias_layer(
+                        pelias_url, self.pelias_point_layer, 'point')
+            finally:
+                # wait for the area query even if the point query failed, so no request is left
+                # running in the background
+                if area_query is not None:
+                    geo_results['area'] = area_query.result()
+            if self.pelias_area_layer is not None and area_query is None:
+                geo_results['area'] = self._query_pelias_layer(
+                    pelias_url, self.pelias_area_layer, 'area')
             return geo_results
-        except (requests.exceptions.ConnectionError, requests.exceptions.HTTPError) as conn_err:
+        except (requests.exceptions.ConnectionError, requests.exceptions.HTTPError,
+                requests.exceptions.Timeout) as conn_err:
             logger.error('Error connecting to Pelias API', exc_info=True)
             geo_results['point'] = None
             geo_results['area'] = None
@@ -273,17 +533,23 @@ class Locator:
 
         Returns:
             JSON object containing geocoder API response, or None if we cannot connect to the API
+            or the request is skipped by the rate limiter
         """
         logger.debug(f"Looking up {latitude_degrees}, {longitude_degrees} using 3geonames api")
-        sleep(1)  # hardcoded delay to limit rate of requests to this free API
+        if self.geonames_rate_limiter is not None and not self.geonames_rate_limiter.acquire():
+            return None
         try:
-            response = requests.get(
-                f"https://api.3geonames.org/{latitude_degrees},{longitude_degrees}.json", timeout=4,
-                headers={'User-Agent': self.user_agent})
+            response = self._http.get(
+                f"https://api.3geonames.org/{latitude_degrees},{longitude_degrees}.json")
+            if response.status_code == 429 and self.geonames_rate_limiter is not None:
+                self.geonames_rate_limiter.back_off()
             response.raise_for_status()
             logger.debug(f"3geonames API response took {response.elapsed.total_seconds():0.3f} "
                          f"seconds")
-            return response.json()
+            geocode = response.json()
+            if self.geonames_rate_limiter is not None:
+                self.geonames_rate_limiter.reset_back_off()
+            return geocode
         except (requests.exceptions.ConnectionError,
                 requests.exceptions.HTTPError) as conn_err:
             logger.error("Error connecting to https://api.3geonames.org/", exc_info=True)
@@ -296,6 +562,8 @@ class Locator:
             # the expected JSON response
             logger.error("https://api.3geonames.org/ did not return JSON, "
                          "likely due to rate limiting", exc_info=True)
+            if self.geonames_rate_limiter is not None:
+                self.geonames_rate_limiter.back_off()
             return None
 
     @staticmethod
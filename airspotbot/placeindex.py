@@ -0,0 +1,367 @@
+"""
+This module contains the offline reverse geocoder used by the "offline" location type. Places
+(cities, towns, neighbourhoods and airports) are read from a GeoNames-style dump, such as
+cities500.txt or a country file from https://download.geonames.org/export/dump/, and stored in a
+grid index: places are sorted by the grid cell they fall in, and a nearest-place query only looks
+at the cells around the aircraft's position. No network access is needed, so there is no request
+latency or rate limiting, and the bot works in air-gapped deployments.
+
+The index is built once from the dump and saved as a compact binary file, which is memory-mapped
+on the first query. Only the cells that are actually queried are read from disk, so even an index
+of the full GeoNames dump costs little memory. The index file layout is:
+
+    header (_INDEX_HEADER) | cell keys (int64) | cell start offsets (uint32) |
+    x, y and z (float32 each) | name offsets (uint32) | kinds (uint8) | names
+
+with all values little-endian and names as one block of UTF-8 text. Each section starts on an
+8 byte boundary. Places are stored as points on the unit sphere rather than as latitude and
+longitude: the straight-line distance between two such points orders places exactly as the
+great-circle distance does, so queries need no trigonometry per place.
+"""
+
+import bisect
+import logging
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+INDEX_MAGIC = b'ASBGEO\x01\n'
+_INDEX_HEADER = struct.Struct('<8sIIdI4x')  # magic, places, cells, cell size, names size
+DEFAULT_CELL_DEGREES = 0.02
+DEFAULT_MAX_DISTANCE_KM = 25
+EARTH_RADIUS_KM = 6371.0
+
+# kinds of place stored in the index
+KIND_CITY = 0
+KIND_NEIGHBOURHOOD = 1
+KIND_AIRPORT = 2
+# GeoNames feature codes of the populated places and airports kept in the index. Historical,
+# abandoned and destroyed places (PPLH, PPLQ, PPLW, PPLCH) are left out.
+_NEIGHBOURHOOD_CODES = ('PPLX',)
+_CITY_CODES = ('PPL', 'PPLA', 'PPLA2', 'PPLA3', 'PPLA4', 'PPLA5', 'PPLC', 'PPLF', 'PPLG', 'PPLL',
+               'PPLR', 'PPLS', 'STLMT')
+_AIRPORT_CODES = ('AIRP', 'AIRF', 'AIRH', 'AIRB')
+
+
+def read_geonames(dump_path: str) -> Iterator[tuple[str, float, float, int]]:
+    """
+    Read the places used by the offline geocoder from a GeoNames dump.
+
+    Args:
+        dump_path: Path of a tab separated GeoNames dump file
+
+    Yields:
+        (name, latitude, longitude, kind) of every city, neighbourhood and airport in the dump
+    """
+    with open(dump_path, encoding='utf-8') as dump_file:
+        for line_number, line in enumerate(dump_file, start=1):
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 8 or line.startswith('#'):
+                continue
+            feature_code = fields[7]
+            if feature_code in _CITY_CODES:
+                kind = KIND_CITY
+            elif feature_code in _NEIGHBOURHOOD_CODES:
+                kind = KIND_NEIGHBOURHOOD
+            elif feature_code in _AIRPORT_CODES:
+                kind = KIND_AIRPORT
+            else:
+                continue
+            try:
+                yield fields[1], float(fields[4]), float(fields[5]), kind
+            except ValueError:
+                logger.warning(f"Skipping line {line_number} of {dump_path}, invalid coordinates")
+
+
+def _grid_size(cell_degrees: float) -> tuple[int, int]:
+    """Number of rows and columns of the grid"""
+    return math.ceil(180 / cell_degrees), math.ceil(360 / cell_degrees)
+
+
+def _cell_position(latitude: float, longitude: float, cell_degrees: float) -> tuple[int, int]:
+    """Row and column of the grid cell containing a position"""
+    rows, columns = _grid_size(cell_degrees)
+    row = min(rows - 1, max(0, int((latitude + 90) // cell_degrees)))
+    column = int((longitude + 180) // cell_degrees) % columns
+    return row, column
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _padding(length: int) -> bytes:
+    return b'\0' * (-length % 8)
+
+
+def _unit_vector(latitude: float, longitude: float) -> tuple[float, float, float]:
+    """Position as a point on the unit sphere"""
+    latitude, longitude = math.radians(latitude), math.radians(longitude)
+    return (math.cos(latitude) * math.cos(longitude), math.cos(latitude) * math.sin(longitude),
+            math.sin(latitude))
+
+
+def _chord(distance: float) -> float:
+    """Straight-line distance on the unit sphere between points a great-circle distance in
+    kilometres apart"""
+    return 2 * math.sin(min(math.pi, distance / EARTH_RADIUS_KM) / 2)
+
+
+def build_place_index(places, index_path: str,
+                      cell_degrees: float = DEFAULT_CELL_DEGREES) -> int:
+    """
+    Build a place index file. The index is written to a temporary file first and then renamed,
+    so a running bot never sees a partly written index.
+
+    Args:
+        places: Iterable of (name, latitude, longitude, kind) tuples, as yielded by read_geonames
+        index_path: Path of the index file to write
+        cell_degrees: Size of the grid cells in degrees of latitude and longitude
+
+    Returns:
+        Number of places in the index
+    """
+    columns = _grid_size(cell_degrees)[1]
+    keyed_places = []
+    for name, latitude, longitude, kind in places:
+        row, column = _cell_position(latitude, longitude, cell_degrees)
+        keyed_places.append((row * columns + column, name, latitude, longitude, kind))
+    keyed_places.sort(key=lambda place: place[0])
+    cell_keys = array('q')
+    cell_starts = array('I')
+    xs, ys, zs = array('f'), array('f'), array('f')
+    name_offsets = array('I', [0])
+    kinds = array('B')
+    names = bytearray()
+    for place_number, (key, name, latitude, longitude, kind) in enumerate(keyed_places):
+        if not cell_keys or cell_keys[-1] != key:
+            cell_keys.append(key)
+            cell_starts.append(place_number)
+        x, y, z = _unit_vector(latitude, longitude)
+        xs.append(x)
+        ys.append(y)
+        zs.append(z)
+        names += name.encode()
+        name_offsets.append(len(names))
+        kinds.append(kind)
+    cell_starts.append(len(keyed_places))
+    temp_path = f'{index_path}.tmp'
+    with open(temp_path, 'wb') as index_file:
+        index_file.write(_INDEX_HEADER.pack(INDEX_MAGIC, len(keyed_places), len(cell_keys),
+                                            cell_degrees, len(names)))
+        for section in (cell_keys, cell_starts, xs, ys, zs, name_offsets, kinds):
+            section_bytes = _little_endian(section)
+            index_file.write(section_bytes + _padding(len(section_bytes)))
+        index_file.write(names)
+    os.replace(temp_path, index_path)
+    logger.info(f"Built place index {index_path} with {len(keyed_places)} places in "
+                f"{len(cell_keys)} cells")
+    return len(keyed_places)
+
+
+def distance_km(latitude_1: float, longitude_1: float,
+                latitude_2: float, longitude_2: float) -> float:
+    """Great-circle distance between two positions, in kilometres"""
+    latitude_1, longitude_1, latitude_2, longitude_2 = map(
+        math.radians, (latitude_1, longitude_1, latitude_2, longitude_2))
+    haversine = (math.sin((latitude_2 - latitude_1) / 2) ** 2 +
+                 math.cos(latitude_1) * math.cos(latitude_2) *
+                 math.sin((longitude_2 - longitude_1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(haversine)))
+
+
+class PlaceIndex:
+    """
+    Memory-mapped place index answering nearest-place queries. The index file is opened on the
+    first query, not when the object is created.
+
+    simple usage example:
+
+    build_place_index(read_geonames('cities500.txt'), 'cities500.asbidx')
+    index = PlaceIndex('cities500.asbidx')
+    place, city = index.nearest(33.45, -112.07, max_distance_km=25)
+    """
+
+    def __init__(self, index_path: str):
+        """
+        Args:
+            index_path: Path of an index file written by build_place_index
+        """
+        self.index_path = index_path
+        self.place_count = 0
+        self.cell_degrees = DEFAULT_CELL_DEGREES
+        self._lock = threading.Lock()
+        self._mmap: mmap.mmap | None = None
+        self._sections: dict[str, memoryview | array] = {}
+
+    def _load(self):
+        """
+        Memory-map the index file, if it is not already
+
+        Raises:
+            ValueError: If the file is not a place index
+        """
+        with self._lock:
+            if self._mmap is not None:
+                return
+            with open(self.index_path, 'rb') as index_file:
+                index_map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                magic, place_count, cell_count, cell_degrees, names_size = \
+                    _INDEX_HEADER.unpack_from(index_map)
+            except struct.error as struct_error:
+                index_map.close()
+                raise ValueError(f"{self.index_path} is not an airspotbot place index") \
+                    from struct_error
+            if magic != INDEX_MAGIC:
+                index_map.close()
+                raise ValueError(f"{self.index_path} is not an airspotbot place index")
+            offset = _INDEX_HEADER.size
+            sections = {}
+            for name, typecode, length in (('cell_keys', 'q', cell_count),
+                                           ('cell_starts', 'I', cell_count + 1),
+                                           ('xs', 'f', place_count),
+                                           ('ys', 'f', place_count),
+                                           ('zs', 'f', place_count),
+                                           ('name_offsets', 'I', place_count + 1),
+                                           ('kinds', 'B', place_count)):
+                size = length * array(typecode).itemsize
+                section = memoryview(index_map)[offset:offset + size]
+                if sys.byteorder == 'little':
+                    sections[name] = section.cast(typecode)
+                else:
+                    sections[name] = array(typecode, section.tobytes())
+                    sections[name].byteswap()
+                offset += size + len(_padding(size))
+            sections['names'] = memoryview(index_map)[offset:offset + names_size]
+            self._sections = sections
+            self.place_count = place_count
+            self.cell_degrees = cell_degrees
+            self._mmap = index_map
+            logger.info(f"Loaded place index {self.index_path} with {place_count} places")
+
+    def close(self):
+        with self._lock:
+            if self._mmap is not None:
+                for section in self._sections.values():
+                    if isinstance(section, memoryview):
+                        section.release()
+                self._sections = {}
+                self._mmap.close()
+                self._mmap = None
+
+    def _name(self, place_number: int) -> str:
+        name_offsets = self._sections['name_offsets']
+        return bytes(self._sections['names'][name_offsets[place_number]:
+                                             name_offsets[place_number + 1]]).decode()
+
+    def _row_cells(self, row: int, first_column: int, last_column: int) -> range:
+        """Range of the numbers of the non-empty cells in part of a grid row. The whole row is
+        used if the columns wrap around the antimeridian."""
+        columns = _grid_size(self.cell_degrees)[1]
+        if first_column < 0 or last_column >= columns:
+            first_column, last_column = 0, columns - 1
+        cell_keys = self._sections['cell_keys']
+        return range(bisect.bisect_left(cell_keys, row * columns + first_column),
+                     bisect.bisect_right(cell_keys, row * columns + last_column))
+
+    def _cell_places(self, row: int, column: int, row_cells: range) -> range:
+        """Range of the numbers of the places in a grid cell, searching only the cells in
+        row_cells"""
+        cell_keys = self._sections['cell_keys']
+        key = row * _grid_size(self.cell_degrees)[1] + column
+        cell_number = bisect.bisect_left(cell_keys, key, row_cells.start, row_cells.stop)
+        if cell_number == row_cells.stop or cell_keys[cell_number] != key:
+            return range(0)
+        cell_starts = self._sections['cell_starts']
+        return range(cell_starts[cell_number], cell_starts[cell_number + 1])
+
+    def nearest(self, latitude: float, longitude: float,
+                max_distance_km: float = DEFAULT_MAX_DISTANCE_KM) -> tuple[str | None, str | None]:
+        """
+        Find the nearest place of any kind and the nearest city to a position. Grid cells are
+        searched in rings of increasing distance around the position, until no cell further out
+        can contain anything closer than what has been found.
+
+        Args:
+            latitude: Latitude in decimal degrees (-90 to 90)
+            longitude: Longitude in decimal degrees (-180 to 180)
+            max_distance_km: Places further away than this are ignored
+
+        Returns:
+            Tuple of the names of the nearest place and the nearest city, each None if there is
+            none within max_distance_km
+        """
+        self._load()
+        rows, columns = _grid_size(self.cell_degrees)
+        row, column = _cell_position(latitude, longitude, self.cell_degrees)
+        cell_km = math.radians(self.cell_degrees) * EARTH_RADIUS_KM
+        row_rings = math.ceil(max_distance_km / cell_km)
+        # cells get narrower towards the poles, so use the narrowest width within reach
+        narrowest_latitude = min(89.9, abs(latitude) + (row_rings + 1) * self.cell_degrees)
+        column_km = cell_km * math.cos(math.radians(narrowest_latitude))
+        column_rings = min(columns // 2, math.ceil(max_distance_km / column_km))
+        xs, ys, zs = self._sections['xs'], self._sections['ys'], self._sections['zs']
+        kinds = self._sections['kinds']
+        x, y, z = _unit_vector(latitude, longitude)
+        # distances are compared as squared chords on the unit sphere
+        nearest_place = nearest_city = None
+        place_distance = city_distance = _chord(max_distance_km) ** 2
+        # non-empty cells within reach in each row, so empty rows are skipped after one lookup
+        row_cells = {}
+        for ring in range(max(row_rings, column_rings) + 1):
+            # every place in this ring is at least (ring - 1) cells away
+            if ring > 1 and _chord((ring - 1) * min(cell_km, column_km)) ** 2 > \
+                    max(place_distance, city_distance):
+                break
+            for ring_row in range(row - min(ring, row_rings), row + min(ring, row_rings) + 1):
+                if not 0 <= ring_row < rows:
+                    continue
+                if ring_row not in row_cells:
+                    row_cells[ring_row] = self._row_cells(ring_row, column - column_rings,
+                                                          column + column_rings)
+                if not row_cells[ring_row]:
+                    continue
+                on_edge_row = abs(ring_row - row) == ring
+                column_step = 1 if on_edge_row else 2 * ring
+                for ring_column in range(column - ring, column + ring + 1, max(1, column_step)):
+                    if abs(ring_column - column) > column_rings:
+                        continue
+                    places = self._cell_places(ring_row, ring_column % columns,
+                                               row_cells[ring_row])
+                    if not places:
+                        continue
+                    for place_number, place_x, place_y, place_z, kind in zip(
+                            places, xs[places.start:places.stop].tolist(),
+                            ys[places.start:places.stop].tolist(),
+                            zs[places.start:places.stop].tolist(),
+                            kinds[places.start:places.stop].tolist()):
+                        distance = ((place_x - x) ** 2 + (place_y - y) ** 2 +
+                                    (place_z - z) ** 2)
+                        if distance <= place_distance:
+                            place_distance = distance
+                            nearest_place = place_number
+                        if kind == KIND_CITY and distance <= city_distance:
+                            city_distance = distance
+                            nearest_city = place_number
+        return (None if nearest_place is None else self._name(nearest_place),
+                None if nearest_city is None else self._name(nearest_city))
+
+
+def index_is_stale(index_path: str, dump_path: str | None) -> bool:
+    """Return whether an index file is missing or older than the dump it is built from"""
+    if not os.path.exists(index_path):
+        return True
+    return dump_path is not None and os.path.exists(dump_path) and \
+        os.path.getmtime(dump_path) > os.path.getmtime(index_path)
+
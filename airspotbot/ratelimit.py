@@ -0,0 +1,126 @@
+"""
+This module contains the token-bucket rate limiter used to keep reverse geocoding requests within
+the limits of the geocoding APIs. A bucket holds up to `burst` tokens and is refilled at `rate`
+tokens per second; each request takes a token and only waits when the bucket is empty. Unlike a
+fixed delay before every request, an occasional lookup is sent straight away, and only a burst of
+lookups (e.g. several aircraft spotted in the same poll) is spread out.
+
+When an API signals that it is limiting requests, the limiter backs off: no requests are sent for
+a back-off period that doubles with every consecutive rate-limited response, up to a maximum, and
+is reset by the next successful response.
+"""
+
+import logging
+import threading
+from time import monotonic, sleep
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WAIT_SECONDS = 10.0
+DEFAULT_BACKOFF_SECONDS = 5.0
+MAX_BACKOFF_SECONDS = 300.0
+
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter, shared by all requests to one API.
+
+    simple usage example:
+
+    limiter = TokenBucket(rate=1, burst=1)
+    if limiter.acquire():
+        response = send_request()
+        if response_is_rate_limit_page(response):
+            limiter.back_off()
+        else:
+            limiter.reset_back_off()
+    """
+
+    def __init__(self, rate: float, burst: int = 1, name: str = 'API',
+                 max_wait_seconds: float = DEFAULT_MAX_WAIT_SECONDS,
+                 clock: Callable[[], float] = monotonic,
+                 sleep_function: Callable[[float], object] = sleep):
+        """
+        Args:
+            rate: Number of requests allowed per second, on average
+            burst: Number of requests that can be sent at once after a quiet period
+            name: Name of the API, used in log messages
+            max_wait_seconds: acquire() gives up rather than wait longer than this
+            clock: Function returning the current time in seconds
+            sleep_function: Function used to wait, taking a number of seconds
+
+        Raises:
+            ValueError: If rate is not positive or burst is less than 1
+        """
+        if rate <= 0:
+            raise ValueError("Rate limit must be a positive number of requests per second")
+        if burst < 1:
+            raise ValueError("Rate limit burst must be at least 1")
+        self.rate = rate
+        self.burst = burst
+        self.name = name
+        self.max_wait_seconds = max_wait_seconds
+        self.clock = clock
+        self.sleep = sleep_function
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._blocked_until = 0.0
+        self._backoff_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        """Add the tokens accumulated since the last update. While backing off, the last update
+        is the end of the back-off period, so nothing accumulates until then."""
+        if now > self._updated:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def acquire(self) -> bool:
+        """
+        Take a token, waiting until one is available if the bucket is empty. Waiting callers
+        reserve their token up front, so concurrent callers are spaced out rather than woken at
+        the same time.
+
+        Returns:
+            True if a request can be sent, False if it would have to wait longer than
+            max_wait_seconds, because the API is being backed off from or many requests are
+            already waiting
+        """
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            # time until the end of any back-off period, then until the next token
+            wait_seconds = max(0.0, self._updated - now) + \
+                max(0.0, (1 - self._tokens) / self.rate)
+            if wait_seconds > self.max_wait_seconds:
+                if now < self._blocked_until:
+                    logger.warning(f"Backing off from {self.name} for another "
+                                   f"{self._blocked_until - now:0.0f} seconds, skipping request")
+                else:
+                    logger.warning(f"{self.name} rate limit would delay request by "
+                                   f"{wait_seconds:0.1f} seconds, skipping request")
+                return False
+            self._tokens -= 1
+        if wait_seconds > 0:
+            logger.debug(f"Waiting {wait_seconds:0.2f} seconds for {self.name} rate limit")
+            self.sleep(wait_seconds)
+        return True
+
+    def back_off(self):
+        """Stop handing out tokens for a back-off period, doubling the period if the last
+        response was also rate limited. Requests already waiting for a token are not recalled."""
+        with self._lock:
+            self._backoff_seconds = min(MAX_BACKOFF_SECONDS,
+                                        self._backoff_seconds * 2 or DEFAULT_BACKOFF_SECONDS)
+            self._blocked_until = self.clock() + self._backoff_seconds
+            # one request may be sent when the back-off period ends, then the bucket refills
+            self._updated = self._blocked_until
+            self._tokens = 1.0
+        logger.warning(f"{self.name} is limiting requests, backing off for "
+                       f"{self._backoff_seconds:0.0f} seconds")
+
+    def reset_back_off(self):
+        """Reset the back-off period after a successful response"""
+        with self._lock:
+            self._backoff_seconds = 0.0
@@ -0,0 +1,168 @@
+"""
+This module contains functionality for spotting aircraft in several circular regions with a single
+airspotbot process. Overlapping regions are coalesced into the smallest set of ADSBx
+lat/lon/dist queries that covers all of them, and aircraft returned by a coalesced query are then
+split back into the regions they are actually in.
+"""
+
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_NAUTICAL_MILES = 3440.065
+MAX_QUERY_RADIUS_NAUTICAL_MILES = 250  # largest radius accepted by the ADSBx API
+
+
+def distance_nautical_miles(latitude_a: float, longitude_a: float,
+                            latitude_b: float, longitude_b: float) -> float:
+    """Return the great-circle (haversine) distance between two points in nautical miles"""
+    phi_a = math.radians(latitude_a)
+    phi_b = math.radians(latitude_b)
+    d_phi = phi_b - phi_a
+    d_lambda = math.radians(longitude_b - longitude_a)
+    h = math.sin(d_phi / 2) ** 2 + math.cos(phi_a) * math.cos(phi_b) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_NAUTICAL_MILES * math.asin(min(1.0, math.sqrt(h)))
+
+
+def intermediate_point(latitude_a: float, longitude_a: float,
+                       latitude_b: float, longitude_b: float,
+                       fraction: float) -> tuple[float, float]:
+    """
+    Return the point at the given fraction of the great-circle path from point a to point b.
+
+    Args:
+        latitude_a: latitude of start point in decimal degrees
+        longitude_a: longitude of start point in decimal degrees
+        latitude_b: latitude of end point in decimal degrees
+        longitude_b: longitude of end point in decimal degrees
+        fraction: 0 returns point a, 1 returns point b
+
+    Returns:
+        Tuple of (latitude, longitude) in decimal degrees
+    """
+    angular_distance = distance_nautical_miles(latitude_a, longitude_a, latitude_b,
+                                               longitude_b) / EARTH_RADIUS_NAUTICAL_MILES
+    if angular_distance == 0:
+        return latitude_a, longitude_a
+    phi_a, lambda_a = math.radians(latitude_a), math.radians(longitude_a)
+    phi_b, lambda_b = math.radians(latitude_b), math.radians(longitude_b)
+    a = math.sin((1 - fraction) * angular_distance) / math.sin(angular_distance)
+    b = math.sin(fraction * angular_distance) / math.sin(angular_distance)
+    x = a * math.cos(phi_a) * math.cos(lambda_a) + b * math.cos(phi_b) * math.cos(lambda_b)
+    y = a * math.cos(phi_a) * math.sin(lambda_a) + b * math.cos(phi_b) * math.sin(lambda_b)
+    z = a * math.sin(phi_a) + b * math.sin(phi_b)
+    return (math.degrees(math.atan2(z, math.sqrt(x ** 2 + y ** 2))),
+            math.degrees(math.atan2(y, x)))
+
+
+class SpotRegion:
+    """Class for storing a named circular spotting region"""
+
+    def __init__(self, name: str, latitude: float, longitude: float, radius_nautical_miles: int):
+        self.name = name
+        self.latitude = latitude
+        self.longitude = longitude
+        self.radius_nautical_miles = radius_nautical_miles
+
+    def contains(self, latitude: float, longitude: float) -> bool:
+        """Return True if the given point is inside this region"""
+        return distance_nautical_miles(self.latitude, self.longitude,
+                                       latitude, longitude) <= self.radius_nautical_miles
+
+
+class RegionQuery:
+    """Class for storing a single ADSBx lat/lon/dist query circle, covering one or more
+    SpotRegions"""
+
+    def __init__(self, latitude: float, longitude: float, radius_nautical_miles: int,
+                 regions: list[SpotRegion]):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.radius_nautical_miles = radius_nautical_miles
+        self.regions = regions
+
+    @property
+    def needs_local_filter(self) -> bool:
+        """True if aircraft returned by this query must be split/filtered by region locally,
+        i.e. if the query circle is not identical to that of its only region"""
+        if len(self.regions) != 1:
+            return True
+        region = self.regions[0]
+        return (region.latitude, region.longitude, region.radius_nautical_miles) != \
+               (self.latitude, self.longitude, self.radius_nautical_miles)
+
+    def region_for(self, latitude: float, longitude: float) -> SpotRegion | None:
+        """Return the first region of this query that contains the given point, or None"""
+        for region in self.regions:
+            if region.contains(latitude, longitude):
+                return region
+        return None
+
+
+def _enclosing_query(first: RegionQuery, second: RegionQuery) -> RegionQuery:
+    """Return the smallest query circle enclosing both queries' circles, covering all of their
+    regions"""
+    distance = distance_nautical_miles(first.latitude, first.longitude,
+                                       second.latitude, second.longitude)
+    regions = first.regions + second.regions
+    if distance + second.radius_nautical_miles <= first.radius_nautical_miles:
+        latitude, longitude = first.latitude, first.longitude
+    elif distance + first.radius_nautical_miles <= second.radius_nautical_miles:
+        latitude, longitude = second.latitude, second.longitude
+    else:
+        enclosing_radius = (distance + first.radius_nautical_miles +
+                            second.radius_nautical_miles) / 2
+        latitude, longitude = intermediate_point(
+            first.latitude, first.longitude, second.latitude, second.longitude,
+            (enclosing_radius - first.radius_nautical_miles) / distance)
+    # measure the radius against the original regions, rounding up to the integer the API accepts
+    radius = max(distance_nautical_miles(latitude, longitude, r.latitude, r.longitude)
+                 + r.radius_nautical_miles for r in regions)
+    return RegionQuery(latitude=round(latitude, 6),
+                       longitude=round(longitude, 6),
+                       radius_nautical_miles=math.ceil(radius - 1e-9),
+                       regions=regions)
+
+
+def coalesce_regions(regions: list[SpotRegion],
+                     max_radius: int = MAX_QUERY_RADIUS_NAUTICAL_MILES) -> list[RegionQuery]:
+    """
+    Merge overlapping regions into as few query circles as possible. Two query circles are merged
+    when they overlap and the circle enclosing both does not exceed max_radius.
+
+    Args:
+        regions: List of SpotRegion objects to cover
+        max_radius: Largest allowed query radius in nautical miles
+
+    Returns:
+        List of RegionQuery objects which together cover every region
+    """
+    queries = [RegionQuery(r.latitude, r.longitude, r.radius_nautical_miles, [r])
+               for r in regions]
+    merged = True
+    while merged:
+        merged = False
+        best = None
+        for i, first in enumerate(queries):
+            for j in range(i + 1, len(queries)):
+                second = queries[j]
+                distance = distance_nautical_miles(first.latitude, first.longitude,
+                                                   second.latitude, second.longitude)
+                if distance >= first.radius_nautical_miles + second.radius_nautical_miles:
+                    continue  # circles do not overlap
+                candidate = _enclosing_query(first, second)
+                if candidate.radius_nautical_miles > max_radius:
+                    continue
+                # prefer the merge that produces the smallest enclosing circle
+                if best is None or candidate.radius_nautical_miles < best[2].radius_nautical_miles:
+                    best = (i, j, candidate)
+        if best is not None:
+            i, j, candidate = best
+            queries = [q for k, q in enumerate(queries) if k not in (i, j)] + [candidate]
+            merged = True
+    for query in queries:
+        logger.debug(f"Query circle {query.latitude}, {query.longitude} radius "
+                     f"{query.radius_nautical_miles} nm covers regions "
+                     f"{[r.name for r in query.regions]}")
+    return queries
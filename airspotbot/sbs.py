@@ -0,0 +1,299 @@
+"""
+This module contains a streaming aircraft source for SBS-1 (BaseStation) format feeds, such as
+the one served on TCP port 30003 by dump1090, readsb and most other ADS-B decoders.
+
+Each line of the feed is a comma separated message carrying a subset of an aircraft's state
+(callsign, altitude, speed, position, ground status...). SbsParser parses the feed incrementally
+into a per-hex state table, and SbsSource keeps it up-to-date from a background thread. When the
+Spotter polls the source, the state table is converted to raw aircraft dictionaries in the ADSBx
+v2 format and filtered to the spotting regions, like the other sources in sources.py.
+
+Unlike polled sources, SbsSource signals through wait_for_update() when a new aircraft appears
+or an aircraft reports its first position, so the main loop can check it for spots straight away
+instead of waiting for the rest of adsb_interval.
+
+SBS-1 messages do not include registration numbers, type codes or ADSBx flags, so on their own
+they only support spotting by ICAO address (including IR ranges) and unknown registration.
+"""
+
+import logging
+import socket
+import threading
+from time import time
+from typing import Callable
+
+from .regions import SpotRegion
+from .sources import AircraftSource, DEFAULT_MAX_POSITION_AGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SBS_PORT = 30003
+DEFAULT_RECONNECT_SECONDS = 5
+# aircraft not heard from for this long are dropped from the state table
+STATE_EXPIRY_SECONDS = 300
+
+# field positions in an SBS-1 MSG line
+_HEX = 4
+_CALLSIGN = 10
+_ALTITUDE = 11
+_GROUND_SPEED = 12
+_TRACK = 13
+_LATITUDE = 14
+_LONGITUDE = 15
+_SQUAWK = 17
+_ON_GROUND = 21
+
+
+class SbsAircraft:
+    """Latest known state of one aircraft, accumulated from SBS-1 messages"""
+
+    __slots__ = ('hex_code', 'callsign', 'altitude_ft', 'ground_speed', 'track', 'latitude',
+                 'longitude', 'squawk', 'grounded', 'last_seen', 'last_position')
+
+    def __init__(self, hex_code: str):
+        self.hex_code = hex_code
+        self.callsign: str | None = None
+        self.altitude_ft: int | None = None
+        self.ground_speed: float | None = None
+        self.track: float | None = None
+        self.latitude: float | None = None
+        self.longitude: float | None = None
+        self.squawk: str | None = None
+        self.grounded = False
+        self.last_seen = 0.0
+        self.last_position: float | None = None
+
+    def to_raw(self, now: float) -> dict:
+        """Return the state as a raw aircraft dictionary in the ADSBx v2 format"""
+        raw_aircraft = {'hex': self.hex_code, 'seen': round(now - self.last_seen, 1)}
+        if self.callsign is not None:
+            raw_aircraft['flight'] = self.callsign
+        if self.grounded:
+            raw_aircraft['alt_baro'] = 'ground'
+        elif self.altitude_ft is not None:
+            raw_aircraft['alt_baro'] = self.altitude_ft
+        if self.ground_speed is not None:
+            raw_aircraft['gs'] = self.ground_speed
+        if self.track is not None:
+            raw_aircraft['track'] = self.track
+        if self.last_position is not None:
+            raw_aircraft['lat'] = self.latitude
+            raw_aircraft['lon'] = self.longitude
+            raw_aircraft['seen_pos'] = round(now - self.last_position, 1)
+        if self.squawk is not None:
+            raw_aircraft['squawk'] = self.squawk
+        return raw_aircraft
+
+
+class SbsParser:
+    """
+    Incremental parser of an SBS-1 byte stream into a per-hex state table. Data can be fed in
+    chunks of any size; incomplete lines are kept until the rest of the line arrives.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time):
+        """
+        Args:
+            clock: Function returning the current time in seconds since the epoch
+        """
+        self.clock = clock
+        self.aircraft: dict[str, SbsAircraft] = {}
+        self.message_count = 0
+        self.error_count = 0  # malformed numeric fields
+        self._partial = b''
+
+    def feed(self, data: bytes) -> int:
+        """
+        Parse a chunk of the feed.
+
+        Args:
+            data: Bytes received from the feed
+
+        Returns:
+            Number of messages in this chunk from new aircraft, or with the first position of
+            an aircraft
+        """
+        lines = (self._partial + data).split(b'\n')
+        self._partial = lines.pop()
+        now = self.clock()
+        qualifying = 0
+        for line in lines:
+            if line:
+                qualifying += self.parse_line(line.decode('ascii', 'replace'), now)
+        return qualifying
+
+    def parse_line(self, line: str, now: float) -> bool:
+        """
+        Apply one SBS-1 message to the state table.
+
+        Returns:
+            True if the message was the first from a new aircraft, or its first position
+        """
+        fields = line.rstrip('\r').split(',')
+        if len(fields) <= _ON_GROUND or fields[0] != 'MSG' or not fields[_HEX]:
+            return False
+        self.message_count += 1
+        hex_code = fields[_HEX].lower()
+        state = self.aircraft.get(hex_code)
+        qualifying = state is None
+        if state is None:
+            state = self.aircraft[hex_code] = SbsAircraft(hex_code)
+        state.last_seen = now
+        # each field is parsed on its own, so one malformed value does not discard the others
+        if fields[_CALLSIGN]:
+            state.callsign = fields[_CALLSIGN].strip()
+        altitude_ft = self._number(fields[_ALTITUDE], int)
+        if altitude_ft is not None:
+            state.altitude_ft = altitude_ft
+        ground_speed = self._number(fields[_GROUND_SPEED], float)
+        if ground_speed is not None:
+            state.ground_speed = ground_speed
+        track = self._number(fields[_TRACK], float)
+        if track is not None:
+            state.track = track
+        latitude = self._number(fields[_LATITUDE], float)
+        longitude = self._number(fields[_LONGITUDE], float)
+        if latitude is not None and longitude is not None:
+            state.latitude = latitude
+            state.longitude = longitude
+            if state.last_position is None:
+                qualifying = True
+            state.last_position = now
+        if fields[_SQUAWK]:
+            state.squawk = fields[_SQUAWK]
+        if fields[_ON_GROUND]:
+            # on-ground flag is -1 (or 1 in some decoders) for true and 0 for false
+            state.grounded = fields[_ON_GROUND] != '0'
+        return qualifying
+
+    def _number(self, field: str, convert: Callable[[str], int | float]) -> int | float | None:
+        """
+        Convert a numeric field of a message, counting malformed values in self.error_count.
+
+        Returns:
+            The converted value, or None if the field is empty or malformed
+        """
+        if not field:
+            return None
+        try:
+            return convert(field)
+        except ValueError:
+            self.error_count += 1
+            return None
+
+    def expire(self, cutoff_time: float):
+        """Drop aircraft not heard from since the cutoff time"""
+        for hex_code in [h for h, a in self.aircraft.items() if a.last_seen < cutoff_time]:
+            del self.aircraft[hex_code]
+
+
+class SbsSource(AircraftSource):
+    """
+    Aircraft source streaming an SBS-1 TCP feed. A background thread connects to the feed (and
+    reconnects if the connection is lost) and parses it into the state table as it arrives.
+
+    simple usage example:
+
+    source = SbsSource('localhost', 30003, regions)
+    while True:
+        source.wait_for_update(adsb_interval)
+        aircraft_nearby = source.fetch()
+    """
+
+    streaming = True
+
+    def __init__(self, host: str, port: int, regions: list[SpotRegion],
+                 max_position_age: float = DEFAULT_MAX_POSITION_AGE_SECONDS,
+                 reconnect_seconds: float = DEFAULT_RECONNECT_SECONDS,
+                 clock: Callable[[], float] = time):
+        """
+        Args:
+            host: Host name or address of the SBS-1 feed
+            port: TCP port of the SBS-1 feed, usually 30003
+            regions: Spotting regions to filter aircraft by
+            max_position_age: Aircraft whose position was last updated more than this many
+                seconds ago are ignored
+            reconnect_seconds: Delay before reconnecting after the connection is lost
+            clock: Function returning the current time in seconds since the epoch
+        """
+        self.host = host
+        self.port = port
+        self.description = f'SBS-1 feed at {host}:{port}'
+        self.regions = regions
+        self.max_position_age = max_position_age
+        self.reconnect_seconds = reconnect_seconds
+        self.parser = SbsParser(clock)
+        self._lock = threading.Lock()
+        self._updated = threading.Event()
+        self._stop = threading.Event()
+        self._socket: socket.socket | None = None
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        """Start the background thread reading the feed, if it is not running yet"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._read_feed, name='sbs-feed', daemon=True)
+            self._thread.start()
+
+    def _read_feed(self):
+        while not self._stop.is_set():
+            try:
+                with socket.create_connection((self.host, self.port),
+                                              timeout=self.reconnect_seconds) as connection:
+                    connection.settimeout(None)
+                    self._socket = connection
+                    logger.info(f'Connected to {self.description}')
+                    while not self._stop.is_set():
+                        data = connection.recv(65536)
+                        if not data:
+                            break
+                        with self._lock:
+                            qualifying = self.parser.feed(data)
+                        if qualifying:
+                            self._updated.set()
+                if not self._stop.is_set():
+                    logger.warning(f'Connection to {self.description} closed')
+            except OSError:
+                if self._stop.is_set():
+                    break
+                logger.warning(f'Error reading {self.description}', exc_info=True)
+            finally:
+                self._socket = None
+            self._stop.wait(self.reconnect_seconds)
+
+    def wait_for_update(self, timeout: float) -> bool:
+        self.start()
+        updated = self._updated.wait(timeout)
+        self._updated.clear()
+        return updated
+
+    def fetch(self) -> list[tuple[dict, str | None]]:
+        self.start()
+        now = self.parser.clock()
+        region_aircraft = []
+        with self._lock:
+            self.parser.expire(now - STATE_EXPIRY_SECONDS)
+            for state in self.parser.aircraft.values():
+                if state.last_position is None or \
+                        now - state.last_position > self.max_position_age:
+                    continue
+                for region in self.regions:
+                    if region.contains(state.latitude, state.longitude):
+                        region_aircraft.append((state.to_raw(now), region.name))
+                        break
+            message_count = self.parser.message_count
+        self.snapshot_time = now
+        logger.info(f'{len(region_aircraft)} aircraft in spotting area, {message_count} '
+                    f'messages received from {self.description}')
+        return region_aircraft
+
+    def close(self):
+        self._stop.set()
+        connection = self._socket
+        if connection is not None:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,201 @@
+"""
+This module contains the SeenCache class, which records when each aircraft was last spotted so the
+Spotter can enforce the re-spotting cooldown.
+
+Entries are kept in the order they were spotted. Since every entry has the same cooldown, the
+oldest entry always expires first, so expiring entries only needs to look at the front of the
+cache rather than scanning every tracked aircraft on each poll.
+
+The cache can optionally be backed by a SeenStore, so spots survive a restart of airspotbot
+instead of every aircraft in range being tweeted again. The store is read lazily on first use,
+and changes are written in one batch per poll by SeenCache.flush().
+"""
+
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+
+class SeenCache:
+    """
+    Time-ordered mapping of ICAO hex code to the time (in seconds since the epoch) the aircraft
+    was spotted. Supports the dictionary operations used by the Spotter (in, [], del, pop, len)
+    plus expire(), which removes entries older than a cutoff time.
+
+    Spot times must be added in non-decreasing order, which is always the case when they come
+    from the current time.
+    """
+
+    def __init__(self, store: "SeenStore | None" = None):
+        """
+        Args:
+            store: Optional SeenStore used to persist entries across restarts
+        """
+        self._entries: OrderedDict[str, float] = OrderedDict()
+        self.evictions = 0  # total number of entries removed by expire()
+        self.store = store
+        self._loaded = store is None
+        # changes not yet written to the store
+        self._pending_upserts: dict[str, float] = {}
+        self._pending_deletes: set[str] = set()
+
+    def _ensure_loaded(self):
+        """Read entries from the store on first use"""
+        if self._loaded:
+            return
+        self._loaded = True
+        stored_entries = sorted(self.store.load(), key=lambda entry: entry[1])
+        for hex_code, seen_time in stored_entries:
+            self._entries[hex_code] = seen_time
+        logger.info(f"Loaded {len(stored_entries)} previously spotted aircraft from "
+                    f"{self.store.description}")
+
+    def _mark_deleted(self, hex_code: str):
+        if self.store is not None:
+            self._pending_upserts.pop(hex_code, None)
+            self._pending_deletes.add(hex_code)
+
+    def __contains__(self, hex_code: str) -> bool:
+        self._ensure_loaded()
+        return hex_code in self._entries
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        self._ensure_loaded()
+        return iter(self._entries)
+
+    def __getitem__(self, hex_code: str) -> float:
+        self._ensure_loaded()
+        return self._entries[hex_code]
+
+    def __setitem__(self, hex_code: str, seen_time: float):
+        self._ensure_loaded()
+        # re-spotting an aircraft moves it to the back of the cache, keeping entries in time order
+        self._entries[hex_code] = seen_time
+        self._entries.move_to_end(hex_code)
+        if self.store is not None:
+            self._pending_deletes.discard(hex_code)
+            self._pending_upserts[hex_code] = seen_time
+
+    def __delitem__(self, hex_code: str):
+        self._ensure_loaded()
+        del self._entries[hex_code]
+        self._mark_deleted(hex_code)
+
+    def pop(self, hex_code: str, default=None) -> float | None:
+        """Remove an entry and return its spot time, or default if it is not present"""
+        self._ensure_loaded()
+        if hex_code in self._entries:
+            self._mark_deleted(hex_code)
+        return self._entries.pop(hex_code, default)
+
+    def items(self):
+        self._ensure_loaded()
+        return self._entries.items()
+
+    def expire(self, cutoff_time: float) -> list[str]:
+        """
+        Remove all entries spotted before the cutoff time. Only expired entries (and the first
+        unexpired one) are examined.
+
+        Args:
+            cutoff_time: Entries with a spot time earlier than this are removed
+
+        Returns:
+            List of the hex codes that were removed, oldest first
+        """
+        self._ensure_loaded()
+        expired = []
+        while self._entries:
+            hex_code, seen_time = next(iter(self._entries.items()))
+            if seen_time >= cutoff_time:
+                break
+            self._entries.popitem(last=False)
+            self._mark_deleted(hex_code)
+            expired.append(hex_code)
+        self.evictions += len(expired)
+        return expired
+
+    def stats(self) -> dict[str, int]:
+        """Return the current number of entries and the total number of evictions"""
+        return {'size': len(self._entries), 'evictions': self.evictions}
+
+    def flush(self):
+        """Write all changes made since the last flush to the store in a single batch. Does
+        nothing if the cache has no store."""
+        if self.store is None or not (self._pending_upserts or self._pending_deletes):
+            return
+        upserts, self._pending_upserts = self._pending_upserts, {}
+        deletes, self._pending_deletes = self._pending_deletes, set()
+        self.store.apply(upserts, deletes)
+
+
+class SeenStore:
+    """Base class for on-disk storage of SeenCache entries. Subclasses implement load() and
+    apply()."""
+
+    description = 'seen store'
+
+    def load(self) -> list[tuple[str, float]]:
+        """Return all stored (hex code, spot time) entries"""
+        raise NotImplementedError
+
+    def apply(self, upserts: dict[str, float], deletes: set[str]):
+        """
+        Write one batch of changes.
+
+        Args:
+            upserts: Mapping of hex code to spot time for entries added or updated
+            deletes: Hex codes of entries removed
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SqliteSeenStore(SeenStore):
+    """SeenStore backed by a SQLite database in WAL mode, so each batch is a single small append
+    to the write-ahead log"""
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: Path of the SQLite database file, created if it does not exist
+        """
+        self.description = str(db_path)
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        # the engine calls check_spots from worker threads, so the connection is shared between
+        #  threads and guarded by a lock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS seen '
+                                     '(hex_code TEXT PRIMARY KEY, seen_time REAL NOT NULL)')
+
+    def load(self) -> list[tuple[str, float]]:
+        with self._lock:
+            return self._connection.execute('SELECT hex_code, seen_time FROM seen').fetchall()
+
+    def apply(self, upserts: dict[str, float], deletes: set[str]):
+        with self._lock, self._connection:
+            if deletes:
+                self._connection.executemany('DELETE FROM seen WHERE hex_code = ?',
+                                             ((hex_code,) for hex_code in deletes))
+            if upserts:
+                self._connection.executemany('INSERT OR REPLACE INTO seen VALUES (?, ?)',
+                                             upserts.items())
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,120 @@
+"""
+This module contains snapshot diffing for the Spotter. Consecutive ADSBx responses mostly contain
+the same aircraft, so the Spotter keeps a compact state table of the previous snapshot, with one
+tuple of spotting-relevant fields per hex code, and classifies each new snapshot into aircraft
+that entered, left, were updated or are unchanged. Only entered and updated aircraft need to go
+through the spotting rules again.
+
+An aircraft counts as updated when a field that could change whether or how it is spotted
+changes: its registration, type code, ADSBx flags, spotting region, ground status or callsign, or
+when its altitude crosses into a different altitude band. Position and speed changes alone do not
+count.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ALTITUDE_BAND_FEET = 1000
+
+
+class SnapshotDiff:
+    """
+    Classification of one snapshot against the previous one.
+
+    Attributes:
+        entered: (raw aircraft, region name) of aircraft not in the previous snapshot. Aircraft
+            without a hex code cannot be tracked, and are always classified as entered.
+        updated: (raw aircraft, region name) of aircraft whose state changed meaningfully
+        unchanged: (raw aircraft, region name) of aircraft whose state did not change
+        left: Hex codes of aircraft in the previous snapshot but not in this one
+    """
+
+    __slots__ = ('entered', 'updated', 'unchanged', 'left')
+
+    def __init__(self):
+        self.entered: list[tuple[dict, str | None]] = []
+        self.updated: list[tuple[dict, str | None]] = []
+        self.unchanged: list[tuple[dict, str | None]] = []
+        self.left: list[str] = []
+
+    def __repr__(self) -> str:
+        return (f"SnapshotDiff(entered={len(self.entered)}, updated={len(self.updated)}, "
+                f"unchanged={len(self.unchanged)}, left={len(self.left)})")
+
+
+class SnapshotTracker:
+    """
+    Keeps the per-hex state table of the last snapshot and classifies new snapshots against it.
+
+    simple usage example:
+
+    tracker = SnapshotTracker()
+    diff = tracker.update(aircraft_nearby)
+    for raw_aircraft, region_name in diff.entered:
+        ...
+    """
+
+    def __init__(self, altitude_band_feet: int = DEFAULT_ALTITUDE_BAND_FEET):
+        """
+        Args:
+            altitude_band_feet: Size of the altitude bands. An aircraft whose altitude moves into
+                a different band is classified as updated.
+        """
+        self.altitude_band_feet = altitude_band_feet
+        self._states: dict[str, tuple] = {}
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def __contains__(self, hex_code: str) -> bool:
+        return hex_code in self._states
+
+    def state_of(self, raw_aircraft: dict, region_name: str | None) -> tuple:
+        """Return the tuple of spotting-relevant fields of one raw aircraft"""
+        altitude = raw_aircraft.get('alt_baro')
+        if altitude != 'ground':
+            try:
+                altitude = int(altitude) // self.altitude_band_feet
+            except (TypeError, ValueError):
+                altitude = None
+        flight = raw_aircraft.get('flight')
+        return (raw_aircraft.get('r'), raw_aircraft.get('t'), raw_aircraft.get('dbFlags'),
+                region_name, altitude, flight.strip() if isinstance(flight, str) else flight)
+
+    def update(self, aircraft_nearby: list[tuple[dict, str | None]]) -> SnapshotDiff:
+        """
+        Classify a new snapshot against the previous one, then make it the previous snapshot.
+
+        Args:
+            aircraft_nearby: List of (raw aircraft dictionary, region name) tuples, as returned
+                by AircraftSource.fetch
+
+        Returns:
+            SnapshotDiff of the new snapshot
+        """
+        diff = SnapshotDiff()
+        previous_states = self._states
+        states = {}
+        for raw_aircraft, region_name in aircraft_nearby:
+            hex_code = raw_aircraft.get('hex')
+            if hex_code is None:
+                diff.entered.append((raw_aircraft, region_name))
+                continue
+            state = self.state_of(raw_aircraft, region_name)
+            states[hex_code] = state
+            previous_state = previous_states.get(hex_code)
+            if previous_state is None:
+                diff.entered.append((raw_aircraft, region_name))
+            elif previous_state != state:
+                diff.updated.append((raw_aircraft, region_name))
+            else:
+                diff.unchanged.append((raw_aircraft, region_name))
+        diff.left = [hex_code for hex_code in previous_states if hex_code not in states]
+        self._states = states
+        logger.debug(f"Snapshot: {diff}")
+        return diff
+
+    def clear(self):
+        """Forget the previous snapshot, so every aircraft in the next one counts as entered"""
+        self._states = {}
@@ -0,0 +1,389 @@
+"""
+This module contains the sources of aircraft data polled by the Spotter. Every source returns
+the aircraft currently in the spotting regions as raw aircraft dictionaries in the ADSBx v2
+format (hex, r, t, dbFlags, alt_baro, lat, lon, flight, gs...), each paired with the name of the
+spotting region it is in.
+
+RapidApiSource polls the ADS-B Exchange API on RapidAPI. AircraftJsonSource reads the
+aircraft.json file written by a local readsb, dump1090-fa or tar1090 receiver, either from disk
+or over HTTP, which avoids API latency and quota limits so it can be polled every few seconds.
+FusedSource combines several sources, merging the observations of each aircraft into one.
+
+The seen and seen_pos ages in raw aircraft dictionaries are relative to the time of the snapshot
+they come from, which sources record in snapshot_time, so positions from different sources are
+compared by the absolute time they were received rather than by their ages.
+"""
+
+import json
+import logging
+import os
+from time import sleep, time
+from typing import Callable
+
+import requests
+
+from .httpclient import HttpClient
+from .regions import RegionQuery, SpotRegion
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_POSITION_AGE_SECONDS = 60
+# an aircraft.json that has not been updated for this long belongs to a stalled receiver
+DEFAULT_MAX_SNAPSHOT_AGE_SECONDS = 30
+# streaming sources can trigger a poll before adsb_interval, but no more often than this
+STREAMING_MIN_POLL_SECONDS = 1
+
+
+class AircraftSource:
+    """Base class for sources of aircraft data. Subclasses implement fetch()."""
+
+    description = 'aircraft source'
+    # streaming sources receive aircraft continuously and signal updates via wait_for_update
+    streaming = False
+    # time, in seconds since the epoch, that the seen and seen_pos ages returned by the last
+    #  fetch are relative to. None if they are relative to the time of the fetch
+    snapshot_time: float | None = None
+
+    def wait_for_update(self, timeout: float) -> bool:
+        """
+        Wait up to timeout seconds for new aircraft data that should be checked without waiting
+        for the next poll.
+
+        Returns:
+            True if the source has new aircraft to check, False if the timeout expired
+        """
+        sleep(timeout)
+        return False
+
+    def fetch(self) -> list[tuple[dict, str | None]]:
+        """
+        Return the aircraft currently in the spotting regions.
+
+        Returns:
+            List of (raw aircraft dictionary, region name) tuples, with at most one entry per hex
+            code. The region name is None if the aircraft's position could not be read.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class RapidApiSource(AircraftSource):
+    """Aircraft source polling the ADSBx v2 lat/lon/dist endpoint on RapidAPI, with one request
+    per coalesced region query"""
+
+    description = 'ADSBX API (endpoint: RapidAPI)'
+
+    def __init__(self, http_client: HttpClient, region_queries: list[RegionQuery],
+                 urls: list[str], headers: dict[str, str]):
+        """
+        Args:
+            http_client: HttpClient used for API requests
+            region_queries: Coalesced query circles covering the spotting regions
+            urls: RapidAPI url of each query in region_queries
+            headers: Request headers, including the RapidAPI key
+        """
+        self._http = http_client
+        self.region_queries = region_queries
+        self.urls = urls
+        self.headers = headers
+
+    def fetch_url(self, url: str) -> list[dict]:
+        """
+        Request active aircraft from a single ADSBx API query url.
+
+        Args:
+            url: RapidAPI lat/lon/dist url to request
+
+        Returns:
+            List of raw aircraft dictionaries from the API response, empty if the request failed
+            or no aircraft were returned
+        """
+        logger.info(f'Checking for aircraft via {self.description}')
+        try:
+            response = self._http.get(url, headers=self.headers)
+            response.raise_for_status()
+            logger.debug(f'ADSBX API request successful, response took '
+                         f'{response.elapsed.total_seconds():0.3f} seconds')
+            content = response.json()
+            aircraft_nearby = content['ac']
+            if content.get('now') is not None:
+                # the API reports its snapshot time in milliseconds
+                response_time = content['now'] / 1000
+                self.snapshot_time = response_time if self.snapshot_time is None else \
+                    min(self.snapshot_time, response_time)
+            if aircraft_nearby is None:
+                # prevent an empty list of spots from creating a TypeError in the next for loop
+                logger.info('No aircraft detected in spotting area')
+                aircraft_nearby = []
+            else:
+                logger.info(f'API returned {len(aircraft_nearby)} aircraft in spotting area')
+        except (requests.exceptions.HTTPError, requests.exceptions.Timeout,
+                AttributeError) as err:
+            logger.error('Error with ADSB Exchange API request', exc_info=True)
+            aircraft_nearby = []
+        return aircraft_nearby
+
+    def fetch(self) -> list[tuple[dict, str | None]]:
+        """
+        Request aircraft for every coalesced region query and split the results back into the
+        spotting regions they are in. Aircraft outside every region are dropped, and aircraft
+        returned by more than one query are only included once.
+        """
+        region_aircraft = []
+        included_hex_codes = set()
+        # the oldest response time of this fetch, so no position is made to look fresher
+        self.snapshot_time = None
+        for query, url in zip(self.region_queries, self.urls):
+            for raw_aircraft in self.fetch_url(url):
+                hex_code = raw_aircraft.get('hex')
+                if hex_code is not None and hex_code in included_hex_codes:
+                    continue
+                if not query.needs_local_filter:
+                    region_name = query.regions[0].name
+                else:
+                    try:
+                        region = query.region_for(float(raw_aircraft['lat']),
+                                                  float(raw_aircraft['lon']))
+                    except (KeyError, ValueError, TypeError):
+                        # leave invalid positions for AircraftSpot to report
+                        region_aircraft.append((raw_aircraft, None))
+                        continue
+                    if region is None:
+                        continue
+                    region_name = region.name
+                if hex_code is not None:
+                    included_hex_codes.add(hex_code)
+                region_aircraft.append((raw_aircraft, region_name))
+        return region_aircraft
+
+
+class AircraftJsonSource(AircraftSource):
+    """
+    Aircraft source reading the aircraft.json file of a local receiver (readsb, dump1090-fa,
+    tar1090), from a file path or an http(s) url.
+
+    The file is only re-read when it changes: a file on disk when its modification time changes,
+    and a url when the server does not answer the If-Modified-Since request with 304 Not
+    Modified. Aircraft are filtered to the spotting regions locally, and aircraft whose last
+    position is older than max_position_age seconds are dropped.
+
+    Receivers write their snapshot time to aircraft.json as "now". Once it is more than
+    max_snapshot_age seconds old, the receiver has stopped updating the file and its aircraft are
+    ignored, rather than spotted from the same snapshot over and over. The receiver's clock must
+    be within a few seconds of this host's.
+
+    Receivers only include the registration (r), type code (t) and dbFlags keys when they are
+    run with an aircraft database (e.g. readsb --db-file). Without them, aircraft can only be
+    spotted by ICAO address or as unknown.
+    """
+
+    def __init__(self, location: str, regions: list[SpotRegion],
+                 http_client: HttpClient | None = None,
+                 max_position_age: float = DEFAULT_MAX_POSITION_AGE_SECONDS,
+                 max_snapshot_age: float = DEFAULT_MAX_SNAPSHOT_AGE_SECONDS,
+                 clock: Callable[[], float] = time):
+        """
+        Args:
+            location: Path or http(s) url of aircraft.json
+            regions: Spotting regions to filter aircraft by
+            http_client: HttpClient used if location is a url
+            max_position_age: Aircraft whose position was last updated more than this many
+                seconds ago are ignored
+            max_snapshot_age: All aircraft are ignored while the snapshot in aircraft.json is
+                more than this many seconds old
+            clock: Function returning the current time in seconds since the epoch
+        """
+        self.location = location
+        self.description = f'aircraft.json at {location}'
+        self.regions = regions
+        self.max_position_age = max_position_age
+        self.max_snapshot_age = max_snapshot_age
+        self.clock = clock
+        self.is_url = location.startswith(('http://', 'https://'))
+        self._http = http_client if http_client is not None else HttpClient('airspotbot')
+        self._modified: int | str | None = None  # mtime of the file, or Last-Modified of the url
+        self._aircraft: list[tuple[dict, str | None]] = []
+        self._stale = False
+
+    def _read_file(self) -> dict | None:
+        """Return the parsed file if its mtime changed since the last read, otherwise None"""
+        mtime = os.stat(self.location).st_mtime_ns
+        if mtime == self._modified:
+            return None
+        with open(self.location, 'rb') as aircraft_file:
+            content = json.loads(aircraft_file.read())
+        self._modified = mtime
+        return content
+
+    def _read_url(self) -> dict | None:
+        """Return the parsed response if the url changed since the last read, otherwise None"""
+        headers = {}
+        if self._modified is not None:
+            headers['If-Modified-Since'] = self._modified
+        response = self._http.get(self.location, headers=headers)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        content = response.json()
+        self._modified = response.headers.get('Last-Modified')
+        return content
+
+    def _in_regions(self, content: dict) -> list[tuple[dict, str | None]]:
+        """Filter the aircraft in a parsed aircraft.json to the spotting regions"""
+        region_aircraft = []
+        included_hex_codes = set()
+        for raw_aircraft in content.get('aircraft') or []:
+            hex_code = raw_aircraft.get('hex')
+            if hex_code is None or hex_code in included_hex_codes:
+                continue
+            if raw_aircraft.get('seen_pos', 0) > self.max_position_age:
+                continue
+            try:
+                latitude = float(raw_aircraft['lat'])
+                longitude = float(raw_aircraft['lon'])
+            except (KeyError, ValueError, TypeError):
+                continue  # receivers list aircraft without a position, which cannot be placed
+            for region in self.regions:
+                if region.contains(latitude, longitude):
+                    included_hex_codes.add(hex_code)
+                    region_aircraft.append((raw_aircraft, region.name))
+                    break
+        return region_aircraft
+
+    def fetch(self) -> list[tuple[dict, str | None]]:
+        logger.info(f'Checking for aircraft via {self.description}')
+        try:
+            content = self._read_url() if self.is_url else self._read_file()
+        except (OSError, ValueError, requests.exceptions.RequestException):
+            logger.error(f'Error reading {self.description}', exc_info=True)
+            return []
+        if content is None:
+            logger.debug(f'{self.description} has not changed since the last poll')
+        else:
+            try:
+                self.snapshot_time = float(content['now'])
+            except (KeyError, ValueError, TypeError):
+                # without a snapshot time, the file is as old as its last change
+                self.snapshot_time = self._modified / 1e9 if not self.is_url else self.clock()
+            self._aircraft = self._in_regions(content)
+            logger.info(f'{len(self._aircraft)} aircraft in spotting area')
+        snapshot_age = self.clock() - self.snapshot_time
+        if snapshot_age > self.max_snapshot_age:
+            if not self._stale:
+                logger.warning(f'{self.description} has not been updated for '
+                               f'{snapshot_age:0.0f} seconds, ignoring its aircraft until it is')
+                self._stale = True
+            return []
+        if self._stale:
+            logger.info(f'{self.description} is being updated again')
+            self._stale = False
+        return self._aircraft
+
+
+class FusedSource(AircraftSource):
+    """
+    Aircraft source combining several sources, such as the ADSBx API and a local receiver, that
+    see many of the same aircraft. The observations of each hex code are merged into one raw
+    aircraft dictionary, so every aircraft reaches the spotting rules (and is enriched and
+    tweeted) once, however many sources report it.
+
+    Position and motion come from the freshest observation, the one whose position was received
+    most recently. Each source's seen_pos is relative to its own snapshot time, so it is converted
+    to an absolute time (snapshot_time - seen_pos) before the observations are compared.
+    Aircraft metadata (registration, type code, ADSBx flags...) comes from the first source, in
+    the configured order, that has it, so the ADSBx API should be listed first to prefer its
+    database over a receiver's. Any other key missing from the freshest observation is filled in
+    from the others.
+    """
+
+    # keys taken from the highest priority source that has them, rather than the freshest
+    METADATA_KEYS = ('r', 't', 'dbFlags', 'desc', 'ownOp', 'year')
+
+    def __init__(self, sources: list[AircraftSource]):
+        """
+        Args:
+            sources: Sources to combine, in order of metadata priority
+        """
+        self.sources = sources
+        self.description = ' + '.join(source.description for source in sources)
+        self.streaming = any(source.streaming for source in sources)
+
+    def wait_for_update(self, timeout: float) -> bool:
+        for source in self.sources:
+            if source.streaming:
+                return source.wait_for_update(timeout)
+        return super().wait_for_update(timeout)
+
+    @staticmethod
+    def _position_time(raw_aircraft: dict, snapshot_time: float) -> float:
+        """Time in seconds since the epoch that an observation's position was received,
+        negative infinity if it is unknown"""
+        age = raw_aircraft.get('seen_pos', raw_aircraft.get('seen'))
+        try:
+            return snapshot_time - float(age)
+        except (TypeError, ValueError):
+            return float('-inf')
+
+    def merge(self, observations: list[tuple[dict, str | None, float]]) -> \
+            tuple[dict, str | None]:
+        """
+        Merge the observations of one aircraft.
+
+        Args:
+            observations: (raw aircraft dictionary, region name, position time) of one hex code
+                from each source that reported it, in source priority order
+
+        Returns:
+            Merged (raw aircraft dictionary, region name), with the region of the freshest
+            observation
+        """
+        # max returns the first of equal items, so sources listed first win ties
+        freshest, region_name, _ = max(observations, key=lambda o: o[2])
+        merged = dict(freshest)
+        for raw_aircraft, _, _ in observations:
+            for key, value in raw_aircraft.items():
+                if merged.get(key) is None and value is not None:
+                    merged[key] = value
+        for key in self.METADATA_KEYS:
+            for raw_aircraft, _, _ in observations:
+                if raw_aircraft.get(key) is not None:
+                    merged[key] = raw_aircraft[key]
+                    break
+        return merged, region_name
+
+    def fetch(self) -> list[tuple[dict, str | None]]:
+        observations: dict[str, list[tuple[dict, str | None, float]]] = {}
+        without_hex = []
+        fetch_time = time()
+        for source in self.sources:
+            source_aircraft = source.fetch()
+            snapshot_time = source.snapshot_time if source.snapshot_time is not None else \
+                fetch_time
+            for raw_aircraft, region_name in source_aircraft:
+                hex_code = raw_aircraft.get('hex')
+                if hex_code is None:
+                    # cannot be matched across sources, leave for AircraftSpot to report
+                    without_hex.append((raw_aircraft, region_name))
+                else:
+                    observations.setdefault(hex_code, []).append(
+                        (raw_aircraft, region_name,
+                         self._position_time(raw_aircraft, snapshot_time)))
+        region_aircraft = []
+        duplicate_count = 0
+        for hex_observations in observations.values():
+            if len(hex_observations) == 1:
+                raw_aircraft, region_name, _ = hex_observations[0]
+                region_aircraft.append((raw_aircraft, region_name))
+            else:
+                duplicate_count += len(hex_observations) - 1
+                region_aircraft.append(self.merge(hex_observations))
+        region_aircraft.extend(without_hex)
+        logger.info(f'{len(region_aircraft)} aircraft in spotting area from {self.description}, '
+                    f'{duplicate_count} duplicate observations merged')
+        return region_aircraft
+
+    def close(self):
+        for source in self.sources:
+            source.close()
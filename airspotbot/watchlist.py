@@ -0,0 +1,360 @@
+"""
+This module contains the compiled spotting rules used by the Spotter. The watchlist entries read
+from watchlist.csv (by ICAO address, registration number and type code) and the global
+spot_unknown/spot_mil/spot_interesting flags from asb.config are compiled into a single decision
+structure, so each aircraft is resolved with at most one dictionary lookup per key type, to a
+precomputed RuleMatch holding the description and already-resolved image path to use. Every image
+named in the watchlist is checked for once, when the rules are compiled.
+
+Besides exact keys, the watchlist can contain ICAO hex address ranges (e.g. the AE0000-AFFFFF
+block), registration number prefixes (e.g. N9) and type code wildcards (e.g. C13*). Prefixes are
+stored in a trie and hex ranges in a sorted interval index searched with bisect, so matching
+cost does not grow with the number of watchlist entries.
+
+Rules are applied in order of precedence: ICAO address, then ICAO address range, then
+registration number, then registration prefix, then type code, then type code wildcard (both
+respecting the "Mil Only" column), then the global flags. Where several prefixes or ranges match,
+the longest prefix or narrowest range is used.
+"""
+
+import bisect
+import heapq
+import logging
+from pathlib import Path
+
+from .watchlist_cache import MappedWatchlist
+
+logger = logging.getLogger(__name__)
+
+
+class RuleMatch:
+    """
+    Precomputed result of a spotting rule, shared by every aircraft that matches it.
+
+    Args:
+        reason: Short description of the rule that matched, used in log messages
+        description: Custom description from the watchlist, or None
+        image_path: Path of an existing image file from the watchlist, or None
+        missing_image: Path of an image file named in the watchlist that does not exist, or None
+    """
+
+    __slots__ = ('reason', 'description', 'image_path', 'missing_image')
+
+    def __init__(self, reason: str, description: str | None = None,
+                 image_path: Path | None = None, missing_image: Path | None = None):
+        self.reason = reason
+        self.description = description
+        self.image_path = image_path
+        self.missing_image = missing_image
+
+    def apply_to(self, aircraft):
+        """Copy this match's description and image path onto an AircraftSpot"""
+        if self.description is not None:
+            aircraft.description = self.description
+        if self.image_path is not None:
+            aircraft.image_path = self.image_path
+        elif self.missing_image is not None:
+            logger.error(f"Cannot add image to aircraft with hex {aircraft.hex_code}. "
+                         f"No file found at {self.missing_image}.")
+
+
+class LazyRuleMap:
+    """
+    Mapping of watchlist key to RuleMatch, compiling each entry the first time it is looked up.
+    Used for the ICAO address and registration number watchlists, which can hold hundreds of
+    thousands of entries (possibly memory-mapped from the watchlist cache) of which only a few
+    ever match an aircraft.
+    """
+
+    def __init__(self, entries, compile_entry):
+        """
+        Args:
+            entries: Mapping of watchlist key to watchlist entry dictionary
+            compile_entry: Function returning the RuleMatch for a watchlist entry
+        """
+        self._entries = entries
+        self._compile_entry = compile_entry
+        self._compiled: dict[str, RuleMatch] = {}
+
+    def get(self, key: str) -> RuleMatch | None:
+        result = self._compiled.get(key)
+        if result is None:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            result = self._compiled[key] = self._compile_entry(entry)
+        return result
+
+    def __getitem__(self, key: str) -> RuleMatch:
+        result = self.get(key)
+        if result is None:
+            raise KeyError(key)
+        return result
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._compiled or key in self._entries
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class PrefixTrie:
+    """Character trie mapping string prefixes to values, returning the value of the longest
+    matching prefix in O(length of the looked up string)"""
+
+    _VALUE = object()  # sentinel key under which a node's value is stored
+
+    def __init__(self):
+        self._root = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def insert(self, prefix: str, value):
+        node = self._root
+        for character in prefix:
+            node = node.setdefault(character, {})
+        if self._VALUE not in node:
+            self._size += 1
+        node[self._VALUE] = value
+
+    def longest_prefix(self, key: str):
+        """Return the value of the longest prefix of key in the trie, or None"""
+        node = self._root
+        result = node.get(self._VALUE)
+        for character in key:
+            node = node.get(character)
+            if node is None:
+                break
+            result = node.get(self._VALUE, result)
+        return result
+
+    def items(self):
+        """Yield (prefix, value) for every prefix in the trie"""
+        stack = [('', self._root)]
+        while stack:
+            prefix, node = stack.pop()
+            for character, child in node.items():
+                if character is self._VALUE:
+                    yield prefix, child
+                else:
+                    stack.append((prefix + character, child))
+
+
+class IntervalIndex:
+    """
+    Index of inclusive integer ranges, each with a value. Overlapping ranges are flattened into
+    disjoint segments when the index is built, with the narrowest range winning where ranges
+    overlap, so a lookup is a single bisect over the segment start points.
+    """
+
+    def __init__(self, ranges: list[tuple[int, int, object]]):
+        """
+        Args:
+            ranges: List of (start, end, value) tuples, with start <= end
+        """
+        self.starts: list[int] = []
+        self.ends: list[int] = []
+        self.values: list = []
+        boundaries = sorted({start for start, _, _ in ranges} |
+                            {end + 1 for _, end, _ in ranges})
+        by_start = sorted(range(len(ranges)), key=lambda n: ranges[n][0])
+        active = []  # heap of (width, order, end, value) for the ranges covering a segment
+        next_range = 0
+        for segment_start, segment_next in zip(boundaries, boundaries[1:]):
+            while next_range < len(by_start) and ranges[by_start[next_range]][0] <= segment_start:
+                start, end, value = ranges[by_start[next_range]]
+                heapq.heappush(active, (end - start, by_start[next_range], end, value))
+                next_range += 1
+            while active and active[0][2] < segment_start:
+                heapq.heappop(active)
+            if not active:
+                continue
+            value = active[0][3]
+            if self.values and self.values[-1] is value and self.ends[-1] == segment_start - 1:
+                self.ends[-1] = segment_next - 1  # extend the previous segment
+            else:
+                self.starts.append(segment_start)
+                self.ends.append(segment_next - 1)
+                self.values.append(value)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def find(self, point: int):
+        """Return the value of the narrowest range containing point, or None"""
+        position = bisect.bisect_right(self.starts, point) - 1
+        if position >= 0 and point <= self.ends[position]:
+            return self.values[position]
+        return None
+
+
+class WatchlistRules:
+    """
+    Compiled decision structure for the spotting rules.
+
+    simple usage example:
+
+    rules = WatchlistRules(watchlist_ia, watchlist_rn, watchlist_tc, './images/',
+                           spot_unknown=False, spot_mil=True, spot_interesting=True)
+    match = rules.match(hex_code, reg, type_code, military, interesting)
+    if match is not None:
+        match.apply_to(aircraft)
+    """
+
+    def __init__(self,
+                 watchlist_ia: dict[str, dict],
+                 watchlist_rn: dict[str, dict],
+                 watchlist_tc: dict[str, dict],
+                 image_dir: str,
+                 spot_unknown: bool,
+                 spot_mil: bool,
+                 spot_interesting: bool,
+                 watchlist_ir: dict[str, dict] | None = None,
+                 watchlist_rp: dict[str, dict] | None = None,
+                 watchlist_tp: dict[str, dict] | None = None):
+        """
+        Args:
+            watchlist_ia: ICAO address watchlist, as read from watchlist.csv by the Spotter. This
+                and watchlist_rn can be any mapping, such as a MappedWatchlist from the cache
+            watchlist_rn: Registration number watchlist
+            watchlist_tc: Type code watchlist, whose entries include a 'mil_only' flag
+            image_dir: String containing relative or absolute path of image directory containing
+                images defined in watchlist.
+            spot_unknown: Spot all aircraft with an unknown registration number
+            spot_mil: Spot all aircraft designated military by ADSBx
+            spot_interesting: Spot all aircraft designated interesting by ADSBx
+            watchlist_ir: Optional ICAO address range watchlist, whose entries include the
+                integer 'start' and 'end' of the range
+            watchlist_rp: Optional registration number prefix watchlist
+            watchlist_tp: Optional type code wildcard watchlist, keyed by the pattern (e.g. C13*).
+                Entries include the 'prefix' before the wildcard and a 'mil_only' flag
+        """
+        self.image_dir = image_dir
+        # every image named in the watchlist is checked once here, so matching an aircraft never
+        #  touches the filesystem
+        self.image_paths: dict[str, Path] = {}
+        self.missing_images: dict[str, Path] = {}
+        for watchlist in (watchlist_ia, watchlist_rn, watchlist_tc, watchlist_ir, watchlist_rp,
+                          watchlist_tp):
+            for image_name in _image_names(watchlist or {}):
+                if image_name in self.image_paths or image_name in self.missing_images:
+                    continue
+                full_path = Path(image_dir) / image_name
+                if full_path.is_file():
+                    self.image_paths[image_name] = full_path
+                else:
+                    self.missing_images[image_name] = full_path
+        self.by_hex = LazyRuleMap(
+            watchlist_ia, lambda entry: self._compile_entry('ICAO address watchlist', entry))
+        self.by_reg = LazyRuleMap(
+            watchlist_rn, lambda entry: self._compile_entry('registration number watchlist',
+                                                            entry))
+        # type code results are indexed by the aircraft's military flag. Military-only entries
+        #  have no result for non-military aircraft, which are then not spotted at all.
+        self.by_type: dict[str, tuple[RuleMatch | None, RuleMatch]] = {}
+        for key, entry in watchlist_tc.items():
+            type_match = self._compile_entry('type code watchlist', entry)
+            self.by_type[key] = (None if entry['mil_only'] else type_match, type_match)
+        self.hex_ranges = IntervalIndex(
+            [(entry['start'], entry['end'],
+              self._compile_entry('ICAO address range watchlist', entry))
+             for entry in (watchlist_ir or {}).values()])
+        self.reg_prefixes = PrefixTrie()
+        for key, entry in (watchlist_rp or {}).items():
+            self.reg_prefixes.insert(key, self._compile_entry('registration prefix watchlist',
+                                                              entry))
+        self.type_patterns = PrefixTrie()
+        for entry in (watchlist_tp or {}).values():
+            type_match = self._compile_entry('type code wildcard watchlist', entry)
+            self.type_patterns.insert(entry['prefix'],
+                                      (None if entry['mil_only'] else type_match, type_match))
+        # results of the global flags, indexed by [unknown][military][interesting]
+        unknown_match = RuleMatch('unknown registration number')
+        military_match = RuleMatch('designated military')
+        interesting_match = RuleMatch('designated interesting')
+        self.global_matches = [[[None, None], [None, None]], [[None, None], [None, None]]]
+        for unknown in (0, 1):
+            for military in (0, 1):
+                for interesting in (0, 1):
+                    if unknown and spot_unknown:
+                        result = unknown_match
+                    elif military and spot_mil:
+                        result = military_match
+                    elif interesting and spot_interesting:
+                        result = interesting_match
+                    else:
+                        result = None
+                    self.global_matches[unknown][military][interesting] = result
+
+    def _compile_entry(self, reason: str, entry: dict) -> RuleMatch:
+        """Precompute the RuleMatch for one watchlist entry, using the already resolved image"""
+        description = entry['desc'] if entry['desc'] != '' else None
+        return RuleMatch(reason, description, self.image_paths.get(entry['img']),
+                         self.missing_images.get(entry['img']))
+
+    def match(self, hex_code: str, reg: str, type_code: str,
+              military: bool, interesting: bool) -> RuleMatch | None:
+        """
+        Resolve the spotting rule for one aircraft.
+
+        Args:
+            hex_code: ICAO hex address
+            reg: Registration number, 'unknown' if not reported
+            type_code: ICAO type code
+            military: True if ADSBx designates the aircraft as military
+            interesting: True if ADSBx designates the aircraft as interesting
+
+        Returns:
+            RuleMatch of the first matching rule, or None if the aircraft should not be spotted
+        """
+        result = self.by_hex.get(hex_code)
+        if result is not None:
+            return result
+        if self.hex_ranges:
+            try:
+                result = self.hex_ranges.find(int(hex_code, 16))
+            except ValueError:
+                pass  # non-ICAO addresses, such as TIS-B addresses starting with ~
+            if result is not None:
+                return result
+        result = self.by_reg.get(reg)
+        if result is not None:
+            return result
+        if self.reg_prefixes and reg != 'unknown':
+            result = self.reg_prefixes.longest_prefix(reg)
+            if result is not None:
+                return result
+        type_results = self.by_type.get(type_code)
+        if type_results is None and self.type_patterns:
+            type_results = self.type_patterns.longest_prefix(type_code)
+        if type_results is not None:
+            return type_results[military]
+        return self.global_matches[reg == 'unknown'][military][interesting]
+
+
+def _image_names(watchlist) -> set[str]:
+    """Return the distinct image file names used by the entries of a watchlist"""
+    if isinstance(watchlist, MappedWatchlist):
+        entries = watchlist.unique_entries()
+    else:
+        entries = watchlist.values()
+    return {entry['img'] for entry in entries if entry['img'] != ''}
+
+
+def diff_watchlists(old: dict[str, dict], new: dict[str, dict]) \
+        -> tuple[list[str], list[str], list[str]]:
+    """
+    Compare two versions of a watchlist dictionary.
+
+    Returns:
+        Tuple of sorted lists of the keys that were added, removed and changed
+    """
+    added = sorted(new.keys() - old.keys())
+    removed = sorted(old.keys() - new.keys())
+    changed = sorted(key for key in old.keys() & new.keys() if old[key] != new[key])
+    return added, removed, changed
@@ -0,0 +1,238 @@
+"""
+This module contains the precompiled binary watchlist cache. Parsing a watchlist.csv with
+hundreds of thousands of rows (e.g. a full list of government aircraft) is slow and builds a
+large number of Python objects at every startup, so the parsed watchlists can be written to a
+compact index file that later startups map into memory instead of reading the CSV.
+
+The index holds one section per watchlist row type. Each section stores its keys sorted, in one
+UTF-8 blob with an array of offsets, and the matching entries as JSON in a second blob, with an
+array of (start, end) positions per key. Identical entries (such as a long list of aircraft with
+the same description) are stored once. Lookups are a binary search directly over the mapped file,
+and only the entries of aircraft that are actually looked up are ever decoded.
+
+The cache is tied to the CSV it was compiled from by its modification time, size and SHA-256
+hash. If the mtime and size match, the cache is used without reading the CSV at all. Otherwise
+the CSV is hashed, and if the hash matches (the file was touched or copied without changes) the
+cache is still used. Any other cache is considered stale and is rebuilt from the CSV.
+"""
+
+import bisect
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+CACHE_MAGIC = b'ASBWLC'
+CACHE_VERSION = 1
+# magic, version, byte order (0 little, 1 big), CSV mtime in ns, CSV size, CSV SHA-256, sections
+_HEADER = struct.Struct('<6sHBqq32sH')
+# section name, entry count, then file positions of key offsets, keys, value positions and values
+_SECTION = struct.Struct('<16sIQQQQ')
+_BYTE_ORDER = 0 if sys.byteorder == 'little' else 1
+
+
+class CsvFingerprint:
+    """Modification time, size and SHA-256 hash identifying one version of a CSV file"""
+
+    def __init__(self, mtime_ns: int, size: int, sha256: bytes | None = None):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self._sha256 = sha256
+        self.path: str | None = None
+
+    @classmethod
+    def of_file(cls, path: str) -> "CsvFingerprint":
+        """Fingerprint a file. The hash is only computed when it is first needed."""
+        stat_result = os.stat(path)
+        fingerprint = cls(stat_result.st_mtime_ns, stat_result.st_size)
+        fingerprint.path = path
+        return fingerprint
+
+    @property
+    def sha256(self) -> bytes:
+        if self._sha256 is None:
+            digest = hashlib.sha256()
+            with open(self.path, 'rb') as csv_file:
+                for block in iter(lambda: csv_file.read(1 << 20), b''):
+                    digest.update(block)
+            self._sha256 = digest.digest()
+        return self._sha256
+
+
+class _SortedKeys:
+    """Sequence view of the sorted, UTF-8 encoded keys of one section, for use with bisect"""
+
+    def __init__(self, buffer, key_offsets: memoryview, keys_position: int):
+        self._buffer = buffer
+        self._offsets = key_offsets
+        self._position = keys_position
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> bytes:
+        return self._buffer[self._position + self._offsets[index]:
+                            self._position + self._offsets[index + 1]]
+
+
+class MappedWatchlist(Mapping):
+    """
+    Read-only mapping of watchlist key to entry dictionary, backed by one section of a mapped
+    cache file. Behaves like the dictionaries built by Spotter._parse_watchlist.
+    """
+
+    def __init__(self, buffer, count: int, key_offsets_position: int, keys_position: int,
+                 value_offsets_position: int, values_position: int):
+        self._buffer = buffer
+        offsets_size = (count + 1) * 4
+        self._keys = _SortedKeys(buffer,
+                                 memoryview(buffer)[key_offsets_position:
+                                                    key_offsets_position + offsets_size].cast('I'),
+                                 keys_position)
+        self._value_offsets = memoryview(buffer)[value_offsets_position:
+                                                 value_offsets_position + count * 8].cast('I')
+        self._values_position = values_position
+
+    def _index(self, key: str) -> int | None:
+        if not isinstance(key, str):
+            return None
+        encoded = key.encode()
+        index = bisect.bisect_left(self._keys, encoded)
+        if index < len(self._keys) and self._keys[index] == encoded:
+            return index
+        return None
+
+    def __getitem__(self, key: str) -> dict:
+        index = self._index(key)
+        if index is None:
+            raise KeyError(key)
+        return json.loads(self._buffer[self._values_position + self._value_offsets[2 * index]:
+                                       self._values_position + self._value_offsets[2 * index + 1]])
+
+    def __contains__(self, key) -> bool:
+        return self._index(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(len(self._keys)):
+            yield self._keys[index].decode()
+
+    def unique_entries(self) -> Iterator[dict]:
+        """Yield each distinct entry once, without decoding the entry of every key"""
+        if not len(self):
+            return
+        values = self._buffer[self._values_position:
+                              self._values_position + max(self._value_offsets[1::2])].decode()
+        decoder = json.JSONDecoder()
+        position = 0
+        while position < len(values):
+            entry, position = decoder.raw_decode(values, position)
+            yield entry
+
+
+def _pad(data: bytes) -> bytes:
+    """Pad data to a multiple of 8 bytes, so the arrays following it stay aligned"""
+    return data + b'\0' * (-len(data) % 8)
+
+
+def write_cache(cache_path: str, watchlists: dict[str, Mapping], fingerprint: CsvFingerprint):
+    """
+    Write parsed watchlists to a cache file. The file is written under a temporary name and
+    then renamed, so a Spotter that has the previous version mapped is not affected.
+
+    Args:
+        cache_path: Path of the cache file
+        watchlists: Dictionary mapping watchlist attribute name to watchlist dictionary, as
+            returned by Spotter._parse_watchlist
+        fingerprint: Fingerprint of the CSV file the watchlists were parsed from
+    """
+    encoder = json.JSONEncoder(separators=(',', ':'))
+    sections = []
+    for name, watchlist in watchlists.items():
+        keys = sorted(watchlist, key=str.encode)
+        encoded_keys = [key.encode() for key in keys]
+        key_offsets = array('I', [0])
+        for encoded in encoded_keys:
+            key_offsets.append(key_offsets[-1] + len(encoded))
+        value_offsets = array('I')
+        value_positions: dict[tuple, tuple[int, int]] = {}
+        encoded_values = []
+        values_size = 0
+        for key in keys:
+            entry = watchlist[key]
+            entry_key = tuple(entry.items())
+            position = value_positions.get(entry_key)
+            if position is None:
+                encoded = encoder.encode(entry).encode()
+                position = value_positions[entry_key] = (values_size, values_size + len(encoded))
+                encoded_values.append(encoded)
+                values_size += len(encoded)
+            value_offsets.extend(position)
+        sections.append((name, len(keys), [_pad(key_offsets.tobytes()),
+                                           _pad(b''.join(encoded_keys)),
+                                           _pad(value_offsets.tobytes()),
+                                           _pad(b''.join(encoded_values))]))
+    position = _HEADER.size + _SECTION.size * len(sections)
+    position += -position % 8
+    section_headers = []
+    for name, count, blobs in sections:
+        positions = []
+        for blob in blobs:
+            positions.append(position)
+            position += len(blob)
+        section_headers.append(_SECTION.pack(name.encode(), count, *positions))
+    header = _HEADER.pack(CACHE_MAGIC, CACHE_VERSION, _BYTE_ORDER, fingerprint.mtime_ns,
+                          fingerprint.size, fingerprint.sha256, len(sections))
+    Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = f"{cache_path}.tmp{os.getpid()}"
+    with open(temporary_path, 'wb') as cache_file:
+        cache_file.write(_pad(header + b''.join(section_headers)))
+        for _, _, blobs in sections:
+            for blob in blobs:
+                cache_file.write(blob)
+    os.replace(temporary_path, cache_path)
+
+
+def load_cache(cache_path: str, fingerprint: CsvFingerprint) -> dict[str, MappedWatchlist] | None:
+    """
+    Map a cache file, if it was compiled from the CSV file with the given fingerprint.
+
+    Args:
+        cache_path: Path of the cache file
+        fingerprint: Fingerprint of the current CSV file
+
+    Returns:
+        Dictionary mapping watchlist attribute name to MappedWatchlist, or None if the cache is
+        missing, unreadable or stale
+    """
+    try:
+        with open(cache_path, 'rb') as cache_file:
+            buffer = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        magic, version, byte_order, mtime_ns, size, sha256, section_count = \
+            _HEADER.unpack_from(buffer)
+    except struct.error:
+        return None
+    if magic != CACHE_MAGIC or version != CACHE_VERSION or byte_order != _BYTE_ORDER:
+        return None
+    if (mtime_ns, size) != (fingerprint.mtime_ns, fingerprint.size) and \
+            sha256 != fingerprint.sha256:
+        return None
+    watchlists = {}
+    for n in range(section_count):
+        name, count, *positions = _SECTION.unpack_from(buffer, _HEADER.size + _SECTION.size * n)
+        watchlists[name.rstrip(b'\0').decode()] = MappedWatchlist(buffer, count, *positions)
+    return watchlists
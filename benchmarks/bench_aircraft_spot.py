@@ -0,0 +1,128 @@
+"""
+Benchmark of AircraftSpot construction throughput and memory, comparing the current slotted
+classes with the original __dict__-based AircraftSpot/Coordinates (reproduced below as the
+baseline).
+
+Run from the repository root with: python -m benchmarks.bench_aircraft_spot
+"""
+
+import random
+import tracemalloc
+from time import perf_counter
+
+from airspotbot.adsbget import AircraftSpot
+
+AIRCRAFT_COUNT = 10_000
+
+
+class LegacyCoordinates:
+    """Coordinates as originally implemented, parsing each value up to three times"""
+
+    def __init__(self, latitude, longitude):
+        if float(latitude) > 90 or float(latitude) < -90:
+            raise ValueError
+        self.latitude = float(latitude)
+        if float(longitude) > 180 or float(longitude) < -180:
+            raise ValueError
+        self.longitude = float(longitude)
+
+
+class LegacyAircraftSpot:
+    """AircraftSpot as originally implemented, with a per-instance __dict__"""
+
+    def __init__(self, raw_aircraft):
+        self.hex_code = str(raw_aircraft['hex'])
+        try:
+            self.type_code = str(raw_aircraft['t']).strip()
+        except KeyError:
+            self.type_code = 'Unknown aircraft type'
+        try:
+            self.reg = str(raw_aircraft['r']).strip()
+        except KeyError:
+            self.reg = 'unknown'
+        try:
+            if raw_aircraft['alt_baro'] == 'ground':
+                self.grounded = True
+            else:
+                self.grounded = False
+                self.altitude_ft = int(raw_aircraft['alt_baro'])
+        except (KeyError, ValueError):
+            self.altitude_ft = 0
+            self.grounded = False
+        if 'dbFlags' in raw_aircraft:
+            self.military = bool(int(raw_aircraft['dbFlags']) & 1)
+            self.interesting = bool(int(raw_aircraft['dbFlags']) & 2)
+        else:
+            self.military = False
+            self.interesting = False
+        self.coordinates = LegacyCoordinates(raw_aircraft['lat'], raw_aircraft['lon'])
+        for n, k in (("ground", 'gs'), ("true air", 'tas'), ("indicated air", 'ias')):
+            try:
+                self.speed_string = f"{n} speed {raw_aircraft[k]} kts"
+                break
+            except KeyError:
+                continue
+        else:
+            self.speed_string = 'speed unknown'
+        try:
+            if raw_aircraft['flight'].strip() != self.reg:
+                self.callsign = str(raw_aircraft['flight'].strip())
+            else:
+                self.callsign = None
+        except KeyError:
+            self.callsign = None
+        self.description = None
+        self.image_path = None
+        self.region = None
+
+
+def synthetic_aircraft(count: int, seed: int = 0) -> list[dict]:
+    """Generate raw aircraft dictionaries resembling an ADSBx API response"""
+    rng = random.Random(seed)
+    aircraft = []
+    for n in range(count):
+        raw = {'hex': f'{rng.randrange(0x1000000):06x}',
+               'type': 'adsb_icao',
+               'flight': f'FLT{n:04d}  ',
+               'r': f'N{n}',
+               't': rng.choice(('B738', 'A320', 'C172', 'H60', 'EC45', 'C25A')),
+               'alt_baro': rng.choice((rng.randrange(0, 40000), 'ground')),
+               'gs': round(rng.uniform(0, 500), 1),
+               'lat': rng.uniform(-60, 60),
+               'lon': rng.uniform(-180, 180)}
+        if rng.random() < 0.05:
+            raw['dbFlags'] = rng.choice((1, 2, 3))
+        aircraft.append(raw)
+    return aircraft
+
+
+def measure(spot_class, raw_aircraft: list[dict], repeats: int = 5) -> dict[str, float]:
+    """Return construction time (microseconds per aircraft, best of several repeats) and retained
+    memory (bytes per aircraft) for building one spot object per raw aircraft"""
+    elapsed = float('inf')
+    for _ in range(repeats):
+        start = perf_counter()
+        for raw in raw_aircraft:
+            spot_class(raw)
+        elapsed = min(elapsed, perf_counter() - start)
+    tracemalloc.start()
+    spots = [spot_class(raw) for raw in raw_aircraft]
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del spots
+    return {'construct_us_per_aircraft': elapsed / len(raw_aircraft) * 1e6,
+            'bytes_per_aircraft': retained / len(raw_aircraft)}
+
+
+def run(count: int = AIRCRAFT_COUNT) -> dict[str, dict[str, float]]:
+    raw_aircraft = synthetic_aircraft(count)
+    return {'legacy': measure(LegacyAircraftSpot, raw_aircraft),
+            'slotted': measure(AircraftSpot, raw_aircraft)}
+
+
+if __name__ == '__main__':
+    import logging
+    logging.disable(logging.WARNING)
+    for name, result in run().items():
+        print(f"{name:>8}: {result['construct_us_per_aircraft']:6.2f} us/aircraft, "
+              f"{result['bytes_per_aircraft']:6.0f} bytes/aircraft")
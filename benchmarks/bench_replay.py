@@ -0,0 +1,92 @@
+"""
+Benchmark of replaying a full day of traffic through a Spotter.
+
+Records a synthetic capture of one poll per minute for 24 hours, each with a few hundred aircraft
+around a busy airport (aircraft arrive and depart over the day, and most stay for several
+polls), then replays it with ReplaySource at speed 0, so every poll runs through check_spots as
+fast as possible. The Spotter's clock follows the capture, so cooldowns expire as they would
+have live.
+
+Run from the repository root with: python -m benchmarks.bench_replay
+"""
+
+import configparser
+import logging
+import random
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from airspotbot.adsbget import Spotter
+from airspotbot.capture import CaptureWriter
+
+POLLS = 24 * 60
+AIRCRAFT_PER_POLL = 300
+ARRIVALS_PER_POLL = 15
+WATCHLIST = "./tests/valid_watchlist.csv"
+
+
+def _synthetic_aircraft(rng: random.Random, hex_code: int) -> dict:
+    """Return a raw aircraft dictionary, about 1 in 50 of them military"""
+    return {"hex": f'{hex_code:06x}', "r": f'N{rng.randrange(1, 99999)}',
+            "t": rng.choice(('B738', 'A320', 'E75L', 'C172', 'B77W', 'C17', 'H60')),
+            "dbFlags": 1 if rng.random() < 0.02 else 0,
+            "alt_baro": rng.randrange(1000, 40000), "gs": rng.uniform(100, 500),
+            "lat": rng.uniform(33.2, 33.7), "lon": rng.uniform(-112.3, -111.8),
+            "seen_pos": rng.uniform(0, 5), "flight": f'SWA{rng.randrange(1, 9999)}  '}
+
+
+def write_day(capture_path: str, polls: int = POLLS, aircraft_per_poll: int = AIRCRAFT_PER_POLL,
+              arrivals_per_poll: int = ARRIVALS_PER_POLL, start_time: float = 1_700_000_000.0):
+    """Write a synthetic capture of one poll per minute"""
+    rng = random.Random(0)
+    next_hex = 0
+    aircraft = []
+    capture = CaptureWriter(capture_path)
+    for poll in range(polls):
+        # departures, arrivals, and altitude changes of the aircraft already in the area
+        del aircraft[:max(0, len(aircraft) + arrivals_per_poll - aircraft_per_poll)]
+        for _ in range(arrivals_per_poll):
+            aircraft.append(_synthetic_aircraft(rng, next_hex))
+            next_hex += 1
+        for raw_aircraft in rng.sample(aircraft, len(aircraft) // 10):
+            raw_aircraft['alt_baro'] = rng.randrange(1000, 40000)
+        capture.write(start_time + poll * 60, [(dict(a), 'main') for a in aircraft])
+    capture.close()
+
+
+def run(polls: int = POLLS, aircraft_per_poll: int = AIRCRAFT_PER_POLL) -> dict[str, float]:
+    """
+    Returns:
+        Dictionary of the time to replay the capture in seconds, the mean time per poll in
+        milliseconds, the replay speed relative to real time and the number of spots
+    """
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        capture_path = str(Path(temp_dir) / "day.asbcap")
+        write_day(capture_path, polls, aircraft_per_poll)
+        config = configparser.ConfigParser()
+        config['ADSB'] = {"lat": "33.45", "long": "-112.07", "radius": "30",
+                          "adsb_interval": "60", "cooldown": "3600", "spot_unknown": "n",
+                          "spot_mil": "y", "spot_interesting": "y", "adsb_source": "replay",
+                          "replay_capture": capture_path, "replay_speed": "0"}
+        spots = Spotter(config, WATCHLIST, './images/', 'airspotbot/benchmark')
+        spot_count = 0
+        start = perf_counter()
+        for _ in range(polls):
+            spots.check_spots()
+            spot_count += len(spots.spot_queue)
+            spots.spot_queue.clear()
+        replay_seconds = perf_counter() - start
+    logging.disable(logging.NOTSET)
+    return {'replay_seconds': replay_seconds,
+            'poll_mean_ms': replay_seconds / polls * 1000,
+            'speedup': polls * 60 / replay_seconds,
+            'spots': spot_count}
+
+
+if __name__ == '__main__':
+    results = run()
+    print(f"Replay of {POLLS} polls with {AIRCRAFT_PER_POLL} aircraft each:")
+    for name, value in results.items():
+        print(f"  {name}: {value:0.2f}")
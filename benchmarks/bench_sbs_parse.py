@@ -0,0 +1,72 @@
+"""
+Benchmark of SBS-1 (BaseStation) message parsing throughput.
+
+Feeds a synthetic stream of airborne position, velocity, identification and altitude messages
+from a busy area into SbsParser in 64 KiB chunks, as SbsSource receives them from the socket,
+and reports the sustained parse rate and the time to build raw aircraft dictionaries for a poll.
+
+Run from the repository root with: python -m benchmarks.bench_sbs_parse
+"""
+
+import random
+from time import perf_counter
+
+from airspotbot.sbs import SbsParser
+
+AIRCRAFT = 1_000
+MESSAGES = 500_000
+CHUNK_SIZE = 65536
+
+
+def _synthetic_feed(aircraft: int, messages: int) -> bytes:
+    """Return a feed of SBS-1 messages in the mix transmitted by airborne aircraft"""
+    rng = random.Random(0)
+    hex_codes = [f'{h:06X}' for h in rng.sample(range(0x1000000), aircraft)]
+    date_time = '2023/11/14,22:13:20.000,2023/11/14,22:13:20.000'
+    lines = []
+    for n in range(messages):
+        hex_code = hex_codes[n % aircraft]
+        message_type = (3, 3, 4, 4, 5, 1)[rng.randrange(6)]
+        if message_type == 1:
+            fields = f'N{n % 99999:05d}  ,,,,,,,,,,,0'
+        elif message_type == 3:
+            fields = f',{rng.randrange(1000, 40000)},,,{rng.uniform(32, 35):.5f},' \
+                     f'{rng.uniform(-114, -110):.5f},,,0,0,0,0'
+        elif message_type == 4:
+            fields = f',,{rng.uniform(100, 500):.1f},{rng.uniform(0, 360):.1f},,,' \
+                     f'{rng.randrange(-2000, 2000)},,,,,0'
+        else:
+            fields = f',{rng.randrange(1000, 40000)},,,,,,,0,,0,0'
+        lines.append(f'MSG,{message_type},1,1,{hex_code},1,{date_time},{fields}\r\n')
+    return ''.join(lines).encode()
+
+
+def run(aircraft: int = AIRCRAFT, messages: int = MESSAGES) -> dict[str, float]:
+    """
+    Returns:
+        Dictionary of parse throughput in messages per second and megabytes per second, and the
+        time in milliseconds to convert the state table to raw aircraft dictionaries
+    """
+    feed = _synthetic_feed(aircraft, messages)
+    chunks = [feed[n:n + CHUNK_SIZE] for n in range(0, len(feed), CHUNK_SIZE)]
+    parser = SbsParser()
+    start = perf_counter()
+    for chunk in chunks:
+        parser.feed(chunk)
+    parse_seconds = perf_counter() - start
+    assert parser.message_count == messages
+    now = parser.clock()
+    start = perf_counter()
+    raw_aircraft = [state.to_raw(now) for state in parser.aircraft.values()]
+    to_raw_ms = (perf_counter() - start) * 1000
+    assert len(raw_aircraft) == aircraft
+    return {'messages_per_second': messages / parse_seconds,
+            'megabytes_per_second': len(feed) / parse_seconds / 1e6,
+            'to_raw_ms': to_raw_ms}
+
+
+if __name__ == '__main__':
+    results = run()
+    print(f"SBS-1 parsing of {MESSAGES} messages from {AIRCRAFT} aircraft:")
+    for name, value in results.items():
+        print(f"  {name}: {value:0.2f}")
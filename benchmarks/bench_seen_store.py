@@ -0,0 +1,66 @@
+"""
+Benchmark of the per-poll overhead of persisting the seen list with SqliteSeenStore.
+
+Simulates polls against a seen list of 10,000 tracked hex codes, where each poll spots a batch of
+new aircraft and expires the same number of old ones, then flushes the changes to disk.
+
+Run from the repository root with: python -m benchmarks.bench_seen_store
+"""
+
+import random
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from airspotbot.seen import SeenCache, SqliteSeenStore
+
+TRACKED_AIRCRAFT = 10_000
+CHANGES_PER_POLL = 200
+POLLS = 50
+
+
+def run(tracked_aircraft: int = TRACKED_AIRCRAFT,
+        changes_per_poll: int = CHANGES_PER_POLL,
+        polls: int = POLLS) -> dict[str, float]:
+    """
+    Returns:
+        Dictionary of timings in milliseconds: initial flush of all tracked aircraft, lazy load on
+        restart, and mean/max per-poll overhead (expire + spot + flush)
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = str(Path(temp_dir) / "seen.sqlite")
+        seen = SeenCache(SqliteSeenStore(db_path))
+        hex_codes = random.sample(range(0x1000000), tracked_aircraft + changes_per_poll * polls)
+        for seen_time, hex_code in enumerate(hex_codes[:tracked_aircraft]):
+            seen[f'{hex_code:06x}'] = float(seen_time)
+        start = perf_counter()
+        seen.flush()
+        initial_flush_ms = (perf_counter() - start) * 1000
+        poll_times = []
+        next_hex = tracked_aircraft
+        for poll in range(polls):
+            start = perf_counter()
+            seen.expire(float(changes_per_poll * (poll + 1)))
+            for _ in range(changes_per_poll):
+                seen[f'{hex_codes[next_hex]:06x}'] = float(next_hex)
+                next_hex += 1
+            seen.flush()
+            poll_times.append((perf_counter() - start) * 1000)
+        seen.store.close()
+        start = perf_counter()
+        restarted = SeenCache(SqliteSeenStore(db_path))
+        assert len(restarted) == tracked_aircraft
+        load_ms = (perf_counter() - start) * 1000
+        restarted.store.close()
+    return {'initial_flush_ms': initial_flush_ms,
+            'restart_load_ms': load_ms,
+            'poll_mean_ms': sum(poll_times) / len(poll_times),
+            'poll_max_ms': max(poll_times)}
+
+
+if __name__ == '__main__':
+    results = run()
+    print(f"Seen store with {TRACKED_AIRCRAFT} tracked aircraft, {CHANGES_PER_POLL} spots and "
+          f"expiries per poll:")
+    for name, value in results.items():
+        print(f"  {name}: {value:0.2f}")
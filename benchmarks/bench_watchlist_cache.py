@@ -0,0 +1,67 @@
+"""
+Benchmark of Spotter startup with a large watchlist, parsing the CSV file compared to mapping
+the compiled watchlist cache.
+
+Generates a watchlist of 300,000 ICAO address and registration number rows, then times loading
+it into a Spotter without a cache, on the first startup with a cache (parse + write) and on a
+later startup that maps the cache.
+
+Run from the repository root with: python -m benchmarks.bench_watchlist_cache
+"""
+
+import configparser
+import random
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from airspotbot.adsbget import Spotter
+
+WATCHLIST_ROWS = 300_000
+CONFIG_PATH = Path(__file__).parent.parent / "tests" / "valid_asb.config"
+
+
+def _write_watchlist(path: Path, rows: int, seed: int = 0):
+    rng = random.Random(seed)
+    with open(path, 'w') as watchlist_file:
+        watchlist_file.write("Key,Type,Mil Only,Description,Image\n")
+        for hex_code in rng.sample(range(0x1000000), rows // 2):
+            watchlist_file.write(f"{hex_code:06x},IA,,Government aircraft,\n")
+        for n in range(rows - rows // 2):
+            watchlist_file.write(f"N{n}GV,RN,,Government aircraft,\n")
+
+
+def _startup(config: configparser.ConfigParser, watchlist_path: Path) -> float:
+    """Return the time in ms of constructing a Spotter"""
+    start = perf_counter()
+    Spotter(config, str(watchlist_path), './images/', 'benchmark')
+    return (perf_counter() - start) * 1000
+
+
+def run(rows: int = WATCHLIST_ROWS) -> dict[str, float]:
+    """
+    Returns:
+        Dictionary of startup times in milliseconds without a cache, when writing the cache and
+        when mapping the cache, and the sizes of the CSV and cache files in MB
+    """
+    config = configparser.ConfigParser()
+    config.read(CONFIG_PATH)
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        watchlist_path = Path(temp_dir) / "watchlist.csv"
+        _write_watchlist(watchlist_path, rows)
+        cache_path = Path(temp_dir) / "watchlist.cache"
+        results['csv_ms'] = _startup(config, watchlist_path)
+        config['ADSB']['watchlist_cache'] = str(cache_path)
+        results['cache_write_ms'] = _startup(config, watchlist_path)
+        results['cache_map_ms'] = _startup(config, watchlist_path)
+        results['csv_size_mb'] = watchlist_path.stat().st_size / 1_000_000
+        results['cache_size_mb'] = cache_path.stat().st_size / 1_000_000
+    return results
+
+
+if __name__ == '__main__':
+    results = run()
+    print(f"Spotter startup with a {WATCHLIST_ROWS} row watchlist:")
+    for name, value in results.items():
+        print(f"  {name}: {value:0.2f}")
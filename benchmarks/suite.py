@@ -0,0 +1,344 @@
+"""
+Benchmark suite for the spotting hot path, measuring each stage at several input sizes and
+writing the results as JSON so they can be compared across releases.
+
+Benchmarks (SIZE is the number of aircraft, seen list entries, watchlist rows or lookups):
+
+    aircraft_spot          AircraftSpot construction from raw ADSBx aircraft
+    check_spots            Spotter.check_spots on a first poll of SIZE aircraft
+    check_spots_repeat     Spotter.check_spots on an unchanged repeat poll (snapshot diffing)
+    prefilter              Spotter._may_qualify on SIZE aircraft, a tenth of them already seen
+    check_seen             Spotter._check_seen with SIZE tracked aircraft, 1% expiring
+    read_watchlist         Spotter._read_watchlist with a watchlist.csv of SIZE rows
+    location_description   Locator.get_location_description with a Pelias backend, SIZE lookups
+    offline_location       Locator.get_location_description with an offline place index of
+                           OFFLINE_PLACES places, SIZE lookups
+
+The ADSBx API and Pelias are replaced by a stub HttpClient returning canned responses, so no
+network access is needed and only airspotbot's own processing is measured.
+
+Run from the repository root with:
+
+    python -m benchmarks.suite                        # all benchmarks at 10, 1k, 10k, 100k
+    python -m benchmarks.suite --sizes 10 1000 --benchmark check_spots --output results.json
+    python -m benchmarks.suite --output new.json --compare old.json
+
+With --extras, the results of the standalone benchmarks in this package (seen store, AircraftSpot
+memory, watchlist cache, SBS-1 parsing and capture replay) are included as well.
+"""
+
+import argparse
+import configparser
+import gc
+import importlib
+import json
+import logging
+import platform
+import random
+import statistics
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from time import perf_counter
+from typing import Callable
+
+from airspotbot.adsbget import AircraftSpot, Spotter
+from airspotbot.httpclient import DEFAULT_POOL_SIZE
+from airspotbot.location import Locator
+
+RESULTS_FORMAT_VERSION = 1
+DEFAULT_SIZES = (10, 1_000, 10_000, 100_000)
+DEFAULT_REPEAT = 3
+# slowdown relative to the baseline reported as a regression by --compare
+DEFAULT_REGRESSION_THRESHOLD = 1.2
+EXTRA_BENCHMARKS = ('bench_seen_store', 'bench_aircraft_spot', 'bench_watchlist_cache',
+                    'bench_sbs_parse', 'bench_replay')
+WATCHLIST = str(Path(__file__).parent.parent / "tests" / "valid_watchlist.csv")
+USER_AGENT = 'airspotbot/benchmark'
+
+
+class StubResponse:
+    """Stands in for requests.Response, with a canned JSON payload"""
+
+    status_code = 200
+    elapsed = timedelta(0)
+    headers: dict[str, str] = {}
+
+    def __init__(self, payload: dict):
+        self._payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self) -> dict:
+        return self._payload
+
+
+class StubHttpClient:
+    """Stands in for HttpClient, answering every request with the same canned payload"""
+
+    def __init__(self, payload: dict):
+        self.payload = payload
+        self.request_count = 0
+
+    def get(self, url: str, **kwargs) -> StubResponse:
+        self.request_count += 1
+        return StubResponse(self.payload)
+
+    def pool_size_for(self, url: str) -> int:
+        return DEFAULT_POOL_SIZE
+
+
+def synthetic_aircraft(count: int, seed: int = 0) -> list[dict]:
+    """Return raw aircraft in the ADSBx v2 format around a busy airport, with a mix of civil,
+    military, interesting and unregistered aircraft"""
+    rng = random.Random(seed)
+    aircraft = []
+    for hex_code in rng.sample(range(0x1000000), count):
+        raw_aircraft = {"hex": f'{hex_code:06x}', "type": "adsb_icao",
+                        "flight": f'SWA{rng.randrange(1, 9999):<5}',
+                        "t": rng.choice(('B738', 'A320', 'E75L', 'C172', 'B77W', 'C17', 'H60')),
+                        "alt_baro": rng.choice((rng.randrange(500, 41000), 'ground')),
+                        "gs": round(rng.uniform(0, 500), 1), "track": round(rng.uniform(0, 360), 2),
+                        "lat": round(rng.uniform(33.2, 33.7), 6),
+                        "lon": round(rng.uniform(-112.3, -111.8), 6),
+                        "squawk": f'{rng.randrange(0o10000):04o}', "seen_pos": 0.5, "seen": 0.1}
+        if rng.random() > 0.05:
+            raw_aircraft["r"] = f'N{rng.randrange(1, 99999)}'
+        flags = rng.random()
+        if flags < 0.02:
+            raw_aircraft["dbFlags"] = 1
+        elif flags < 0.03:
+            raw_aircraft["dbFlags"] = 2
+        aircraft.append(raw_aircraft)
+    return aircraft
+
+
+def _adsb_config(**options: str) -> configparser.ConfigParser:
+    config = configparser.ConfigParser()
+    config['ADSB'] = {"lat": "33.45", "long": "-112.07", "radius": "30", "adsb_interval": "60",
+                      "cooldown": "3600", "spot_unknown": "y", "spot_mil": "y",
+                      "spot_interesting": "y", "adsb_api_key": "benchmark", **options}
+    return config
+
+
+def _spotter(raw_aircraft: list[dict], **options: str) -> Spotter:
+    return Spotter(_adsb_config(**options), WATCHLIST, './images/', USER_AGENT,
+                   http_client=StubHttpClient({"ac": raw_aircraft}))
+
+
+# Each benchmark is a setup function taking the size and a scratch directory, and returning the
+# operation to time. Setup runs before every repetition and is not timed.
+
+def setup_aircraft_spot(size: int, workdir: Path) -> Callable[[], object]:
+    raw_aircraft = synthetic_aircraft(size)
+    return lambda: [AircraftSpot(a) for a in raw_aircraft]
+
+
+def setup_check_spots(size: int, workdir: Path) -> Callable[[], object]:
+    spots = _spotter(synthetic_aircraft(size), snapshot_diff='n')
+    return spots.check_spots
+
+
+def setup_check_spots_repeat(size: int, workdir: Path) -> Callable[[], object]:
+    spots = _spotter(synthetic_aircraft(size))
+    spots.check_spots()
+    return spots.check_spots
+
+
+def setup_prefilter(size: int, workdir: Path) -> Callable[[], object]:
+    raw_aircraft = synthetic_aircraft(size)
+    spots = _spotter(raw_aircraft)
+    for seen_aircraft in raw_aircraft[::10]:
+        spots.seen[seen_aircraft['hex']] = 0.0
+    return lambda: [spots._may_qualify(a) for a in raw_aircraft]
+
+
+def setup_check_seen(size: int, workdir: Path) -> Callable[[], object]:
+    spots = _spotter([], cooldown='3600')
+    for seen_time, raw_aircraft in enumerate(synthetic_aircraft(size)):
+        spots.seen[raw_aircraft['hex']] = float(seen_time)
+    spots.clock = lambda: size * 0.01 + spots.cooldown_seconds
+    return spots._check_seen
+
+
+def setup_read_watchlist(size: int, workdir: Path) -> Callable[[], object]:
+    watchlist_path = workdir / f"watchlist_{size}.csv"
+    if not watchlist_path.exists():
+        rng = random.Random(size)
+        with open(watchlist_path, 'w') as watchlist_file:
+            watchlist_file.write("Key,Type,Mil Only,Description,Image\n")
+            for n, hex_code in enumerate(rng.sample(range(0x1000000), size)):
+                row_type = ('IA', 'RN', 'TC')[n % 3]
+                key = {'IA': f'{hex_code:06x}', 'RN': f'N{n}GV', 'TC': f'T{n:03X}'}[row_type]
+                watchlist_file.write(f"{key},{row_type},{'Y' if n % 7 == 0 else ''},"
+                                     f"Watchlist entry {n % 50},\n")
+    spots = _spotter([], watchlist_reload='n')
+    spots.watchlist_path = str(watchlist_path)
+    return spots._read_watchlist
+
+
+PELIAS_RESPONSE = {"geocoding": {}, "type": "FeatureCollection",
+                   "features": [{"properties": {"name": "Phoenix Sky Harbor"}}]}
+
+
+def setup_location_description(size: int, workdir: Path) -> Callable[[], object]:
+    config = configparser.ConfigParser()
+    config['LOCATION'] = {"location_type": "pelias", "pelias_host": "http://localhost",
+                          "pelias_port": "4000", "pelias_area_layer": "neighbourhood",
+                          "pelias_point_layer": "venue"}
+    locator = Locator(config, USER_AGENT, http_client=StubHttpClient(PELIAS_RESPONSE))
+    coordinates = [(str(a['lat']), str(a['lon'])) for a in synthetic_aircraft(size)]
+    return lambda: [locator.get_location_description(lat, lon) for lat, lon in coordinates]
+
+
+OFFLINE_PLACES = 200_000
+
+
+def setup_offline_location(size: int, workdir: Path) -> Callable[[], object]:
+    dump_path = workdir / "places.txt"
+    if not dump_path.exists():
+        # a dense area around the synthetic aircraft, and places spread over the rest of the world
+        rng = random.Random(0)
+        with open(dump_path, 'w') as dump_file:
+            for n in range(OFFLINE_PLACES):
+                if n % 4 == 0:
+                    latitude, longitude = rng.uniform(33.0, 34.0), rng.uniform(-112.6, -111.4)
+                else:
+                    latitude, longitude = rng.uniform(-60, 70), rng.uniform(-180, 180)
+                feature_code = ('PPL', 'PPLX', 'AIRP')[n % 3]
+                dump_file.write(f"{n}\tPlace {n}\t\t\t{latitude:.5f}\t{longitude:.5f}\tP\t"
+                                f"{feature_code}\n")
+    config = configparser.ConfigParser()
+    config['LOCATION'] = {"location_type": "offline", "offline_places": str(dump_path)}
+    locator = Locator(config, USER_AGENT)
+    coordinates = [(str(a['lat']), str(a['lon'])) for a in synthetic_aircraft(size)]
+    return lambda: [locator.get_location_description(lat, lon) for lat, lon in coordinates]
+
+
+BENCHMARKS: dict[str, Callable[[int, Path], Callable[[], object]]] = {
+    'aircraft_spot': setup_aircraft_spot,
+    'check_spots': setup_check_spots,
+    'check_spots_repeat': setup_check_spots_repeat,
+    'check_seen': setup_check_seen,
+    'prefilter': setup_prefilter,
+    'read_watchlist': setup_read_watchlist,
+    'location_description': setup_location_description,
+    'offline_location': setup_offline_location,
+}
+
+
+def run_benchmark(name: str, size: int, repeat: int, workdir: Path) -> dict:
+    """Time one benchmark at one size, returning its result record"""
+    timings = []
+    for _ in range(repeat):
+        operation = BENCHMARKS[name](size, workdir)
+        # like timeit, keep garbage collection of the setup's objects out of the timing
+        gc.collect()
+        gc.disable()
+        try:
+            start = perf_counter()
+            operation()
+            timings.append(perf_counter() - start)
+        finally:
+            gc.enable()
+    best_seconds = min(timings)
+    return {'benchmark': name, 'size': size, 'repeat': repeat,
+            'best_seconds': best_seconds, 'median_seconds': statistics.median(timings),
+            'per_item_us': best_seconds / size * 1e6}
+
+
+def run(benchmarks: list[str] | None = None, sizes: tuple[int, ...] = DEFAULT_SIZES,
+        repeat: int = DEFAULT_REPEAT, extras: bool = False) -> dict:
+    """
+    Run the suite.
+
+    Returns:
+        Results document: metadata about the run, a list of result records (benchmark, size,
+        best and median time in seconds, and best time per item in microseconds), and the
+        results of the standalone benchmarks if extras is True
+    """
+    logging.disable(logging.CRITICAL)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for name in benchmarks or BENCHMARKS:
+                for size in sizes:
+                    result = run_benchmark(name, size, repeat, Path(temp_dir))
+                    print(f"{name:>22} {size:>8}: {result['best_seconds'] * 1000:10.2f} ms "
+                          f"({result['per_item_us']:0.2f} us/item)", file=sys.stderr)
+                    results.append(result)
+        extra_results = {}
+        if extras:
+            for module_name in EXTRA_BENCHMARKS:
+                module = importlib.import_module(f'{__package__}.{module_name}')
+                print(f"{module_name:>22}: running", file=sys.stderr)
+                extra_results[module_name] = module.run()
+    finally:
+        logging.disable(logging.NOTSET)
+    return {'format_version': RESULTS_FORMAT_VERSION,
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'results': results, 'extras': extra_results}
+
+
+def compare(current: dict, baseline: dict,
+            threshold: float = DEFAULT_REGRESSION_THRESHOLD) -> list[str]:
+    """
+    Compare two results documents.
+
+    Returns:
+        Descriptions of the benchmarks that are slower than the baseline by more than threshold
+    """
+    baseline_times = {(r['benchmark'], r['size']): r['best_seconds']
+                      for r in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        key = (result['benchmark'], result['size'])
+        if key not in baseline_times:
+            continue
+        ratio = result['best_seconds'] / baseline_times[key]
+        print(f"{key[0]:>22} {key[1]:>8}: {ratio:6.2f}x baseline", file=sys.stderr)
+        if ratio > threshold:
+            regressions.append(f"{key[0]} at size {key[1]} is {ratio:0.2f}x slower")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark suite for airspotbot's spotting "
+                                                 "hot path")
+    parser.add_argument('--benchmark', action='append', choices=list(BENCHMARKS),
+                        help="benchmark to run, can be repeated (default: all)")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="input sizes to run each benchmark at")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help="repetitions of each benchmark, the best time is reported")
+    parser.add_argument('--extras', action='store_true',
+                        help="also run the standalone benchmarks of this package")
+    parser.add_argument('--output', help="write the results as JSON to this file "
+                                         "(default: standard output)")
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help="results file of an earlier run to compare against. Exits with "
+                             "status 1 if any benchmark regressed.")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help="slowdown ratio reported as a regression by --compare")
+    args = parser.parse_args(argv)
+    results = run(args.benchmark, tuple(args.sizes), args.repeat, args.extras)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,224 +3,16 @@ Tests for the adsbget.py module
 """
 
 from .context import airspotbot
+from .conftest import VALID_WATCHLIST, INVALID_WATCHLIST, PATTERN_WATCHLIST, USER_AGENT, \
+    DEFAULT_IMAGE_DIRECTORY
 
 import pytest
 import random
 import sys
-import configparser
+import os
 import logging
 import requests_mock
 import requests
-import string
-
-VALID_WATCHLIST = "./tests/valid_watchlist.csv"
-INVALID_WATCHLIST = "./tests/invalid_watchlist.csv"
-USER_AGENT = "airspotbot/testing"
-DEFAULT_IMAGE_DIRECTORY = "./images/"
-
-
-@pytest.fixture
-def generate_empty_adsb_config(scope="module"):
-    dummy_config = configparser.ConfigParser()
-    dummy_config['ADSB'] = {"lat": "",
-                            "long": "",
-                            "radius": "",
-                            "adsb_interval": "",
-                            "cooldown": "",
-                            "spot_unknown": "",
-                            "spot_mil": "",
-                            "adsb_api_key": ""}
-    return dummy_config
-
-
-@pytest.fixture
-def generate_valid_adsb_config(scope="module"):
-    dummy_config = configparser.ConfigParser()
-    dummy_config['ADSB'] = {"lat": str(random.uniform(-90, 90)),
-                            "long": str(random.uniform(-180, 180)),
-                            "radius": str(random.randint(1, 250)),
-                            "adsb_interval": str(random.randint(1, 20)),
-                            "cooldown": str(random.randint(1, 20)),
-                            "spot_unknown": "y",
-                            "spot_mil": "y",
-                            "spot_interesting": "y",
-                            "adsb_api_key": ''.join(
-                                random.choices(string.ascii_letters + string.digits, k=16))}
-    return dummy_config
-
-
-@pytest.fixture
-def generate_spotter(generate_valid_adsb_config, scope="module"):
-    return airspotbot.adsbget.Spotter(config_parsed=generate_valid_adsb_config,
-                                      watchlist_path=VALID_WATCHLIST,
-                                      image_dir=DEFAULT_IMAGE_DIRECTORY,
-                                      user_agent=USER_AGENT)
-
-
-@pytest.fixture
-def sample_adsbx_json():
-    """A sample JSON response from the ADSBx API showing some busy airspace"""
-    return {"ac": [
-        {"hex": "3e232e", "type": "adsb_icao", "flight": "DIENE   ", "r": "D-IENE", "t": "C25A",
-         "alt_baro": 1200, "alt_geom": 1525, "gs": 177.6, "ias": 163, "tas": 164, "mach": 0.252,
-         "wd": 61, "ws": 20, "track": 204.98, "track_rate": -0.19, "roll": -1.76,
-         "mag_heading": 200.57, "true_heading": 201.14, "baro_rate": -288, "geom_rate": -64,
-         "squawk": "2751", "emergency": "none", "category": "A1", "nav_qnh": 1019.2,
-         "nav_altitude_mcp": 1344, "nav_altitude_fms": 1808, "nav_heading": 198.98,
-         "lat": 51.374119, "lon": 0.0354, "nic": 8, "rc": 186, "seen_pos": 0.086, "version": 2,
-         "nic_baro": 1, "nac_p": 11, "nac_v": 1, "sil": 3, "sil_type": "perhour", "gva": 2,
-         "sda": 2, "alert": 0, "spi": 0, "mlat": [], "tisb": [], "messages": 7566034, "seen": 0,
-         "rssi": -2.8, "dst": 16.71},
-        {"hex": "407941", "type": "mlat", "flight": "GAWGB   ", "r": "G-AWGB", "t": "SPIT",
-         "dbFlags": 1, "gs": 250, "track": 229, "squawk": "7047", "emergency": "none",
-         "category": "A1",
-         "lat": 51.310141, "lon": 0.128013, "nic": 0, "rc": 0, "seen_pos": 3.919, "version": 0,
-         "alert": 0, "spi": 0, "mlat": ["gs", "track", "lat", "lon", "nic", "rc"], "tisb": [],
-         "messages": 3194830, "seen": 0.5, "rssi": -8.6, "dst": 15.52},
-        {"hex": "407968", "type": "mlat", "flight": "GHCNX   ", "r": "G-HCNX", "t": "EC55",
-         "alt_baro": 1250, "gs": 145, "tas": 278, "track": 12, "roll": -0.18, "baro_rate": 0,
-         "squawk": "6600", "category": "A7", "nav_qnh": 1013.2, "nav_altitude_mcp": 27008,
-         "nav_altitude_fms": 27008, "lat": 51.296933, "lon": 0.188649, "nic": 0, "rc": 0,
-         "seen_pos": 0.095, "version": 0, "alert": 0, "spi": 0,
-         "mlat": ["gs", "track", "baro_rate", "lat", "lon", "nic", "rc"], "tisb": [],
-         "messages": 365967, "seen": 0.1, "rssi": -7.5, "dst": 14.36},
-        {"hex": "407536", "type": "adsb_icao", "flight": "BAW622  ", "r": "G-TTNF", "t": "A20N",
-         "dbFlags": 2, "alt_baro": 14525, "alt_geom": 15075, "gs": 383.4, "ias": 306, "tas": 378,
-         "mach": 0.6,
-         "wd": 218, "ws": 12, "oat": -12, "tat": 7, "track": 101.28, "track_rate": 0, "roll": -0.35,
-         "mag_heading": 102.3, "true_heading": 102.95, "baro_rate": 2624, "geom_rate": 2592,
-         "squawk": "3473", "emergency": "none", "category": "A3", "nav_qnh": 1012.8,
-         "nav_altitude_mcp": 27008, "lat": 51.360199, "lon": 0.270386, "nic": 8, "rc": 186,
-         "seen_pos": 0.195, "version": 2, "nic_baro": 1, "nac_p": 9, "nac_v": 1, "sil": 3,
-         "sil_type": "perhour", "gva": 2, "sda": 3, "alert": 0, "spi": 0, "mlat": [], "tisb": [],
-         "messages": 22288110, "seen": 0, "rssi": -10, "dst": 9.51},
-        {"hex": "4ca708", "type": "adsb_icao", "flight": "RYR89BZ ", "r": "EI-EBL", "t": "B738",
-         "alt_baro": 35025, "alt_geom": 35825, "gs": 422.4, "ias": 259, "tas": 442, "mach": 0.764,
-         "wd": 210, "ws": 102, "oat": -53, "tat": -27, "track": 124.29, "track_rate": 0,
-         "roll": -0.35, "mag_heading": 136.76, "true_heading": 137.46, "baro_rate": 0,
-         "geom_rate": 32, "squawk": "5256", "emergency": "none", "category": "A3",
-         "nav_qnh": 1013.6, "nav_altitude_mcp": 35008, "nav_altitude_fms": 35008,
-         "nav_heading": 136.41, "lat": 51.380636, "lon": 0.488815, "nic": 7, "rc": 371,
-         "seen_pos": 0.39, "version": 2, "nic_baro": 1, "nac_p": 8, "nac_v": 1, "sil": 3,
-         "sil_type": "perhour", "gva": 1, "sda": 2, "alert": 0, "spi": 0, "mlat": [], "tisb": [],
-         "messages": 31308987, "seen": 0.2, "rssi": -12.7, "dst": 5.44},
-        {"hex": "3e2bcd", "type": "adsb_icao", "flight": "AWU504E ", "r": "D-IHUB", "t": "C25A",
-         "alt_baro": 5825, "alt_geom": 6225, "gs": 257.6, "ias": 244, "tas": 266, "mach": 0.408,
-         "wd": 166, "ws": 10, "oat": 7, "tat": 16, "track": 186.46, "track_rate": -0.03,
-         "roll": -0.18, "mag_heading": 184.92, "true_heading": 185.72, "baro_rate": 32,
-         "geom_rate": 0, "squawk": "2037", "emergency": "none", "category": "A1", "nav_qnh": 1020,
-         "nav_altitude_mcp": 6016, "nav_heading": 184.92, "lat": 51.419174, "lon": 0.727473,
-         "nic": 8, "rc": 186, "seen_pos": 0.221, "version": 2, "nic_baro": 1, "nac_p": 10,
-         "nac_v": 1, "sil": 3, "sil_type": "perhour", "gva": 2, "sda": 2, "alert": 0, "spi": 0,
-         "mlat": [], "tisb": [], "messages": 5724763, "seen": 0, "rssi": -5.5, "dst": 10.6},
-        {"hex": "40796c", "type": "adsb_icao", "flight": "TOM7NT  ", "r": "G-TUMN", "t": "B38M",
-         "alt_baro": 14375, "alt_geom": 14950, "gs": 344.1, "ias": 277, "tas": 342, "mach": 0.54,
-         "wd": 183, "ws": 16, "oat": -9, "tat": 6, "track": 83.66, "track_rate": 0.03, "roll": 0,
-         "mag_heading": 85.25, "true_heading": 86.07, "baro_rate": 2432, "geom_rate": 2432,
-         "squawk": "3441", "emergency": "none", "category": "A3", "nav_qnh": 1013.6,
-         "nav_altitude_mcp": 27008, "nav_altitude_fms": 27008, "nav_heading": 85.08,
-         "lat": 51.207733, "lon": 0.736307, "nic": 8, "rc": 186, "seen_pos": 0, "version": 2,
-         "nic_baro": 1, "nac_p": 10, "nac_v": 2, "sil": 3, "sil_type": "perhour", "gva": 2,
-         "sda": 2, "alert": 0, "spi": 0, "mlat": [], "tisb": [], "messages": 19732262, "seen": 0,
-         "rssi": -18.8, "dst": 18.88},
-        {"hex": "4058c7", "type": "mlat", "flight": "GZAAP   ", "r": "G-ZAAP", "t": "CRUZ",
-         "alt_baro": "ground", "gs": 50, "track": 54, "baro_rate": 2, "squawk": "4575",
-         "lat": 51.538891,
-         "lon": 0.76194, "nic": 0, "rc": 0, "seen_pos": 1.95, "alert": 0, "spi": 0,
-         "mlat": ["gs", "track", "baro_rate", "lat", "lon", "nic", "rc"], "tisb": [],
-         "messages": 198847, "seen": 0.8, "rssi": -5.4, "dst": 12.2},
-        {"hex": "77058e", "type": "adsb_icao", "flight": "ALK503  ", "r": "4R-ALN", "t": "A333",
-         "alt_baro": 14100, "alt_geom": 14750, "gs": 373, "ias": 307, "tas": 376, "mach": 0.596,
-         "wd": 321, "ws": 5, "oat": -11, "tat": 8, "track": 270.61, "track_rate": 0, "roll": 0,
-         "mag_heading": 270.35, "true_heading": 271.15, "baro_rate": -1856, "geom_rate": -1856,
-         "squawk": "3260", "emergency": "none", "category": "A5", "nav_qnh": 1013.6,
-         "nav_altitude_mcp": 8000, "lat": 51.643295, "lon": 0.780549, "nic": 8, "rc": 186,
-         "seen_pos": 0.123, "version": 2, "nic_baro": 1, "nac_p": 9, "nac_v": 1, "sil": 3,
-         "sil_type": "perhour", "gva": 2, "sda": 2, "alert": 0, "spi": 0, "mlat": [], "tisb": [],
-         "messages": 11755558, "seen": 0, "rssi": -19.9, "dst": 16.02}], "total": 9,
-        "now": 1654367538288, "ctime": 1654367542448, "ptime": 184}
-
-
-@pytest.fixture
-def unexpected_adsbx_json():
-    """A sample JSON response from the ADSBx API with some missing keys"""
-    # first aircraft is missing hex key
-    return {"ac": [
-        {"type": "adsb_icao", "flight": "DIENE   ", "r": "D-IENE", "t": "C25A",
-         "alt_baro": 1200, "alt_geom": 1525, "gs": 177.6, "ias": 163, "tas": 164, "mach": 0.252,
-         "wd": 61, "ws": 20, "track": 204.98, "track_rate": -0.19, "roll": -1.76,
-         "mag_heading": 200.57, "true_heading": 201.14, "baro_rate": -288, "geom_rate": -64,
-         "squawk": "2751", "emergency": "none", "category": "A1", "nav_qnh": 1019.2,
-         "nav_altitude_mcp": 1344, "nav_altitude_fms": 1808, "nav_heading": 198.98,
-         "lat": 51.374119, "lon": 0.0354, "nic": 8, "rc": 186, "seen_pos": 0.086, "version": 2,
-         "nic_baro": 1, "nac_p": 11, "nac_v": 1, "sil": 3, "sil_type": "perhour", "gva": 2,
-         "sda": 2, "alert": 0, "spi": 0, "mlat": [], "tisb": [], "messages": 7566034, "seen": 0,
-         "rssi": -2.8, "dst": 16.71},
-        {"hex": "407941", "type": "mlat", "flight": "GAWGB   ", "r": "G-AWGB", "t": "SPIT",
-         "gs": 250, "track": 229, "squawk": "7047", "emergency": "none", "category": "A1",
-         "lat": 51.310141, "lon": 0.128013, "nic": 0, "rc": 0, "seen_pos": 3.919, "version": 0,
-         "alert": 0, "spi": 0, "mlat": ["gs", "track", "lat", "lon", "nic", "rc"], "tisb": [],
-         "messages": 3194830, "seen": 0.5, "rssi": -8.6, "dst": 15.52},
-        {"hex": "407968", "type": "mlat", "flight": "GHCNX   ", "r": "G-HCNX", "t": "EC55",
-         "alt_baro": 1250, "gs": 145, "tas": 278, "track": 12, "roll": -0.18, "baro_rate": 0,
-         "squawk": "6600", "category": "A7", "nav_qnh": 1013.2, "nav_altitude_mcp": 27008,
-         "nav_altitude_fms": 27008, "lat": 51.296933, "lon": 0.188649, "nic": 0, "rc": 0,
-         "seen_pos": 0.095, "version": 0, "alert": 0, "spi": 0,
-         "mlat": ["gs", "track", "baro_rate", "lat", "lon", "nic", "rc"], "tisb": [],
-         "messages": 365967, "seen": 0.1, "rssi": -7.5, "dst": 14.36},
-        {"hex": "407536", "type": "adsb_icao", "flight": "BAW622  ", "r": "G-TTNF", "t": "A20N",
-         "alt_baro": 14525, "alt_geom": 15075, "gs": 383.4, "ias": 306, "tas": 378, "mach": 0.6,
-         "wd": 218, "ws": 12, "oat": -12, "tat": 7, "track": 101.28, "track_rate": 0, "roll": -0.35,
-         "mag_heading": 102.3, "true_heading": 102.95, "baro_rate": 2624, "geom_rate": 2592,
-         "squawk": "3473", "emergency": "none", "category": "A3", "nav_qnh": 1012.8,
-         "nav_altitude_mcp": 27008, "lat": 51.360199, "lon": 0.270386, "nic": 8, "rc": 186,
-         "seen_pos": 0.195, "version": 2, "nic_baro": 1, "nac_p": 9, "nac_v": 1, "sil": 3,
-         "sil_type": "perhour", "gva": 2, "sda": 3, "alert": 0, "spi": 0, "mlat": [], "tisb": [],
-         "messages": 22288110, "seen": 0, "rssi": -10, "dst": 9.51},
-        {"hex": "4ca708", "type": "adsb_icao", "flight": "RYR89BZ ", "r": "EI-EBL", "t": "B738",
-         "alt_baro": 35025, "alt_geom": 35825, "gs": 422.4, "ias": 259, "tas": 442, "mach": 0.764,
-         "wd": 210, "ws": 102, "oat": -53, "tat": -27, "track": 124.29, "track_rate": 0,
-         "roll": -0.35, "mag_heading": 136.76, "true_heading": 137.46, "baro_rate": 0,
-         "geom_rate": 32, "squawk": "5256", "emergency": "none", "category": "A3",
-         "nav_qnh": 1013.6, "nav_altitude_mcp": 35008, "nav_altitude_fms": 35008,
-         "nav_heading": 136.41, "lat": 51.380636, "lon": 0.488815, "nic": 7, "rc": 371,
-         "seen_pos": 0.39, "version": 2, "nic_baro": 1, "nac_p": 8, "nac_v": 1, "sil": 3,
-         "sil_type": "perhour", "gva": 1, "sda": 2, "alert": 0, "spi": 0, "mlat": [], "tisb": [],
-         "messages": 31308987, "seen": 0.2, "rssi": -12.7, "dst": 5.44},
-        {"hex": "3e2bcd", "type": "adsb_icao", "flight": "AWU504E ", "r": "D-IHUB", "t": "C25A",
-         "alt_baro": 5825, "alt_geom": 6225, "gs": 257.6, "ias": 244, "tas": 266, "mach": 0.408,
-         "wd": 166, "ws": 10, "oat": 7, "tat": 16, "track": 186.46, "track_rate": -0.03,
-         "roll": -0.18, "mag_heading": 184.92, "true_heading": 185.72, "baro_rate": 32,
-         "geom_rate": 0, "squawk": "2037", "emergency": "none", "category": "A1", "nav_qnh": 1020,
-         "nav_altitude_mcp": 6016, "nav_heading": 184.92, "lat": 51.419174, "lon": 0.727473,
-         "nic": 8, "rc": 186, "seen_pos": 0.221, "version": 2, "nic_baro": 1, "nac_p": 10,
-         "nac_v": 1, "sil": 3, "sil_type": "perhour", "gva": 2, "sda": 2, "alert": 0, "spi": 0,
-         "mlat": [], "tisb": [], "messages": 5724763, "seen": 0, "rssi": -5.5, "dst": 10.6},
-        {"hex": "40796c", "type": "adsb_icao", "flight": "TOM7NT  ", "r": "G-TUMN", "t": "B38M",
-         "alt_baro": 14375, "alt_geom": 14950, "gs": 344.1, "ias": 277, "tas": 342, "mach": 0.54,
-         "wd": 183, "ws": 16, "oat": -9, "tat": 6, "track": 83.66, "track_rate": 0.03, "roll": 0,
-         "mag_heading": 85.25, "true_heading": 86.07, "baro_rate": 2432, "geom_rate": 2432,
-         "squawk": "3441", "emergency": "none", "category": "A3", "nav_qnh": 1013.6,
-         "nav_altitude_mcp": 27008, "nav_altitude_fms": 27008, "nav_heading": 85.08,
-         "lat": 51.207733, "lon": 0.736307, "nic": 8, "rc": 186, "seen_pos": 0, "version": 2,
-         "nic_baro": 1, "nac_p": 10, "nac_v": 2, "sil": 3, "sil_type": "perhour", "gva": 2,
-         "sda": 2, "alert": 0, "spi": 0, "mlat": [], "tisb": [], "messages": 19732262, "seen": 0,
-         "rssi": -18.8, "dst": 18.88},
-        {"hex": "4058c7", "type": "mlat", "flight": "GZAAP   ", "r": "G-ZAAP", "t": "CRUZ",
-         "alt_baro": 300, "gs": 50, "track": 54, "baro_rate": 2, "squawk": "4575", "lat": 51.538891,
-         "lon": 0.76194, "nic": 0, "rc": 0, "seen_pos": 1.95, "alert": 0, "spi": 0,
-         "mlat": ["gs", "track", "baro_rate", "lat", "lon", "nic", "rc"], "tisb": [],
-         "messages": 198847, "seen": 0.8, "rssi": -5.4, "dst": 12.2},
-        {"hex": "77058e", "type": "adsb_icao", "flight": "ALK503  ", "r": "4R-ALN", "t": "A333",
-         "alt_baro": 14100, "alt_geom": 14750, "gs": 373, "ias": 307, "tas": 376, "mach": 0.596,
-         "wd": 321, "ws": 5, "oat": -11, "tat": 8, "track": 270.61, "track_rate": 0, "roll": 0,
-         "mag_heading": 270.35, "true_heading": 271.15, "baro_rate": -1856, "geom_rate": -1856,
-         "squawk": "3260", "emergency": "none", "category": "A5", "nav_qnh": 1013.6,
-         "nav_altitude_mcp": 8000, "lat": 51.643295, "lon": 0.780549, "nic": 8, "rc": 186,
-         "seen_pos": 0.123, "version": 2, "nic_baro": 1, "nac_p": 9, "nac_v": 1, "sil": 3,
-         "sil_type": "perhour", "gva": 2, "sda": 2, "alert": 0, "spi": 0, "mlat": [], "tisb": [],
-         "messages": 11755558, "seen": 0, "rssi": -19.9, "dst": 16.02}], "total": 9,
-        "now": 1654367538288, "ctime": 1654367542448, "ptime": 184}
 
 
 def test_import():
@@ -351,6 +143,23 @@ class TestWatchlistImport:
         assert len(test_spotter.watchlist_rn) == 0
         assert len(test_spotter.watchlist_tc) == 0
 
+    def test_pattern_rows(self, generate_valid_adsb_config, caplog):
+        """Test reading hex range, registration prefix and type code wildcard rows"""
+        test_spotter = airspotbot.adsbget.Spotter(config_parsed=generate_valid_adsb_config,
+                                                  watchlist_path=PATTERN_WATCHLIST,
+                                                  image_dir=DEFAULT_IMAGE_DIRECTORY,
+                                                  user_agent=USER_AGENT)
+        assert test_spotter.watchlist_ir['400000-43FFFF']['start'] == 0x400000
+        assert test_spotter.watchlist_ir['400000-43FFFF']['end'] == 0x43FFFF
+        assert set(test_spotter.watchlist_rp) == {'N1', 'N12'}
+        assert test_spotter.watchlist_tp['EC*'] == {'desc': 'Military Eurocopter', 'img': '',
+                                                    'mil_only': True, 'prefix': 'EC'}
+        # a range with a single bound and a type code without a wildcard are rejected
+        assert "Invalid key AE0000 in row 10" in caplog.text
+        assert "Invalid key C13 in row 11" in caplog.text
+        assert len(test_spotter.watchlist_ir) == 2
+        assert len(test_spotter.watchlist_tp) == 2
+
     def test_missing_watchlist_file(self, generate_valid_adsb_config, caplog):
         """Test that warning message is generated when watchlist file is missing"""
         test_spotter = airspotbot.adsbget.Spotter(config_parsed=generate_valid_adsb_config,
@@ -407,6 +216,15 @@ class TestWatchlistImport:
         assert spots.watchlist_ia["508035"]["desc"] == "Antonov AN-225 Mriya"
         assert spots.watchlist_ia["508035"]["img"] == ""
 
+    def test_missing_images_reported_at_startup(self, generate_valid_adsb_config, caplog):
+        """Test that watchlist images missing from the image directory are reported at load"""
+        airspotbot.adsbget.Spotter(config_parsed=generate_valid_adsb_config,
+                                   watchlist_path=VALID_WATCHLIST,
+                                   image_dir=DEFAULT_IMAGE_DIRECTORY,
+                                   user_agent=USER_AGENT)
+        assert "2 image file(s) named in the watchlist were not found in ./images/: " \
+               "test.png, uh-60.jpg." in caplog.text
+
 
 class TestADSBxCall:
     """Test functions that call the ADSBx API,
@@ -481,3 +299,330 @@ class TestADSBxCall:
         requests_mock.get(spots.url, json=sample_adsbx_json, status_code=200)
         spots.check_spots()
         assert '407536' in [p.hex_code for p in spots.spot_queue]
+
+
+class TestMultiRegion:
+    """Test spotting in several regions coalesced into a single API query"""
+
+    @pytest.fixture
+    def generate_region_spotter(self, generate_valid_adsb_config):
+        generate_valid_adsb_config['ADSB']['lat'] = "51.36"
+        generate_valid_adsb_config['ADSB']['long'] = "0.27"
+        generate_valid_adsb_config['ADSB']['radius'] = "10"
+        generate_valid_adsb_config['REGION east'] = {"lat": "51.42",
+                                                     "long": "0.73",
+                                                     "radius": "10"}
+        return airspotbot.adsbget.Spotter(config_parsed=generate_valid_adsb_config,
+                                          watchlist_path=VALID_WATCHLIST,
+                                          image_dir=DEFAULT_IMAGE_DIRECTORY,
+                                          user_agent=USER_AGENT)
+
+    def test_regions_coalesced(self, generate_region_spotter):
+        spots = generate_region_spotter
+        assert [r.name for r in spots.regions] == ['main', 'east']
+        assert len(spots.urls) == 1
+        assert spots.url == spots.urls[0]
+
+    def test_invalid_region_radius(self, generate_valid_adsb_config):
+        generate_valid_adsb_config['REGION east'] = {"lat": "51.42",
+                                                     "long": "0.73",
+                                                     "radius": "0"}
+        with pytest.raises(ValueError) as exc_info:
+            airspotbot.adsbget.Spotter(config_parsed=generate_valid_adsb_config,
+                                       watchlist_path=VALID_WATCHLIST,
+                                       image_dir=DEFAULT_IMAGE_DIRECTORY,
+                                       user_agent=USER_AGENT)
+        assert 'radius value of region "east" must be an integer' in str(exc_info.value)
+
+    def test_results_split_by_region(self, requests_mock, generate_region_spotter,
+                                     sample_adsbx_json):
+        spots = generate_region_spotter
+        requests_mock.get(spots.url, json=sample_adsbx_json, status_code=200)
+        spots.check_spots()
+        spot_regions = {p.hex_code: p.region for p in spots.spot_queue}
+        assert spot_regions['407536'] == 'main'
+        assert spot_regions['3e2bcd'] == 'east'
+        # 4R-ALN is on the watchlist, but outside both regions
+        assert '77058e' not in spot_regions
+
+
+class TestWatchlistReload:
+    """Test reloading the watchlist file while the bot is running"""
+
+    def test_reload_on_change(self, requests_mock, generate_valid_adsb_config, tmp_path,
+                              caplog):
+        caplog.set_level(logging.INFO)
+        watchlist_path = tmp_path / "watchlist.csv"
+        watchlist_path.write_text("Key,Type,Mil Only,Description,Image\n"
+                                  "NASA941,RN,,NASA Super Guppy,\n"
+                                  "H60,TC,N,Sikorsky H-60,\n")
+        spots = airspotbot.adsbget.Spotter(config_parsed=generate_valid_adsb_config,
+                                           watchlist_path=str(watchlist_path),
+                                           image_dir=DEFAULT_IMAGE_DIRECTORY,
+                                           user_agent=USER_AGENT)
+        requests_mock.get(spots.url, json={'ac': []}, status_code=200)
+        old_rules = spots.rules
+        spots.check_spots()
+        assert spots._reload_thread is None  # file unchanged, nothing to reload
+        watchlist_path.write_text("Key,Type,Mil Only,Description,Image\n"
+                                  "NASA941,RN,,Super Guppy,\n"
+                                  "508035,IA,,Antonov AN-225 Mriya,\n")
+        os.utime(watchlist_path, ns=(0, spots._watchlist_mtime + 1_000_000_000))
+        spots.check_spots()  # starts the reload in the background
+        spots._reload_thread.join()
+        assert spots.rules is old_rules  # swapped in at the start of the next cycle
+        spots.check_spots()
+        assert spots.rules is not old_rules
+        assert set(spots.watchlist_ia) == {'508035'}
+        assert spots.watchlist_tc == {}
+        assert "Added 1 watchlist_ia entries: 508035" in caplog.text
+        assert "Removed 1 watchlist_tc entries: H60" in caplog.text
+        assert "Changed 1 watchlist_rn entries: NASA941" in caplog.text
+
+    def test_reload_log_capped(self, requests_mock, generate_valid_adsb_config, tmp_path,
+                               caplog):
+        """A reload adding many entries lists only the first few at INFO level"""
+        watchlist_path = tmp_path / "watchlist.csv"
+        watchlist_path.write_text("Key,Type,Mil Only,Description,Image\n")
+        spots = airspotbot.adsbget.Spotter(config_parsed=generate_valid_adsb_config,
+                                           watchlist_path=str(watchlist_path),
+                                           image_dir=DEFAULT_IMAGE_DIRECTORY,
+                                           user_agent=USER_AGENT)
+        requests_mock.get(spots.url, json={'ac': []}, status_code=200)
+        hex_codes = [f'{n:06x}' for n in range(25)]
+        watchlist_path.write_text("Key,Type,Mil Only,Description,Image\n" +
+                                  "".join(f"{hex_code},IA,,Test aircraft,\n"
+                                          for hex_code in hex_codes))
+        os.utime(watchlist_path, ns=(0, spots._watchlist_mtime + 1_000_000_000))
+        spots.check_spots()
+        spots._reload_thread.join()
+        caplog.set_level(logging.INFO)
+        spots.check_spots()
+        info_messages = [record.getMessage() for record in caplog.records
+                         if record.levelno == logging.INFO and 'entries' in record.getMessage()]
+        assert info_messages == [f"Added 25 watchlist_ia entries: {', '.join(hex_codes[:10])} "
+                                 f"and 15 more"]
+        caplog.clear()
+        caplog.set_level(logging.DEBUG)
+        watchlist_path.write_text("Key,Type,Mil Only,Description,Image\n")
+        os.utime(watchlist_path, ns=(0, spots._watchlist_mtime + 1_000_000_000))
+        spots.check_spots()
+        spots._reload_thread.join()
+        spots.check_spots()
+        assert f"Removed watchlist_ia entries: {', '.join(hex_codes)}" in caplog.text
+
+    def test_reload_disabled(self, requests_mock, generate_valid_adsb_config, tmp_path):
+        generate_valid_adsb_config['ADSB']['watchlist_reload'] = "n"
+        watchlist_path = tmp_path / "watchlist.csv"
+        watchlist_path.write_text("Key,Type,Mil Only,Description,Image\n")
+        spots = airspotbot.adsbget.Spotter(config_parsed=generate_valid_adsb_config,
+                                           watchlist_path=str(watchlist_path),
+                                           image_dir=DEFAULT_IMAGE_DIRECTORY,
+                                           user_agent=USER_AGENT)
+        requests_mock.get(spots.url, json={'ac': []}, status_code=200)
+        os.utime(watchlist_path, ns=(0, spots._watchlist_mtime + 1_000_000_000))
+        spots.check_spots()
+        assert spots._reload_thread is None
+
+
+class TestSnapshotDiff:
+    """Test that only aircraft that entered or changed are evaluated"""
+
+    def test_unchanged_aircraft_skipped(self, requests_mock, generate_spotter, sample_adsbx_json):
+        spots = generate_spotter
+        requests_mock.get(spots.url, json=sample_adsbx_json, status_code=200)
+        spots.check_spots()
+        evaluated = []
+        spots._may_qualify = lambda raw_aircraft: evaluated.append(raw_aircraft['hex'])
+        spots.check_spots()
+        assert evaluated == []
+        assert len(spots.last_snapshot.unchanged) == len(sample_adsbx_json['ac'])
+
+    def test_respotted_after_seen_expiry(self, requests_mock, generate_spotter,
+                                         sample_adsbx_json):
+        spots = generate_spotter
+        requests_mock.get(spots.url, json=sample_adsbx_json, status_code=200)
+        spots.check_spots()
+        first_spots = [p.hex_code for p in spots.spot_queue]
+        spots.spot_queue.clear()
+        spots.seen.expire(airspotbot.adsbget.time() + 1)
+        spots.check_spots()
+        assert [p.hex_code for p in spots.spot_queue] == first_spots
+
+    def test_reevaluated_after_watchlist_reload(self, requests_mock, generate_spotter,
+                                                sample_adsbx_json):
+        spots = generate_spotter
+        requests_mock.get(spots.url, json=sample_adsbx_json, status_code=200)
+        spots.check_spots()
+        evaluated = []
+        spots._may_qualify = lambda raw_aircraft: evaluated.append(raw_aircraft['hex'])
+        watchlists = {attribute: getattr(spots, attribute)
+                      for attribute in airspotbot.adsbget.WATCHLIST_ATTRIBUTES}
+        spots._pending_watchlist = (watchlists, spots._compile_rules(watchlists), [])
+        spots.check_spots()
+        assert len(evaluated) == len(sample_adsbx_json['ac'])
+
+    def test_spotted_once_position_known(self, requests_mock, generate_valid_adsb_config):
+        """An aircraft first polled without a position is spotted when it reports one, although
+        none of the fields in its snapshot state changed"""
+        guppy = {"hex": "ad7d4e", "r": "NASA941", "t": "SGUP", "dbFlags": 0, "alt_baro": 9000,
+                 "flight": "NASA941 "}
+        guppy_with_position = dict(guppy, lat=33.45, lon=-112.07)
+        for snapshot_diff in ('y', 'n'):
+            generate_valid_adsb_config['ADSB']['snapshot_diff'] = snapshot_diff
+            spots = airspotbot.adsbget.Spotter(config_parsed=generate_valid_adsb_config,
+                                               watchlist_path=VALID_WATCHLIST,
+                                               image_dir=DEFAULT_IMAGE_DIRECTORY,
+                                               user_agent=USER_AGENT)
+            requests_mock.get(spots.url, json={'ac': [guppy]}, status_code=200)
+            spots.check_spots()
+            spots.check_spots()
+            assert not spots.spot_queue
+            requests_mock.get(spots.url, json={'ac': [guppy_with_position]}, status_code=200)
+            spots.check_spots()
+            assert [p.hex_code for p in spots.spot_queue] == ['ad7d4e']
+            assert not spots._unparsed
+
+    def test_equivalent_to_full_evaluation(self, requests_mock, generate_valid_adsb_config):
+        rng = random.Random(5)
+        polls = [random_raw_aircraft(500, seed=6)]
+        for _ in range(5):
+            snapshot = [dict(raw_aircraft) for raw_aircraft in polls[-1][50:]]
+            for raw_aircraft in rng.sample(snapshot, 50):
+                raw_aircraft['alt_baro'] = rng.choice((1000, 5000, 'ground'))
+                raw_aircraft['dbFlags'] = rng.choice((0, 1, 2))
+            polls.append(snapshot + random_raw_aircraft(50, seed=rng.random()))
+        results = []
+        for snapshot_diff in ('y', 'n'):
+            generate_valid_adsb_config['ADSB']['snapshot_diff'] = snapshot_diff
+            spots = airspotbot.adsbget.Spotter(config_parsed=generate_valid_adsb_config,
+                                               watchlist_path=VALID_WATCHLIST,
+                                               image_dir=DEFAULT_IMAGE_DIRECTORY,
+                                               user_agent=USER_AGENT)
+            poll_results = []
+            for n, raw_aircraft in enumerate(polls):
+                if n == 3:
+                    # expire the cooldown of every aircraft spotted so far
+                    spots.seen.expire(airspotbot.adsbget.time() + 1)
+                requests_mock.get(spots.url, json={'ac': raw_aircraft}, status_code=200)
+                spots.check_spots()
+                poll_results.append([p.hex_code for p in spots.spot_queue])
+                spots.spot_queue.clear()
+            results.append(poll_results)
+        assert results[0] == results[1]
+        assert all(results[0])
+
+
+class TestCooldown:
+    """Test expiry of aircraft from the seen list"""
+
+    def test_expired_aircraft_removed(self, generate_spotter):
+        spots = generate_spotter
+        spots.cooldown_seconds = 60
+        now = airspotbot.adsbget.time()
+        spots.seen['aaaaaa'] = now - 120
+        spots.seen['bbbbbb'] = now - 90
+        spots.seen['cccccc'] = now - 10
+        spots._check_seen()
+        assert list(spots.seen) == ['cccccc']
+        assert spots.seen.evictions == 2
+
+    def test_seen_store_survives_restart(self, requests_mock, generate_valid_adsb_config,
+                                         sample_adsbx_json, tmp_path):
+        """Aircraft spotted before a restart are not queued again while in cooldown"""
+        generate_valid_adsb_config['ADSB']['cooldown'] = "3600"
+        generate_valid_adsb_config['ADSB']['seen_store'] = str(tmp_path / "seen.sqlite")
+        spots = airspotbot.adsbget.Spotter(config_parsed=generate_valid_adsb_config,
+                                           watchlist_path=VALID_WATCHLIST,
+                                           image_dir=DEFAULT_IMAGE_DIRECTORY,
+                                           user_agent=USER_AGENT)
+        requests_mock.get(spots.url, json=sample_adsbx_json, status_code=200)
+        spots.check_spots()
+        assert len(spots.spot_queue) > 0
+        restarted = airspotbot.adsbget.Spotter(config_parsed=generate_valid_adsb_config,
+                                               watchlist_path=VALID_WATCHLIST,
+                                               image_dir=DEFAULT_IMAGE_DIRECTORY,
+                                               user_agent=USER_AGENT)
+        restarted.check_spots()
+        assert len(restarted.spot_queue) == 0
+
+
+class TestAircraftSpot:
+    """Tests parsing of raw aircraft data into AircraftSpot objects"""
+
+    def test_parsed_fields(self, sample_adsbx_json):
+        spot = airspotbot.adsbget.AircraftSpot(sample_adsbx_json['ac'][3])
+        assert spot.reg == 'G-TTNF'
+        assert spot.callsign == 'BAW622'
+        assert spot.altitude_ft == 14525
+        assert spot.interesting and not spot.military
+        assert spot.coordinates.latitude == 51.360199
+        assert spot.speed_string == "ground speed 383.4 kts"
+        assert not hasattr(spot, '__dict__')
+
+    def test_grounded(self, sample_adsbx_json):
+        spot = airspotbot.adsbget.AircraftSpot(sample_adsbx_json['ac'][7])
+        assert spot.grounded
+        assert spot.altitude_ft == 0
+
+
+def random_raw_aircraft(count, seed=0):
+    """Generate raw aircraft dictionaries that exercise every spotting rule"""
+    rng = random.Random(seed)
+    aircraft = []
+    for n in range(count):
+        raw = {'hex': rng.choice(('508035', f'{rng.randrange(0x1000000):06x}')),
+               'lat': rng.uniform(-60, 60),
+               'lon': rng.uniform(-180, 180),
+               'gs': 100}
+        if rng.random() < 0.8:
+            raw['r'] = rng.choice(('NASA941', '4R-ALN', f'N{n}', f'N{n} '))
+        if rng.random() < 0.9:
+            raw['t'] = rng.choice(('H60', 'EC45', 'C25A', 'B738', 'A320'))
+        if rng.random() < 0.9:
+            raw['alt_baro'] = rng.choice((1000, 'ground'))
+        if rng.random() < 0.3:
+            raw['dbFlags'] = rng.choice((0, 1, 2, 3))
+        aircraft.append(raw)
+    return aircraft
+
+
+class TestPreFilter:
+    """Test that the raw-data pre-filter never changes which aircraft are spotted"""
+
+    @pytest.mark.parametrize("spot_flags", [("y", "y", "y"), ("n", "n", "n"), ("y", "n", "y"),
+                                            ("n", "y", "n")])
+    def test_equivalent_to_full_parse(self, requests_mock, generate_valid_adsb_config,
+                                      spot_flags):
+        for option, flag in zip(("spot_unknown", "spot_mil", "spot_interesting"), spot_flags):
+            generate_valid_adsb_config['ADSB'][option] = flag
+        raw_aircraft = random_raw_aircraft(2000)
+        results = []
+        for use_prefilter in (True, False):
+            spots = airspotbot.adsbget.Spotter(config_parsed=generate_valid_adsb_config,
+                                               watchlist_path=VALID_WATCHLIST,
+                                               image_dir=DEFAULT_IMAGE_DIRECTORY,
+                                               user_agent=USER_AGENT)
+            if not use_prefilter:
+                spots._may_qualify = lambda raw: True
+            requests_mock.get(spots.url, json={'ac': raw_aircraft}, status_code=200)
+            spots.check_spots()
+            results.append([p.hex_code for p in spots.spot_queue])
+        assert results[0] == results[1]
+        assert len(results[0]) > 0
+
+    def test_equivalent_with_pattern_rows(self, requests_mock, generate_valid_adsb_config):
+        raw_aircraft = random_raw_aircraft(2000, seed=3)
+        results = []
+        for use_prefilter in (True, False):
+            spots = airspotbot.adsbget.Spotter(config_parsed=generate_valid_adsb_config,
+                                               watchlist_path=PATTERN_WATCHLIST,
+                                               image_dir=DEFAULT_IMAGE_DIRECTORY,
+                                               user_agent=USER_AGENT)
+            if not use_prefilter:
+                spots._may_qualify = lambda raw: True
+            requests_mock.get(spots.url, json={'ac': raw_aircraft}, status_code=200)
+            spots.check_spots()
+            results.append([p.hex_code for p in spots.spot_queue])
+        assert results[0] == results[1]
+        assert len(results[0]) > 0
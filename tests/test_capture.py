@@ -0,0 +1,167 @@
+"""
+Tests for the capture.py module
+"""
+
+from .context import airspotbot
+from .conftest import VALID_WATCHLIST, DEFAULT_IMAGE_DIRECTORY, USER_AGENT
+
+import gzip
+import sys
+
+import pytest
+
+from airspotbot.capture import CaptureWriter, ReplaySource, read_capture
+
+
+def test_import():
+    """Test whether module to be tested was successfully imported"""
+    assert "airspotbot.capture" in sys.modules
+
+
+MILITARY = {"hex": "ae1234", "r": "99-0001", "t": "C17", "dbFlags": 1, "alt_baro": 9000,
+            "lat": 33.5, "lon": -112.1}
+CIVIL = {"hex": "a1b2c3", "r": "N911AZ", "t": "B429", "dbFlags": 0, "alt_baro": 2500,
+         "lat": 33.5, "lon": -112.1}
+POLLS = [(1000.0, [(MILITARY, 'main'), (CIVIL, 'main')]),
+         (1060.0, [(CIVIL, None)]),
+         (1120.0, []),
+         (1180.0, [(MILITARY, 'main')])]
+
+
+def write_polls(capture_path, polls):
+    capture = CaptureWriter(str(capture_path))
+    for timestamp, aircraft_nearby in polls:
+        capture.write(timestamp, aircraft_nearby)
+    capture.close()
+
+
+class TestCaptureFormat:
+    """Tests for writing and reading capture files"""
+
+    def test_round_trip(self, tmp_path):
+        capture_path = tmp_path / "polls.asbcap"
+        write_polls(capture_path, POLLS)
+        assert list(read_capture(str(capture_path))) == POLLS
+
+    def test_append_sessions(self, tmp_path):
+        capture_path = tmp_path / "polls.asbcap"
+        write_polls(capture_path, POLLS[:2])
+        write_polls(capture_path, POLLS[2:])
+        assert list(read_capture(str(capture_path))) == POLLS
+
+    def test_incomplete_record(self, tmp_path, caplog):
+        capture_path = tmp_path / "polls.asbcap"
+        write_polls(capture_path, POLLS)
+        content = capture_path.read_bytes()
+        capture_path.write_bytes(content[:-5])
+        assert list(read_capture(str(capture_path))) == POLLS[:3]
+        assert "ends with an incomplete or damaged record" in caplog.text
+
+    def test_append_after_killed_session(self, tmp_path, caplog):
+        """A session killed while writing a record, without closing the writer, does not stop
+        the records of the next session from being read"""
+        capture_path = tmp_path / "polls.asbcap"
+        capture = CaptureWriter(str(capture_path))
+        for timestamp, aircraft_nearby in POLLS[:2]:
+            capture.write(timestamp, aircraft_nearby)
+        complete_size = capture_path.stat().st_size
+        capture.write(*POLLS[2])
+        # the process dies part way through writing the third record
+        with open(capture_path, 'r+b') as capture_file:
+            capture_file.truncate(complete_size + 7)
+        write_polls(capture_path, POLLS[3:])
+        assert "ends with an incomplete record, removing it" in caplog.text
+        assert list(read_capture(str(capture_path))) == POLLS[:2] + POLLS[3:]
+        capture.close()
+
+    def test_not_a_capture(self, tmp_path):
+        not_capture = tmp_path / "aircraft.json.gz"
+        with gzip.open(not_capture, 'wb') as capture_file:
+            capture_file.write(b'{"aircraft": []}')
+        with pytest.raises(ValueError):
+            ReplaySource(str(not_capture))
+        with pytest.raises(ValueError):
+            ReplaySource(str(VALID_WATCHLIST))
+        with pytest.raises(ValueError):
+            CaptureWriter(str(not_capture))
+
+
+class TestReplaySource:
+    """Tests for replaying captures"""
+
+    def test_step_replay(self, tmp_path):
+        capture_path = tmp_path / "polls.asbcap"
+        write_polls(capture_path, POLLS)
+        source = ReplaySource(str(capture_path), speed=0)
+        assert source.now() == 1000.0
+        for timestamp, aircraft_nearby in POLLS:
+            assert source.fetch() == aircraft_nearby
+            assert source.now() == timestamp
+        assert source.fetch() == []
+        assert source.finished
+        assert source.replayed_count == 4
+
+    def test_paced_replay(self, tmp_path):
+        capture_path = tmp_path / "polls.asbcap"
+        write_polls(capture_path, POLLS)
+        wall_time = [50.0]
+        source = ReplaySource(str(capture_path), speed=10, wall_clock=lambda: wall_time[0])
+        assert source.fetch() == POLLS[0][1]
+        wall_time[0] += 3  # 30 seconds of capture time
+        assert source.fetch() == POLLS[0][1]
+        assert source.now() == 1030.0
+        wall_time[0] += 9  # 120 seconds in, the poll at 1060 is skipped
+        assert source.fetch() == POLLS[2][1]
+        assert source.now() == 1120.0
+        wall_time[0] += 100
+        assert source.fetch() == POLLS[3][1]
+        assert source.fetch() == []
+        assert source.finished
+
+
+def test_record_and_replay(generate_valid_adsb_config, sample_adsbx_json, requests_mock,
+                           tmp_path):
+    """Polls recorded by one Spotter replay through another into the same spots and seen times"""
+    capture_path = tmp_path / "polls.asbcap"
+    config = generate_valid_adsb_config
+    config['ADSB']['record_capture'] = str(capture_path)
+    recording = airspotbot.adsbget.Spotter(config_parsed=config,
+                                           watchlist_path=VALID_WATCHLIST,
+                                           image_dir=DEFAULT_IMAGE_DIRECTORY,
+                                           user_agent=USER_AGENT,
+                                           clock=lambda: 1000.0)
+    requests_mock.get(recording.url, json=sample_adsbx_json)
+    recording.check_spots()
+    recording.close()
+    recorded_spots = [spot.hex_code for spot in recording.spot_queue]
+    assert recorded_spots
+    assert {seen_time for _, seen_time in recording.seen.items()} == {1000.0}
+
+    del config['ADSB']['record_capture']
+    config['ADSB']['adsb_source'] = "replay"
+    config['ADSB']['replay_capture'] = str(capture_path)
+    config['ADSB']['replay_speed'] = "0"
+    requests_mock.reset_mock()
+    replaying = airspotbot.adsbget.Spotter(config_parsed=config,
+                                           watchlist_path=VALID_WATCHLIST,
+                                           image_dir=DEFAULT_IMAGE_DIRECTORY,
+                                           user_agent=USER_AGENT)
+    assert isinstance(replaying.source, ReplaySource)
+    replaying.check_spots()
+    assert [spot.hex_code for spot in replaying.spot_queue] == recorded_spots
+    # spot times come from the capture, not the wall clock
+    assert {seen_time for _, seen_time in replaying.seen.items()} == {1000.0}
+    assert not requests_mock.called
+
+
+def test_bad_replay_speed(generate_valid_adsb_config, tmp_path):
+    capture_path = tmp_path / "polls.asbcap"
+    write_polls(capture_path, POLLS)
+    generate_valid_adsb_config['ADSB']['adsb_source'] = "replay"
+    generate_valid_adsb_config['ADSB']['replay_capture'] = str(capture_path)
+    generate_valid_adsb_config['ADSB']['replay_speed'] = "-2"
+    with pytest.raises(ValueError):
+        airspotbot.adsbget.Spotter(config_parsed=generate_valid_adsb_config,
+                                   watchlist_path=VALID_WATCHLIST,
+                                   image_dir=DEFAULT_IMAGE_DIRECTORY,
+                                   user_agent=USER_AGENT)
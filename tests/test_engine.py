@@ -0,0 +1,181 @@
+"""
+Tests for the engine.py module
+"""
+
+from .context import airspotbot
+
+import asyncio
+import configparser
+import pytest
+import sys
+import threading
+import time
+from collections import deque
+
+
+class FakeSpot:
+    def __init__(self, hex_code):
+        self.hex_code = hex_code
+
+
+class FakeSpotter:
+    """Stands in for adsbget.Spotter, queueing a fixed list of spots on each poll"""
+
+    def __init__(self, hex_codes, interval=0):
+        self.hex_codes = hex_codes
+        self.adsb_interval_seconds = interval
+        self.spot_queue = deque()
+        self.seen = {}
+        self.poll_count = 0
+        self.source = airspotbot.sources.AircraftSource()
+
+    def check_spots(self):
+        self.poll_count += 1
+        for hex_code in self.hex_codes:
+            if hex_code not in self.seen:
+                self.seen[hex_code] = time.time()
+                self.spot_queue.append(FakeSpot(hex_code))
+
+
+class FakeStreamingSource(airspotbot.sources.AircraftSource):
+    """Stands in for a streaming aircraft source that reports one update shortly after startup"""
+
+    streaming = True
+
+    def __init__(self):
+        self.updates = 1
+
+    def wait_for_update(self, timeout):
+        if self.updates:
+            self.updates -= 1
+            time.sleep(0.05)
+            return True
+        time.sleep(timeout)
+        return False
+
+
+class FakeBot:
+    """Stands in for airspotbot.SpotBot, with slow geocoding and screenshot calls"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.tweet_interval_seconds = 0
+        self.published = []
+        self.active_screenshots = 0
+        self.max_active_screenshots = 0
+        self._lock = threading.Lock()
+
+    def describe_location(self, aircraft):
+        time.sleep(self.delay)
+        return "near somewhere"
+
+    def capture_screenshot(self, hex_code):
+        with self._lock:
+            self.active_screenshots += 1
+            self.max_active_screenshots = max(self.max_active_screenshots,
+                                              self.active_screenshots)
+        time.sleep(self.delay / 4)
+        with self._lock:
+            self.active_screenshots -= 1
+        return b"png"
+
+    @staticmethod
+    def compose_tweet(aircraft, location_description):
+        return f"{aircraft.hex_code} is {location_description}"
+
+    def publish(self, aircraft, tweet, screenshot_binary):
+        self.published.append(tweet)
+
+
+def test_import():
+    """Test whether module to be tested was successfully imported"""
+    assert "airspotbot.engine" in sys.modules
+
+
+def test_invalid_concurrency():
+    dummy_config = configparser.ConfigParser()
+    dummy_config['ENGINE'] = {"max_concurrency": "0"}
+    with pytest.raises(ValueError) as exc_info:
+        airspotbot.engine.AsyncSpotEngine(FakeBot(0), FakeSpotter([]), dummy_config)
+    assert "ENGINE/max_concurrency" in str(exc_info.value)
+
+
+def test_geocoding_runs_concurrently():
+    """Four spots with a 0.2 s geocoder should take well under 0.8 s with concurrency 4"""
+    bot = FakeBot(delay=0.2)
+    spots = FakeSpotter(['a', 'b', 'c', 'd'])
+    start_time = time.perf_counter()
+    asyncio.run(airspotbot.engine.AsyncSpotEngine(bot, spots).run(max_cycles=1))
+    assert time.perf_counter() - start_time < 0.6
+    # spots are published in the order they were queued
+    assert bot.published == [f"{h} is near somewhere" for h in 'abcd']
+    # screenshots share one browser, so must never overlap
+    assert bot.max_active_screenshots == 1
+
+
+def test_concurrency_bounded():
+    dummy_config = configparser.ConfigParser()
+    dummy_config['ENGINE'] = {"max_concurrency": "1"}
+    bot = FakeBot(delay=0.1)
+    spots = FakeSpotter(['a', 'b', 'c'])
+    start_time = time.perf_counter()
+    asyncio.run(airspotbot.engine.AsyncSpotEngine(bot, spots, dummy_config).run(max_cycles=1))
+    assert time.perf_counter() - start_time >= 0.3
+
+
+def test_poll_cadence():
+    """Polls are scheduled at fixed intervals"""
+    bot = FakeBot(delay=0)
+    spots = FakeSpotter([], interval=0.1)
+    start_time = time.perf_counter()
+    asyncio.run(airspotbot.engine.AsyncSpotEngine(bot, spots).run(max_cycles=3))
+    assert spots.poll_count == 3
+    assert 0.2 <= time.perf_counter() - start_time < 0.4
+
+
+def test_streaming_source_polls_early(monkeypatch):
+    """An update from a streaming source triggers a poll before adsb_interval, without moving
+    the next scheduled poll"""
+    monkeypatch.setattr(airspotbot.engine, 'STREAMING_MIN_POLL_SECONDS', 0.1)
+    bot = FakeBot(delay=0)
+    spots = FakeSpotter([], interval=0.5)
+    spots.source = FakeStreamingSource()
+    start_time = time.perf_counter()
+    asyncio.run(airspotbot.engine.AsyncSpotEngine(bot, spots).run(max_cycles=3))
+    assert spots.poll_count == 3
+    # polls at 0, 0.1 (early, held back to the minimum interval) and 0.5 (as scheduled)
+    assert 0.5 <= time.perf_counter() - start_time < 0.7
+
+
+def _run_for(engine, seconds):
+    """Run the engine forever, stopping it after the given number of seconds"""
+    async def run_with_timeout():
+        try:
+            await asyncio.wait_for(engine.run(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+    asyncio.run(run_with_timeout())
+
+
+def test_poll_cadence_with_backlog():
+    """A long publish backlog must not delay polling"""
+    bot = FakeBot(delay=0)
+    bot.tweet_interval_seconds = 30
+    spots = FakeSpotter([str(n) for n in range(20)], interval=0.1)
+    _run_for(airspotbot.engine.AsyncSpotEngine(bot, spots), 0.35)
+    assert len(bot.published) == 1
+    assert spots.poll_count >= 3
+
+
+def test_full_queue_drops_from_seen():
+    """Spots that do not fit in the queue are removed from seen so they are spotted again"""
+    dummy_config = configparser.ConfigParser()
+    dummy_config['ENGINE'] = {"queue_size": "2"}
+    bot = FakeBot(delay=0)
+    bot.tweet_interval_seconds = 30
+    spots = FakeSpotter([str(n) for n in range(10)], interval=10)
+    _run_for(airspotbot.engine.AsyncSpotEngine(bot, spots, dummy_config), 0.2)
+    # one spot published, up to max_concurrency being enriched, two waiting in the queue
+    assert len(bot.published) == 1
+    assert len(spots.seen) <= 1 + airspotbot.engine.DEFAULT_MAX_CONCURRENCY + 2
+    assert len(spots.seen) < 10
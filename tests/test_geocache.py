@@ -0,0 +1,130 @@
+"""
+Tests for the geocache.py module
+"""
+
+from .context import airspotbot
+
+import multiprocessing
+import sys
+
+import pytest
+
+from airspotbot.geocache import GeocodeCache, SqliteGeocodeStore, geohash
+
+
+def test_import():
+    """Test whether module to be tested was successfully imported"""
+    assert "airspotbot.geocache" in sys.modules
+
+
+@pytest.mark.parametrize("latitude, longitude, precision, expected",
+                         [(57.64911, 10.40744, 11, 'u4pruydqqvj'),
+                          (42.6, -5.6, 5, 'ezs42'),
+                          (-25.382708, -49.265506, 8, '6gkzwgjz'),
+                          (0, 0, 1, 's')])
+def test_geohash(latitude, longitude, precision, expected):
+    assert geohash(latitude, longitude, precision) == expected
+
+
+class TestGeocodeCache:
+    """Tests for the LRU and TTL behaviour of the reverse geocoding cache"""
+
+    def test_nearby_positions_share_a_cell(self):
+        cache = GeocodeCache(precision=6)
+        assert cache.cell('33.4484', '-112.0740') == cache.cell(33.4490, -112.0745)
+        assert cache.cell(33.4484, -112.0740) != cache.cell(33.4600, -112.0740)
+
+    def test_hits_and_misses(self):
+        cache = GeocodeCache()
+        assert cache.get('9tbq') is None
+        cache.put('9tbq', {'point': 'Sky Harbor', 'area': None})
+        assert cache.get('9tbq') == {'point': 'Sky Harbor', 'area': None}
+        assert cache.stats() == {'size': 1, 'hits': 1, 'misses': 1, 'evictions': 0,
+                                 'expirations': 0}
+
+    def test_least_recently_used_evicted(self):
+        cache = GeocodeCache(max_size=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        assert cache.get('b') is None
+        assert (cache.get('a'), cache.get('c')) == (1, 3)
+        assert cache.evictions == 1
+        assert len(cache) == 2
+
+    def test_ttl(self):
+        now = [100.0]
+        cache = GeocodeCache(ttl_seconds=60, clock=lambda: now[0])
+        cache.put('a', 1)
+        now[0] += 59
+        assert cache.get('a') == 1
+        now[0] += 1
+        assert cache.get('a') is None
+        assert cache.expirations == 1
+        assert len(cache) == 0
+
+    @pytest.mark.parametrize("options", [{'max_size': 0}, {'precision': 0}, {'precision': 13}])
+    def test_invalid_settings(self, options):
+        with pytest.raises(ValueError):
+            GeocodeCache(**options)
+
+
+def write_results(db_path, backend, count):
+    """Write results to a geocode store from another process"""
+    store = SqliteGeocodeStore(db_path)
+    for number in range(count):
+        store.put(backend, f'cell{number}', {'point': f'{backend} {number}', 'area': None})
+    store.close()
+
+
+class TestSqliteGeocodeStore:
+    """Tests for the persistent geocode store"""
+
+    def test_round_trip(self, tmp_path):
+        store = SqliteGeocodeStore(str(tmp_path / "geocode.db"))
+        assert store.get('3geonames', '9tbq') is None
+        store.put('3geonames', '9tbq', {'nearest': {'name': 'Sky Harbor', 'city': 'Phoenix'}})
+        store.flush()
+        assert store.get('3geonames', '9tbq') == \
+               {'nearest': {'name': 'Sky Harbor', 'city': 'Phoenix'}}
+        # results are kept apart by backend
+        assert store.get('pelias', '9tbq') is None
+        store.close()
+
+    def test_persists_across_restarts(self, tmp_path):
+        db_path = str(tmp_path / "geocode.db")
+        store = SqliteGeocodeStore(db_path)
+        store.put('3geonames', '9tbq', {'nearest': {'name': 'Sky Harbor'}})
+        store.close()  # queued results are written before closing
+        store = SqliteGeocodeStore(db_path)
+        assert store.get('3geonames', '9tbq') == {'nearest': {'name': 'Sky Harbor'}}
+        store.close()
+
+    def test_ttl(self, tmp_path):
+        now = [1000.0]
+        db_path = str(tmp_path / "geocode.db")
+        store = SqliteGeocodeStore(db_path, ttl_seconds=60, clock=lambda: now[0])
+        store.put('3geonames', '9tbq', {'nearest': {'name': 'Sky Harbor'}})
+        store.flush()
+        now[0] += 60
+        assert store.get('3geonames', '9tbq') is None
+        store.close()
+
+    def test_shared_between_processes(self, tmp_path):
+        db_path = str(tmp_path / "geocode.db")
+        reader = SqliteGeocodeStore(db_path)
+        context = multiprocessing.get_context('spawn')
+        writers = [context.Process(target=write_results, args=(db_path, backend, 200))
+                   for backend in ('pelias', '3geonames')]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join(timeout=60)
+            assert writer.exitcode == 0
+        for backend in ('pelias', '3geonames'):
+            for number in range(200):
+                assert reader.get(backend, f'cell{number}') == \
+                       {'point': f'{backend} {number}', 'area': None}
+        assert reader.write_errors == 0
+        reader.close()
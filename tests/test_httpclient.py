@@ -0,0 +1,73 @@
+"""
+Tests for the httpclient.py module
+"""
+
+from .context import airspotbot
+
+import configparser
+import pytest
+import sys
+
+USER_AGENT = "airspotbot/testing"
+
+
+@pytest.fixture
+def generate_http_config():
+    dummy_config = configparser.ConfigParser()
+    dummy_config['HTTP'] = {"timeout": "3",
+                            "pool_size": "2",
+                            "timeout.api.3geonames.org": "8",
+                            "pool_size.localhost": "6"}
+    return dummy_config
+
+
+def test_import():
+    """Test whether module to be tested was successfully imported"""
+    assert "airspotbot.httpclient" in sys.modules
+
+
+class TestHttpConfig:
+    """Tests reading of the [HTTP] config section"""
+
+    def test_defaults_without_config(self):
+        client = airspotbot.httpclient.HttpClient(USER_AGENT)
+        assert client.timeout_for("https://api.3geonames.org/1,1.json") == \
+               airspotbot.httpclient.DEFAULT_TIMEOUT_SECONDS
+
+    def test_per_host_timeouts(self, generate_http_config):
+        client = airspotbot.httpclient.HttpClient(USER_AGENT, generate_http_config)
+        assert client.timeout_for("https://api.3geonames.org/1,1.json") == 8
+        assert client.timeout_for("http://localhost:4000/v1/reverse") == 3
+
+    def test_per_host_pool_sizes(self, generate_http_config):
+        client = airspotbot.httpclient.HttpClient(USER_AGENT, generate_http_config)
+        assert client.pool_size_for("http://localhost:4000/v1/reverse") == 6
+        assert client.pool_size_for("https://api.3geonames.org/1,1.json") == 2
+
+    def test_invalid_timeout(self, generate_http_config):
+        generate_http_config['HTTP']['timeout'] = "-1"
+        with pytest.raises(ValueError) as exc_info:
+            airspotbot.httpclient.HttpClient(USER_AGENT, generate_http_config)
+        assert "Bad value in config file for HTTP/timeout" in str(exc_info.value)
+
+
+class TestSessionPool:
+    """Tests that sessions are pooled per host"""
+
+    def test_session_reused_per_host(self, generate_http_config):
+        client = airspotbot.httpclient.HttpClient(USER_AGENT, generate_http_config)
+        first = client.session_for("http://localhost:4000/v1/reverse?point.lat=1")
+        second = client.session_for("http://localhost:4000/v1/reverse?point.lat=2")
+        other = client.session_for("https://api.3geonames.org/1,1.json")
+        assert first is second
+        assert first is not other
+        assert first.headers['User-Agent'] == USER_AGENT
+        assert first.get_adapter("http://localhost:4000/").poolmanager.connection_pool_kw[
+                   'maxsize'] == 6
+
+    def test_get_uses_host_timeout(self, requests_mock, generate_http_config):
+        client = airspotbot.httpclient.HttpClient(USER_AGENT, generate_http_config)
+        requests_mock.get("https://api.3geonames.org/1,1.json", json={})
+        client.get("https://api.3geonames.org/1,1.json")
+        assert requests_mock.last_request.timeout == 8
+        assert requests_mock.last_request.headers['User-Agent'] == USER_AGENT
@@ -5,9 +5,14 @@ Tests for the location.py module
 from .context import airspotbot
 
 import configparser
+import json
 import pytest
 import random
 import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
 
 USER_AGENT = "airspotbot/testing"
 
@@ -119,3 +124,349 @@ class TestLocationValidation:
         with pytest.raises(configparser.NoOptionError):
             airspotbot.location.Locator(config_parsed=generate_pelias_location_config,
                                         user_agent=USER_AGENT)
+
+
+PELIAS_TEST_URL = "http://localhost:4000/v1/reverse?point.lat=51.5081124&point.lon=-0.0759493"
+
+
+def pelias_features(name):
+    return {"geocoding": {}, "type": "FeatureCollection",
+            "features": [{"properties": {"name": name}}] if name else []}
+
+
+class TestGeocodeCache:
+    """Tests for caching reverse geocoding results in the Locator"""
+
+    def test_pelias_lookups_cached(self, generate_pelias_location_config, requests_mock):
+        requests_mock.get(PELIAS_TEST_URL, json=pelias_features(None))
+        loc = airspotbot.location.Locator(config_parsed=generate_pelias_location_config,
+                                          user_agent=USER_AGENT)
+        requests_mock.get("http://localhost:4000/v1/reverse?point.lat=33.4484&point.lon=-112.074"
+                          "&layers=venue", json=pelias_features("Sky Harbor"))
+        requests_mock.get("http://localhost:4000/v1/reverse?point.lat=33.4484&point.lon=-112.074"
+                          "&layers=neighbourhood", json=pelias_features("Downtown"))
+        assert loc.get_location_description("33.4484", "-112.074") == \
+               "over Downtown, near Sky Harbor"
+        request_count = requests_mock.call_count
+        # a nearby position in the same geohash cell is answered from the cache
+        assert loc.get_location_description("33.4486", "-112.0742") == \
+               "over Downtown, near Sky Harbor"
+        assert requests_mock.call_count == request_count
+        assert loc.geocode_cache.stats()['hits'] == 1
+
+    def test_failed_lookups_not_cached(self, generate_pelias_location_config, requests_mock):
+        requests_mock.get(PELIAS_TEST_URL, json=pelias_features(None))
+        loc = airspotbot.location.Locator(config_parsed=generate_pelias_location_config,
+                                          user_agent=USER_AGENT)
+        requests_mock.get("http://localhost:4000/v1/reverse", status_code=500)
+        assert loc.get_location_description("33.4484", "-112.074") == "near 33.4484, -112.074"
+        assert len(loc.geocode_cache) == 0
+
+    def test_partial_lookups_not_cached(self, generate_pelias_location_config, requests_mock):
+        """A lookup where one configured layer returned no feature is retried on the next
+        position in the same cell instead of being cached without that layer"""
+        requests_mock.get(PELIAS_TEST_URL, json=pelias_features(None))
+        loc = airspotbot.location.Locator(config_parsed=generate_pelias_location_config,
+                                          user_agent=USER_AGENT)
+        requests_mock.get("http://localhost:4000/v1/reverse?point.lat=33.4484&point.lon=-112.074"
+                          "&layers=venue", json=pelias_features("Sky Harbor"))
+        requests_mock.get("http://localhost:4000/v1/reverse?point.lat=33.4484&point.lon=-112.074"
+                          "&layers=neighbourhood", json=pelias_features(None))
+        assert loc.get_location_description("33.4484", "-112.074") == "near Sky Harbor"
+        assert len(loc.geocode_cache) == 0
+        requests_mock.get("http://localhost:4000/v1/reverse?point.lat=33.4484&point.lon=-112.074"
+                          "&layers=neighbourhood", json=pelias_features("Downtown"))
+        assert loc.get_location_description("33.4484", "-112.074") == \
+               "over Downtown, near Sky Harbor"
+        assert len(loc.geocode_cache) == 1
+
+    def test_geonames_hit_skips_delay(self, generate_empty_config, requests_mock):
+        generate_empty_config['LOCATION']['location_type'] = '3geonames'
+        loc = airspotbot.location.Locator(config_parsed=generate_empty_config,
+                                          user_agent=USER_AGENT)
+        sleeps = []
+        loc.geonames_rate_limiter.sleep = sleeps.append
+        requests_mock.get("https://api.3geonames.org/33.4484,-112.074.json",
+                          json={"nearest": {"name": "Sky Harbor", "city": "Phoenix"}})
+        for _ in range(3):
+            assert loc.get_location_description("33.4484", "-112.074") == \
+                   "near Sky Harbor, Phoenix"
+        # cache hits do not take a token, so the rate limiter never has to wait
+        assert sleeps == []
+        assert requests_mock.call_count == 1
+
+    def test_store_starts_warm(self, generate_empty_config, requests_mock, tmp_path):
+        """A restarted bot reads results stored by the previous run instead of requesting them"""
+        generate_empty_config['LOCATION']['location_type'] = '3geonames'
+        generate_empty_config['LOCATION']['geocode_cache_path'] = str(tmp_path / "geocode.db")
+        requests_mock.get("https://api.3geonames.org/33.4484,-112.074.json",
+                          json={"nearest": {"name": "Sky Harbor", "city": "Phoenix"}})
+        loc = airspotbot.location.Locator(config_parsed=generate_empty_config,
+                                          user_agent=USER_AGENT)
+        assert loc.get_location_description("33.4484", "-112.074") == "near Sky Harbor, Phoenix"
+        loc.geocode_store.close()
+        restarted = airspotbot.location.Locator(config_parsed=generate_empty_config,
+                                                user_agent=USER_AGENT)
+        assert restarted.get_location_description("33.4486", "-112.0742") == \
+               "near Sky Harbor, Phoenix"
+        assert requests_mock.call_count == 1
+        # the result read from disk is kept in the in-memory cache
+        assert len(restarted.geocode_cache) == 1
+        restarted.geocode_store.close()
+
+    def test_store_without_memory_cache(self, generate_empty_config, requests_mock, tmp_path):
+        generate_empty_config['LOCATION']['location_type'] = '3geonames'
+        generate_empty_config['LOCATION']['geocode_cache_size'] = '0'
+        generate_empty_config['LOCATION']['geocode_cache_path'] = str(tmp_path / "geocode.db")
+        requests_mock.get("https://api.3geonames.org/33.4484,-112.074.json",
+                          json={"nearest": {"name": "Sky Harbor", "city": "Phoenix"}})
+        loc = airspotbot.location.Locator(config_parsed=generate_empty_config,
+                                          user_agent=USER_AGENT)
+        loc.geonames_rate_limiter = None
+        loc.get_location_description("33.4484", "-112.074")
+        loc.geocode_store.flush()
+        loc.get_location_description("33.4484", "-112.074")
+        assert requests_mock.call_count == 1
+        loc.geocode_store.close()
+
+    def test_cache_settings(self, generate_empty_config):
+        generate_empty_config['LOCATION']['location_type'] = '3geonames'
+        generate_empty_config['LOCATION']['geocode_cache_size'] = '10'
+        generate_empty_config['LOCATION']['geocode_cache_ttl'] = 'a week'
+        generate_empty_config['LOCATION']['geocode_cache_precision'] = '5'
+        loc = airspotbot.location.Locator(config_parsed=generate_empty_config,
+                                          user_agent=USER_AGENT)
+        assert loc.geocode_cache.max_size == 10
+        assert loc.geocode_cache.ttl_seconds == airspotbot.geocache.DEFAULT_TTL_SECONDS
+        assert loc.geocode_cache.precision == 5
+        generate_empty_config['LOCATION']['geocode_cache_size'] = '0'
+        loc = airspotbot.location.Locator(config_parsed=generate_empty_config,
+                                          user_agent=USER_AGENT)
+        assert loc.geocode_cache is None
+
+
+class TestOfflineLocation:
+    """Tests for the offline location type"""
+
+    @pytest.fixture
+    def offline_config(self, generate_empty_config, tmp_path):
+        dump_path = tmp_path / "places.txt"
+        dump_path.write_text(
+            "5308655\tPhoenix\tPhoenix\t\t33.44838\t-112.07404\tP\tPPLA\tUS\n"
+            "5308480\tPhoenix Sky Harbor International Airport\t\t\t33.43428\t-112.01158\tS\t"
+            "AIRP\tUS\n", encoding='utf-8')
+        generate_empty_config['LOCATION']['location_type'] = 'offline'
+        generate_empty_config['LOCATION']['offline_places'] = str(dump_path)
+        return generate_empty_config
+
+    def test_offline_location(self, offline_config):
+        loc = airspotbot.location.Locator(config_parsed=offline_config, user_agent=USER_AGENT)
+        assert loc.location_type == 'OFFLINE'
+        assert loc.get_location_description("33.4350", "-112.0100") == \
+               "near Phoenix Sky Harbor International Airport, Phoenix"
+        assert loc.get_location_description("33.4484", "-112.0740") == "near Phoenix"
+        assert loc.get_location_description("35.0", "-112.0") == "near 35.0, -112.0"
+
+    def test_index_built_once(self, offline_config, monkeypatch):
+        airspotbot.location.Locator(config_parsed=offline_config, user_agent=USER_AGENT)
+        index_path = offline_config['LOCATION']['offline_places'] + '.asbidx'
+
+        def fail_build(*args, **kwargs):
+            raise AssertionError("index should not be rebuilt")
+        monkeypatch.setattr(airspotbot.location, 'build_place_index', fail_build)
+        loc = airspotbot.location.Locator(config_parsed=offline_config, user_agent=USER_AGENT)
+        assert loc.offline_index.index_path == index_path
+        assert loc.get_location_description("33.4484", "-112.0740") == "near Phoenix"
+
+    def test_missing_dump(self, offline_config):
+        offline_config['LOCATION']['offline_places'] = '/nonexistent/places.txt'
+        loc = airspotbot.location.Locator(config_parsed=offline_config, user_agent=USER_AGENT)
+        assert loc.location_type == 'COORDINATE'
+
+    def test_no_places_option(self, generate_empty_config):
+        generate_empty_config['LOCATION']['location_type'] = 'offline'
+        with pytest.raises(configparser.NoOptionError):
+            airspotbot.location.Locator(config_parsed=generate_empty_config,
+                                        user_agent=USER_AGENT)
+
+
+class PeliasStandIn(BaseHTTPRequestHandler):
+    """Local stand-in for a Pelias reverse geocoding endpoint, answering each layer after a
+    delay"""
+    delay_seconds = 0.0
+    names = {'venue': 'Sky Harbor', 'neighbourhood': 'Downtown'}
+
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query)
+        layer = query.get('layers', [''])[0]
+        self.server.requested_layers.append(layer)
+        time.sleep(self.delay_seconds)
+        features = [{"properties": {"name": self.names[layer]}}] if layer in self.names else []
+        body = json.dumps({"geocoding": {}, "type": "FeatureCollection",
+                           "features": features}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def pelias_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PeliasStandIn)
+    server.requested_layers = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+class TestPeliasQueries:
+    """Tests for the point and area queries sent to a local Pelias stand-in"""
+
+    @pytest.fixture
+    def pelias_config(self, generate_pelias_location_config, pelias_server):
+        generate_pelias_location_config['LOCATION']['pelias_host'] = "http://127.0.0.1"
+        generate_pelias_location_config['LOCATION']['pelias_port'] = \
+            str(pelias_server.server_address[1])
+        generate_pelias_location_config['LOCATION']['geocode_cache_size'] = "0"
+        return generate_pelias_location_config
+
+    def test_layers_queried_concurrently(self, pelias_config, pelias_server, monkeypatch):
+        loc = airspotbot.location.Locator(config_parsed=pelias_config, user_agent=USER_AGENT)
+        pelias_server.requested_layers.clear()
+        monkeypatch.setattr(PeliasStandIn, 'delay_seconds', 0.4)
+        start = time.perf_counter()
+        description = loc.get_location_description("33.4484", "-112.074")
+        elapsed = time.perf_counter() - start
+        assert description == "over Downtown, near Sky Harbor"
+        assert sorted(pelias_server.requested_layers) == ['neighbourhood', 'venue']
+        # one after the other, the two requests would take at least 0.8 seconds
+        assert elapsed < 0.75
+
+    def test_single_layer(self, pelias_config, pelias_server):
+        pelias_config['LOCATION']['pelias_area_layer'] = ""
+        loc = airspotbot.location.Locator(config_parsed=pelias_config, user_agent=USER_AGENT)
+        pelias_server.requested_layers.clear()
+        assert loc.get_location_description("33.4484", "-112.074") == "near Sky Harbor"
+        assert pelias_server.requested_layers == ['venue']
+
+    def test_executor_sized_by_pool(self, pelias_config, pelias_server):
+        pelias_config['HTTP'] = {'pool_size.127.0.0.1': '3'}
+        http_client = airspotbot.httpclient.HttpClient(USER_AGENT, pelias_config)
+        loc = airspotbot.location.Locator(config_parsed=pelias_config, user_agent=USER_AGENT,
+                                          http_client=http_client)
+        assert loc._pelias_executor._max_workers == 3
+
+    def test_timeout(self, pelias_config, pelias_server, monkeypatch):
+        pelias_config['HTTP'] = {'timeout': '0.2'}
+        http_client = airspotbot.httpclient.HttpClient(USER_AGENT, pelias_config)
+        loc = airspotbot.location.Locator(config_parsed=pelias_config, user_agent=USER_AGENT,
+                                          http_client=http_client)
+        monkeypatch.setattr(PeliasStandIn, 'delay_seconds', 1.0)
+        start = time.perf_counter()
+        assert loc.get_location_description("33.4484", "-112.074") == "near 33.4484, -112.074"
+        assert time.perf_counter() - start < 0.9
+
+
+class TestGeocodeRateLimit:
+    """Tests for rate limiting requests to the geocoding APIs"""
+
+    @pytest.fixture
+    def geonames_locator(self, generate_empty_config):
+        generate_empty_config['LOCATION']['location_type'] = '3geonames'
+        generate_empty_config['LOCATION']['geocode_cache_size'] = '0'
+        loc = airspotbot.location.Locator(config_parsed=generate_empty_config,
+                                          user_agent=USER_AGENT)
+        now = [0.0]
+        sleeps = []
+
+        def fake_sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+        limiter = airspotbot.ratelimit.TokenBucket(1, 1, '3geonames', clock=lambda: now[0],
+                                                   sleep_function=fake_sleep)
+        loc.geonames_rate_limiter = limiter
+        return loc, now, sleeps
+
+    def test_delay_only_when_exhausted(self, geonames_locator, requests_mock):
+        loc, now, sleeps = geonames_locator
+        requests_mock.get("https://api.3geonames.org/33.4484,-112.074.json",
+                          json={"nearest": {"name": "Sky Harbor", "city": "Phoenix"}})
+        loc.get_location_description("33.4484", "-112.074")
+        assert sleeps == []
+        loc.get_location_description("33.4484", "-112.074")
+        assert sleeps == [pytest.approx(1)]
+        now[0] += 120  # the next spot is minutes later
+        loc.get_location_description("33.4484", "-112.074")
+        assert sleeps == [pytest.approx(1)]
+
+    def test_back_off_on_rate_limit_page(self, geonames_locator, requests_mock):
+        loc, now, sleeps = geonames_locator
+        requests_mock.get("https://api.3geonames.org/33.4484,-112.074.json",
+                          text="<html><body>Throttled</body></html>")
+        assert loc.get_location_description("33.4484", "-112.074") == "near 33.4484, -112.074"
+        # the next requests wait for the back-off period, which doubles each time
+        loc.get_location_description("33.4484", "-112.074")
+        loc.get_location_description("33.4484", "-112.074")
+        assert sleeps == [pytest.approx(airspotbot.ratelimit.DEFAULT_BACKOFF_SECONDS),
+                          pytest.approx(airspotbot.ratelimit.DEFAULT_BACKOFF_SECONDS * 2)]
+        # until it is longer than a request is allowed to wait, and requests are skipped
+        assert loc.get_location_description("33.4484", "-112.074") == "near 33.4484, -112.074"
+        assert requests_mock.call_count == 3
+        # a successful response ends the back-off
+        now[0] += 3600
+        requests_mock.get("https://api.3geonames.org/33.4484,-112.074.json",
+                          json={"nearest": {"name": "Sky Harbor", "city": "Phoenix"}})
+        assert loc.get_location_description("33.4484", "-112.074") == "near Sky Harbor, Phoenix"
+        loc.geonames_rate_limiter.back_off()
+        loc.get_location_description("33.4484", "-112.074")
+        assert sleeps[-1] == pytest.approx(airspotbot.ratelimit.DEFAULT_BACKOFF_SECONDS)
+
+    def test_pelias_back_off_reset(self, generate_pelias_location_config, requests_mock):
+        """A successful Pelias response resets the back-off, so isolated 429 responses do not
+        keep doubling it"""
+        generate_pelias_location_config['LOCATION']['pelias_area_layer'] = ""
+        generate_pelias_location_config['LOCATION']['geocode_cache_size'] = "0"
+        generate_pelias_location_config['LOCATION']['pelias_rate_limit'] = "1"
+        requests_mock.get(PELIAS_TEST_URL, json=pelias_features(None))
+        loc = airspotbot.location.Locator(config_parsed=generate_pelias_location_config,
+                                          user_agent=USER_AGENT)
+        now = [0.0]
+        sleeps = []
+
+        def fake_sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+        loc.pelias_rate_limiter = airspotbot.ratelimit.TokenBucket(
+            1, 1, 'Pelias', clock=lambda: now[0], sleep_function=fake_sleep)
+        pelias_url = "http://localhost:4000/v1/reverse?point.lat=33.4484&point.lon=-112.074" \
+                     "&layers=venue"
+        requests_mock.get(pelias_url, status_code=429)
+        assert loc.get_location_description("33.4484", "-112.074") == "near 33.4484, -112.074"
+        requests_mock.get(pelias_url, json=pelias_features("Sky Harbor"))
+        assert loc.get_location_description("33.4484", "-112.074") == "near Sky Harbor"
+        now[0] += 3600
+        requests_mock.get(pelias_url, status_code=429)
+        loc.get_location_description("33.4484", "-112.074")
+        loc.get_location_description("33.4484", "-112.074")
+        assert sleeps == [pytest.approx(airspotbot.ratelimit.DEFAULT_BACKOFF_SECONDS),
+                          pytest.approx(airspotbot.ratelimit.DEFAULT_BACKOFF_SECONDS)]
+
+    def test_rate_limit_settings(self, generate_empty_config):
+        generate_empty_config['LOCATION']['location_type'] = '3geonames'
+        generate_empty_config['LOCATION']['geonames_rate_limit'] = '0.5'
+        generate_empty_config['LOCATION']['geonames_rate_burst'] = 'lots'
+        loc = airspotbot.location.Locator(config_parsed=generate_empty_config,
+                                          user_agent=USER_AGENT)
+        assert loc.geonames_rate_limiter.rate == 0.5
+        assert loc.geonames_rate_limiter.burst == 1
+        generate_empty_config['LOCATION']['geonames_rate_limit'] = '0'
+        loc = airspotbot.location.Locator(config_parsed=generate_empty_config,
+                                          user_agent=USER_AGENT)
+        assert loc.geonames_rate_limiter is None
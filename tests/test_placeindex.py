@@ -0,0 +1,114 @@
+"""
+Tests for the placeindex.py module
+"""
+
+from .context import airspotbot
+
+import random
+import sys
+
+import pytest
+
+from airspotbot.placeindex import (PlaceIndex, build_place_index, distance_km, read_geonames,
+                                   KIND_AIRPORT, KIND_CITY, KIND_NEIGHBOURHOOD)
+
+
+def test_import():
+    """Test whether module to be tested was successfully imported"""
+    assert "airspotbot.placeindex" in sys.modules
+
+
+def geonames_line(geonameid, name, latitude, longitude, feature_class, feature_code):
+    """Return a line of a GeoNames dump, with the columns the place index does not use empty"""
+    fields = [str(geonameid), name, name, '', str(latitude), str(longitude), feature_class,
+              feature_code, 'US', '', 'AZ', '', '', '', '0', '', '0', 'America/Phoenix',
+              '2022-01-01']
+    return '\t'.join(fields) + '\n'
+
+
+PHOENIX_PLACES = [(5308655, 'Phoenix', 33.44838, -112.07404, 'P', 'PPLA'),
+                  (5289282, 'Chandler', 33.30616, -111.84125, 'P', 'PPL'),
+                  (5317058, 'Tempe', 33.41477, -111.90931, 'P', 'PPL'),
+                  (5308305, 'Downtown Phoenix', 33.4500, -112.0700, 'P', 'PPLX'),
+                  (5308480, 'Phoenix Sky Harbor International Airport', 33.43428, -112.01158,
+                   'S', 'AIRP'),
+                  (5300000, 'Old Tempe Ruins', 33.4100, -111.9000, 'P', 'PPLQ'),
+                  (5300001, 'Camelback Mountain', 33.5151, -111.9618, 'T', 'MT')]
+
+
+@pytest.fixture
+def phoenix_dump(tmp_path):
+    dump_path = tmp_path / "phoenix.txt"
+    dump_path.write_text(''.join(geonames_line(*place) for place in PHOENIX_PLACES),
+                         encoding='utf-8')
+    return dump_path
+
+
+def test_read_geonames(phoenix_dump):
+    assert list(read_geonames(str(phoenix_dump))) == [
+        ('Phoenix', 33.44838, -112.07404, KIND_CITY),
+        ('Chandler', 33.30616, -111.84125, KIND_CITY),
+        ('Tempe', 33.41477, -111.90931, KIND_CITY),
+        ('Downtown Phoenix', 33.45, -112.07, KIND_NEIGHBOURHOOD),
+        ('Phoenix Sky Harbor International Airport', 33.43428, -112.01158, KIND_AIRPORT)]
+
+
+class TestPlaceIndex:
+    """Tests for building and querying the place index"""
+
+    def test_nearest(self, phoenix_dump, tmp_path):
+        index_path = str(tmp_path / "phoenix.asbidx")
+        assert build_place_index(read_geonames(str(phoenix_dump)), index_path) == 5
+        index = PlaceIndex(index_path)
+        assert index.nearest(33.4350, -112.0100) == \
+               ('Phoenix Sky Harbor International Airport', 'Phoenix')
+        assert index.nearest(33.4501, -112.0701) == ('Downtown Phoenix', 'Phoenix')
+        assert index.nearest(33.3000, -111.8400) == ('Chandler', 'Chandler')
+        assert index.nearest(40.0, -105.0) == (None, None)
+        index.close()
+
+    def test_loaded_lazily(self, phoenix_dump, tmp_path):
+        index_path = str(tmp_path / "phoenix.asbidx")
+        index = PlaceIndex(index_path)  # the file does not exist yet
+        build_place_index(read_geonames(str(phoenix_dump)), index_path)
+        assert index.place_count == 0
+        assert index.nearest(33.4150, -111.9100)[0] == 'Tempe'
+        assert index.place_count == 5
+        index.close()
+
+    def test_max_distance(self, phoenix_dump, tmp_path):
+        index_path = str(tmp_path / "phoenix.asbidx")
+        build_place_index(read_geonames(str(phoenix_dump)), index_path)
+        index = PlaceIndex(index_path)
+        # Chandler is about 13 km from this position
+        assert index.nearest(33.2000, -111.7800, max_distance_km=10) == (None, None)
+        assert index.nearest(33.2000, -111.7800, max_distance_km=20) == ('Chandler', 'Chandler')
+        index.close()
+
+    def test_not_an_index(self, phoenix_dump):
+        with pytest.raises(ValueError):
+            PlaceIndex(str(phoenix_dump)).nearest(33.4, -112.0)
+
+    @pytest.mark.parametrize("cell_degrees", [0.1, 0.5])
+    def test_matches_brute_force(self, tmp_path, cell_degrees):
+        """The grid search finds the same place as comparing against every place, including
+        across the antimeridian and near the poles"""
+        rng = random.Random(1)
+        places = [(f'place {number}', rng.uniform(-89, 89), rng.uniform(-180, 180),
+                   rng.choice((KIND_CITY, KIND_NEIGHBOURHOOD, KIND_AIRPORT)))
+                  for number in range(2000)]
+        places += [('east', 10.0, 179.95, KIND_CITY), ('west', 10.0, -179.95, KIND_CITY)]
+        index_path = str(tmp_path / "random.asbidx")
+        build_place_index(places, index_path, cell_degrees)
+        index = PlaceIndex(index_path)
+        queries = [(rng.uniform(-89, 89), rng.uniform(-180, 180)) for _ in range(100)]
+        queries += [(10.0, 179.99), (10.0, -179.99), (88.9, 0.0)]
+        for latitude, longitude in queries:
+            in_reach = [(distance_km(latitude, longitude, place[1], place[2]), place)
+                        for place in places]
+            in_reach = [candidate for candidate in in_reach if candidate[0] <= 300]
+            expected_place = min(in_reach, key=lambda candidate: candidate[0],
+                                 default=(None, (None,)))[1][0]
+            found_place, _ = index.nearest(latitude, longitude, max_distance_km=300)
+            assert found_place == expected_place
+        index.close()
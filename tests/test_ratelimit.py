@@ -0,0 +1,108 @@
+"""
+Tests for the ratelimit.py module
+"""
+
+from .context import airspotbot
+
+import sys
+import threading
+
+import pytest
+
+from airspotbot.ratelimit import TokenBucket, DEFAULT_BACKOFF_SECONDS, MAX_BACKOFF_SECONDS
+
+
+def test_import():
+    """Test whether module to be tested was successfully imported"""
+    assert "airspotbot.ratelimit" in sys.modules
+
+
+class FakeTime:
+    """Clock and sleep function for a TokenBucket, where sleeping advances the clock"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def fake_time():
+    return FakeTime()
+
+
+class TestTokenBucket:
+    """Tests for the token-bucket rate limiter"""
+
+    def test_burst(self, fake_time):
+        limiter = TokenBucket(2, 3, clock=fake_time.clock, sleep_function=fake_time.sleep)
+        assert all(limiter.acquire() for _ in range(3))
+        assert fake_time.sleeps == []
+        assert limiter.acquire()
+        assert fake_time.sleeps == [pytest.approx(0.5)]
+
+    def test_refill(self, fake_time):
+        limiter = TokenBucket(1, 2, clock=fake_time.clock, sleep_function=fake_time.sleep)
+        limiter.acquire()
+        limiter.acquire()
+        fake_time.now += 100  # tokens accumulate up to the burst size only
+        assert all(limiter.acquire() for _ in range(2))
+        assert fake_time.sleeps == []
+        limiter.acquire()
+        assert fake_time.sleeps == [pytest.approx(1)]
+
+    def test_waiting_callers_spaced_out(self, fake_time):
+        """Callers arriving together reserve consecutive tokens rather than the same one"""
+        limiter = TokenBucket(1, 1, max_wait_seconds=10, clock=fake_time.clock,
+                              sleep_function=lambda seconds: fake_time.sleeps.append(seconds))
+        assert all(limiter.acquire() for _ in range(4))
+        assert fake_time.sleeps == [pytest.approx(1), pytest.approx(2), pytest.approx(3)]
+
+    def test_skips_long_waits(self, fake_time):
+        limiter = TokenBucket(0.1, 1, max_wait_seconds=5, clock=fake_time.clock,
+                              sleep_function=fake_time.sleep)
+        assert limiter.acquire()
+        assert not limiter.acquire()
+        fake_time.now += 6
+        assert limiter.acquire()
+        assert fake_time.sleeps == [pytest.approx(4)]
+
+    def test_back_off(self, fake_time):
+        limiter = TokenBucket(1, 5, max_wait_seconds=MAX_BACKOFF_SECONDS + 1,
+                              clock=fake_time.clock, sleep_function=fake_time.sleep)
+        limiter.back_off()
+        assert limiter.acquire()
+        assert fake_time.sleeps == [pytest.approx(DEFAULT_BACKOFF_SECONDS)]
+        limiter.back_off()
+        limiter.acquire()
+        assert fake_time.sleeps[-1] == pytest.approx(DEFAULT_BACKOFF_SECONDS * 2)
+        for _ in range(10):
+            limiter.back_off()
+        limiter.acquire()
+        assert fake_time.sleeps[-1] == pytest.approx(MAX_BACKOFF_SECONDS)
+        limiter.reset_back_off()
+        limiter.back_off()
+        limiter.acquire()
+        assert fake_time.sleeps[-1] == pytest.approx(DEFAULT_BACKOFF_SECONDS)
+
+    def test_threads(self):
+        """Concurrent callers get no more tokens than the burst without waiting"""
+        waits = []
+        limiter = TokenBucket(0.01, 5, max_wait_seconds=10000, sleep_function=waits.append)
+        threads = [threading.Thread(target=limiter.acquire) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(waits) == 15
+
+    @pytest.mark.parametrize("rate, burst", [(0, 1), (-1, 1), (1, 0)])
+    def test_invalid_settings(self, rate, burst):
+        with pytest.raises(ValueError):
+            TokenBucket(rate, burst)
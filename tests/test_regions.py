@@ -0,0 +1,75 @@
+"""
+Tests for the regions.py module
+"""
+
+from .context import airspotbot
+
+import pytest
+import sys
+
+SpotRegion = airspotbot.regions.SpotRegion
+
+
+def test_import():
+    """Test whether module to be tested was successfully imported"""
+    assert "airspotbot.regions" in sys.modules
+
+
+class TestDistance:
+    """Tests great-circle distance calculations"""
+
+    def test_zero_distance(self):
+        assert airspotbot.regions.distance_nautical_miles(33.4, -112.0, 33.4, -112.0) == 0
+
+    def test_one_degree_latitude(self):
+        """One degree of latitude is 60 nautical miles"""
+        distance = airspotbot.regions.distance_nautical_miles(10.0, 20.0, 11.0, 20.0)
+        assert distance == pytest.approx(60.04, abs=0.05)
+
+
+class TestCoalesce:
+    """Tests merging of overlapping regions into query circles"""
+
+    def test_disjoint_regions_not_merged(self):
+        regions = [SpotRegion('phoenix', 33.43, -112.01, 20),
+                   SpotRegion('london', 51.47, -0.45, 20)]
+        queries = airspotbot.regions.coalesce_regions(regions)
+        assert len(queries) == 2
+        assert not any(q.needs_local_filter for q in queries)
+
+    def test_overlapping_regions_merged(self):
+        regions = [SpotRegion('metro', 33.43, -112.01, 30),
+                   SpotRegion('luke', 33.53, -112.38, 10),
+                   SpotRegion('davis-monthan', 32.17, -110.88, 10)]
+        queries = airspotbot.regions.coalesce_regions(regions)
+        assert len(queries) == 2
+        merged = [q for q in queries if len(q.regions) == 2][0]
+        assert merged.needs_local_filter
+        # the merged query circle must fully contain both of its regions
+        for region in merged.regions:
+            assert airspotbot.regions.distance_nautical_miles(
+                merged.latitude, merged.longitude, region.latitude, region.longitude) \
+                + region.radius_nautical_miles <= merged.radius_nautical_miles
+
+    def test_contained_region_merged(self):
+        regions = [SpotRegion('metro', 33.43, -112.01, 50),
+                   SpotRegion('airport', 33.43, -112.00, 5)]
+        queries = airspotbot.regions.coalesce_regions(regions)
+        assert len(queries) == 1
+        assert queries[0].radius_nautical_miles == 50
+
+    def test_max_radius_respected(self):
+        regions = [SpotRegion('a', 0.0, 0.0, 200),
+                   SpotRegion('b', 0.0, 5.0, 200)]
+        queries = airspotbot.regions.coalesce_regions(regions)
+        assert len(queries) == 2
+
+    def test_region_split(self):
+        regions = [SpotRegion('metro', 33.43, -112.01, 20),
+                   SpotRegion('luke', 33.53, -112.38, 10)]
+        queries = airspotbot.regions.coalesce_regions(regions)
+        assert len(queries) == 1
+        query = queries[0]
+        assert query.region_for(33.43, -112.01).name == 'metro'
+        assert query.region_for(33.53, -112.5).name == 'luke'
+        assert query.region_for(33.43, -113.5) is None
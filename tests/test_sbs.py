@@ -0,0 +1,196 @@
+"""
+Tests for the sbs.py module
+"""
+
+from .context import airspotbot
+from .conftest import VALID_WATCHLIST, DEFAULT_IMAGE_DIRECTORY, USER_AGENT
+
+import socket
+import sys
+import threading
+
+import pytest
+
+from airspotbot.regions import SpotRegion
+from airspotbot.sbs import SbsParser, SbsSource
+
+
+def test_import():
+    """Test whether module to be tested was successfully imported"""
+    assert "airspotbot.sbs" in sys.modules
+
+
+REGIONS = [SpotRegion('main', 33.45, -112.07, 30)]
+
+# recorded SBS-1 messages: an airborne aircraft in the spotting area, one far away and one on
+# the ground, plus a non-MSG line that must be ignored
+RECORDED_MESSAGES = [
+    "MSG,1,1,1,A1B2C3,1,2023/11/14,22:13:20.000,2023/11/14,22:13:20.000,N911AZ  ,,,,,,,,,,,0",
+    "MSG,3,1,1,A1B2C3,1,2023/11/14,22:13:20.100,2023/11/14,22:13:20.100,,2500,,,33.50000,"
+    "-112.10000,,,0,0,0,0",
+    "MSG,4,1,1,A1B2C3,1,2023/11/14,22:13:20.200,2023/11/14,22:13:20.200,,,110.2,271.0,,,-64,,,,,0",
+    "MSG,3,1,1,A00002,1,2023/11/14,22:13:20.300,2023/11/14,22:13:20.300,,35000,,,40.00000,"
+    "-100.00000,,,0,0,0,0",
+    "MSG,2,1,1,A00005,1,2023/11/14,22:13:20.400,2023/11/14,22:13:20.400,,,5.0,90.0,33.43000,"
+    "-112.01000,,,,,,-1",
+    "MSG,6,1,1,A00005,1,2023/11/14,22:13:20.500,2023/11/14,22:13:20.500,,,,,,,,7700,0,1,0,-1",
+    "STA,,5,179,400AE7,10103,2023/11/14,22:13:20.600,2023/11/14,22:13:20.600,RM",
+]
+RECORDED_FEED = "".join(line + "\r\n" for line in RECORDED_MESSAGES).encode()
+
+
+class TestSbsParser:
+    """Tests for parsing SBS-1 messages into the per-hex state table"""
+
+    def test_state_table(self):
+        parser = SbsParser(clock=lambda: 1000.0)
+        assert parser.feed(RECORDED_FEED) == 4
+        assert parser.message_count == 6
+        assert set(parser.aircraft) == {'a1b2c3', 'a00002', 'a00005'}
+        assert parser.aircraft['a1b2c3'].to_raw(1002.0) == {
+            'hex': 'a1b2c3', 'seen': 2.0, 'flight': 'N911AZ', 'alt_baro': 2500, 'gs': 110.2,
+            'track': 271.0, 'lat': 33.5, 'lon': -112.1, 'seen_pos': 2.0}
+        grounded = parser.aircraft['a00005'].to_raw(1000.0)
+        assert grounded['alt_baro'] == 'ground'
+        assert grounded['squawk'] == '7700'
+
+    def test_partial_lines(self):
+        parser = SbsParser(clock=lambda: 1000.0)
+        # split the feed in the middle of lines, including between \r and \n
+        chunks = [RECORDED_FEED[n:n + 7] for n in range(0, len(RECORDED_FEED), 7)]
+        assert sum(parser.feed(chunk) for chunk in chunks) == 4
+        assert parser.aircraft['a1b2c3'].latitude == 33.5
+        assert parser.aircraft['a1b2c3'].callsign == 'N911AZ'
+
+    def test_only_new_aircraft_and_first_positions_qualify(self):
+        parser = SbsParser(clock=lambda: 1000.0)
+        assert parser.feed(b"MSG,1,1,1,A1B2C3,1,,,,,N911AZ,,,,,,,,,,,0\n") == 1
+        assert parser.feed(b"MSG,5,1,1,A1B2C3,1,,,,,,2600,,,,,,,0,0,0,0\n") == 0
+        assert parser.feed(b"MSG,3,1,1,A1B2C3,1,,,,,,2600,,,33.5,-112.1,,,0,0,0,0\n") == 1
+        assert parser.feed(b"MSG,3,1,1,A1B2C3,1,,,,,,2700,,,33.6,-112.1,,,0,0,0,0\n") == 0
+
+    def test_malformed_messages(self):
+        parser = SbsParser(clock=lambda: 1000.0)
+        assert parser.feed(b"MSG,3,1,1,A1B2C3,1\ngarbage\n\nMSG,3,1,1,,1,,,,,,,,,,,,,,,,0\n") == 0
+        parser.feed(b"MSG,3,1,1,A1B2C3,1,,,,,,high,,,33.5,-112.1,,,0,0,0,0\n")
+        assert parser.error_count == 1
+        assert parser.aircraft['a1b2c3'].altitude_ft is None
+        # the fields after a malformed one are still applied
+        assert parser.aircraft['a1b2c3'].latitude == 33.5
+        assert parser.aircraft['a1b2c3'].last_position == 1000.0
+        parser.feed(b"MSG,3,1,1,A1B2C3,1,,,,,,2600,,,33.6,west,,,0,0,0,0\n")
+        assert parser.error_count == 2
+        assert parser.aircraft['a1b2c3'].altitude_ft == 2600
+        # a position is only updated when both coordinates are valid
+        assert parser.aircraft['a1b2c3'].latitude == 33.5
+
+    def test_expire(self):
+        now = [1000.0]
+        parser = SbsParser(clock=lambda: now[0])
+        parser.feed(RECORDED_FEED)
+        now[0] = 1100.0
+        parser.feed(b"MSG,5,1,1,A00002,1,,,,,,36000,,,,,,,0,0,0,0\n")
+        parser.expire(1050.0)
+        assert set(parser.aircraft) == {'a00002'}
+
+
+@pytest.fixture
+def sbs_feed():
+    """Local stand-in for a decoder's SBS-1 output, replaying the recorded messages to each
+    client that connects"""
+    server = socket.create_server(('127.0.0.1', 0))
+    stop = threading.Event()
+
+    def serve():
+        while not stop.is_set():
+            try:
+                connection, _ = server.accept()
+            except OSError:
+                return
+            with connection:
+                connection.sendall(RECORDED_FEED)
+                stop.wait()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield server.getsockname()[1]
+    stop.set()
+    server.close()
+    thread.join()
+
+
+class TestSbsSource:
+    """Tests for streaming aircraft from an SBS-1 TCP feed"""
+
+    def test_stream(self, sbs_feed):
+        source = SbsSource('127.0.0.1', sbs_feed, REGIONS)
+        try:
+            assert source.wait_for_update(5)
+            # the remaining messages of the recording may arrive in a separate chunk
+            while len(source.parser.aircraft) < 3:
+                source.wait_for_update(0.1)
+            aircraft = source.fetch()
+        finally:
+            source.close()
+        assert sorted((raw['hex'], region) for raw, region in aircraft) == \
+               [('a00005', 'main'), ('a1b2c3', 'main')]
+
+    def test_stale_positions_dropped(self, sbs_feed):
+        now = [1000.0]
+        source = SbsSource('127.0.0.1', sbs_feed, REGIONS, clock=lambda: now[0])
+        try:
+            source.wait_for_update(5)
+            while len(source.parser.aircraft) < 3:
+                source.wait_for_update(0.1)
+            assert len(source.fetch()) == 2
+            now[0] += 120
+            assert source.fetch() == []
+        finally:
+            source.close()
+
+    def test_no_feed(self, caplog):
+        probe = socket.create_server(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+        probe.close()
+        source = SbsSource('127.0.0.1', port, REGIONS, reconnect_seconds=0.05)
+        try:
+            assert not source.wait_for_update(0.2)
+            assert source.fetch() == []
+        finally:
+            source.close()
+        assert "Error reading SBS-1 feed at 127.0.0.1" in caplog.text
+
+
+def test_spotter_sbs_source(generate_valid_adsb_config, sbs_feed):
+    config = generate_valid_adsb_config
+    config['ADSB']['lat'], config['ADSB']['long'], config['ADSB']['radius'] = \
+        "33.45", "-112.07", "30"
+    config['ADSB']['adsb_source'] = "sbs"
+    config['ADSB']['sbs_host'] = "127.0.0.1"
+    config['ADSB']['sbs_port'] = str(sbs_feed)
+    config['ADSB']['spot_unknown'] = "y"
+    del config['ADSB']['adsb_api_key']
+    spots = airspotbot.adsbget.Spotter(config_parsed=config,
+                                       watchlist_path=VALID_WATCHLIST,
+                                       image_dir=DEFAULT_IMAGE_DIRECTORY,
+                                       user_agent=USER_AGENT)
+    try:
+        assert isinstance(spots.source, SbsSource)
+        assert spots.source.wait_for_update(5)
+        while len(spots.source.parser.aircraft) < 3:
+            spots.source.wait_for_update(0.1)
+        spots.check_spots()
+    finally:
+        spots.source.close()
+    # SBS-1 messages carry no registration, so airborne aircraft are spotted as unknown
+    assert [p.hex_code for p in spots.spot_queue] == ['a1b2c3']
+
+
+def test_bad_sbs_port(generate_valid_adsb_config):
+    generate_valid_adsb_config['ADSB']['adsb_source'] = "sbs"
+    generate_valid_adsb_config['ADSB']['sbs_port'] = "port 30003"
+    with pytest.raises(ValueError):
+        airspotbot.adsbget.Spotter(config_parsed=generate_valid_adsb_config,
+                                   watchlist_path=VALID_WATCHLIST,
+                                   image_dir=DEFAULT_IMAGE_DIRECTORY,
+                                   user_agent=USER_AGENT)
@@ -0,0 +1,79 @@
+"""
+Tests for the seen.py module
+"""
+
+from .context import airspotbot
+
+import sys
+
+
+def test_import():
+    """Test whether module to be tested was successfully imported"""
+    assert "airspotbot.seen" in sys.modules
+
+
+class TestSeenCache:
+    """Tests for the time-ordered seen cache"""
+
+    def test_dict_operations(self):
+        seen = airspotbot.seen.SeenCache()
+        seen['abc123'] = 100.0
+        assert 'abc123' in seen
+        assert seen['abc123'] == 100.0
+        assert len(seen) == 1
+        assert seen.pop('abc123') == 100.0
+        assert seen.pop('abc123') is None
+        assert 'abc123' not in seen
+
+    def test_expire_oldest_first(self):
+        seen = airspotbot.seen.SeenCache()
+        for n in range(10):
+            seen[f'{n:06x}'] = float(n)
+        assert seen.expire(3.0) == ['000000', '000001', '000002']
+        assert len(seen) == 7
+        assert seen.stats() == {'size': 7, 'evictions': 3}
+
+    def test_respot_moves_to_back(self):
+        seen = airspotbot.seen.SeenCache()
+        seen['aaaaaa'] = 1.0
+        seen['bbbbbb'] = 2.0
+        seen['aaaaaa'] = 3.0  # spotted again after its cooldown was reset
+        assert seen.expire(2.5) == ['bbbbbb']
+        assert 'aaaaaa' in seen
+
+    def test_expire_nothing(self):
+        seen = airspotbot.seen.SeenCache()
+        seen['aaaaaa'] = 5.0
+        assert seen.expire(5.0) == []
+        assert seen.evictions == 0
+
+
+class TestSqliteSeenStore:
+    """Tests for persisting the seen cache to SQLite"""
+
+    def test_survives_restart(self, tmp_path):
+        db_path = tmp_path / "seen.sqlite"
+        seen = airspotbot.seen.SeenCache(airspotbot.seen.SqliteSeenStore(str(db_path)))
+        seen['aaaaaa'] = 1.0
+        seen['bbbbbb'] = 2.0
+        seen['cccccc'] = 3.0
+        seen.expire(1.5)
+        seen.pop('cccccc')
+        seen.flush()
+        seen.store.close()
+        restarted = airspotbot.seen.SeenCache(airspotbot.seen.SqliteSeenStore(str(db_path)))
+        assert list(restarted.items()) == [('bbbbbb', 2.0)]
+
+    def test_loaded_in_time_order(self, tmp_path):
+        store = airspotbot.seen.SqliteSeenStore(str(tmp_path / "seen.sqlite"))
+        store.apply({'cccccc': 3.0, 'aaaaaa': 1.0, 'bbbbbb': 2.0}, set())
+        seen = airspotbot.seen.SeenCache(store)
+        assert seen.expire(2.5) == ['aaaaaa', 'bbbbbb']
+
+    def test_unflushed_changes_not_written(self, tmp_path):
+        store = airspotbot.seen.SqliteSeenStore(str(tmp_path / "seen.sqlite"))
+        seen = airspotbot.seen.SeenCache(store)
+        seen['aaaaaa'] = 1.0
+        assert store.load() == []
+        seen.flush()
+        assert store.load() == [('aaaaaa', 1.0)]
@@ -0,0 +1,58 @@
+"""
+Tests for the snapshot.py module
+"""
+
+from .context import airspotbot
+
+import sys
+
+
+def test_import():
+    """Test whether module to be tested was successfully imported"""
+    assert "airspotbot.snapshot" in sys.modules
+
+
+def raw(hex_code, **fields):
+    aircraft = {'hex': hex_code, 'r': 'N1', 't': 'B738', 'alt_baro': 10200, 'flight': 'ABC1 ',
+                'lat': 33.0, 'lon': -112.0, 'gs': 300}
+    aircraft.update(fields)
+    return aircraft
+
+
+class TestSnapshotTracker:
+    """Tests for classifying snapshots"""
+
+    def test_classification(self):
+        tracker = airspotbot.snapshot.SnapshotTracker()
+        first = tracker.update([(raw('aaaaaa'), None), (raw('bbbbbb'), None),
+                                (raw('cccccc'), None), (raw('dddddd'), None)])
+        assert len(first.entered) == 4
+        second = tracker.update([
+            (raw('aaaaaa', lat=33.5, lon=-112.3, gs=310), None),  # moved only
+            (raw('bbbbbb', alt_baro=10900), None),  # same altitude band
+            (raw('cccccc', alt_baro=11100), None),  # crossed into the next altitude band
+            (raw('eeeeee'), None)])
+        assert [a['hex'] for a, _ in second.entered] == ['eeeeee']
+        assert [a['hex'] for a, _ in second.updated] == ['cccccc']
+        assert [a['hex'] for a, _ in second.unchanged] == ['aaaaaa', 'bbbbbb']
+        assert second.left == ['dddddd']
+        assert len(tracker) == 4
+        assert 'dddddd' not in tracker
+
+    def test_meaningful_changes(self):
+        tracker = airspotbot.snapshot.SnapshotTracker()
+        tracker.update([(raw('aaaaaa'), 'main')])
+        for changed in (raw('aaaaaa', flight='XYZ9'), raw('aaaaaa', alt_baro='ground'),
+                        raw('aaaaaa', dbFlags=1), raw('aaaaaa', r='N2')):
+            assert len(tracker.update([(changed, 'main')]).updated) == 1
+            tracker.update([(raw('aaaaaa'), 'main')])
+        assert len(tracker.update([(raw('aaaaaa'), 'metro')]).updated) == 1
+
+    def test_untracked_and_clear(self):
+        tracker = airspotbot.snapshot.SnapshotTracker()
+        no_hex = {'r': 'N1', 'lat': 0, 'lon': 0}
+        tracker.update([(raw('aaaaaa'), None), (no_hex, None)])
+        diff = tracker.update([(raw('aaaaaa'), None), (no_hex, None)])
+        assert diff.entered == [(no_hex, None)]
+        tracker.clear()
+        assert len(tracker.update([(raw('aaaaaa'), None)]).entered) == 1
@@ -0,0 +1,234 @@
+"""
+Tests for the sources.py module
+"""
+
+from .context import airspotbot
+from .conftest import VALID_WATCHLIST, DEFAULT_IMAGE_DIRECTORY, USER_AGENT
+
+import json
+import os
+import sys
+from time import time
+
+import pytest
+
+from airspotbot.regions import SpotRegion
+from airspotbot.sources import AircraftJsonSource, AircraftSource, FusedSource
+
+
+def test_import():
+    """Test whether module to be tested was successfully imported"""
+    assert "airspotbot.sources" in sys.modules
+
+
+REGIONS = [SpotRegion('main', 33.45, -112.07, 30), SpotRegion('north', 35.2, -111.65, 10)]
+
+
+def receiver_json(*aircraft, now=None):
+    return {"now": time() if now is None else now, "messages": 1234, "aircraft": list(aircraft)}
+
+
+NEARBY = {"hex": "a1b2c3", "flight": "N911AZ  ", "r": "N911AZ", "t": "B429", "dbFlags": 0,
+          "alt_baro": 2500, "gs": 110.2, "lat": 33.5, "lon": -112.1, "seen_pos": 0.4}
+NORTH = {"hex": "a00001", "alt_baro": 9000, "gs": 250, "lat": 35.21, "lon": -111.66,
+         "seen_pos": 1.0}
+FAR_AWAY = {"hex": "a00002", "alt_baro": 35000, "gs": 450, "lat": 40.0, "lon": -100.0,
+            "seen_pos": 0.1}
+STALE = {"hex": "a00003", "alt_baro": 3000, "gs": 120, "lat": 33.45, "lon": -112.07,
+         "seen_pos": 120.0}
+NO_POSITION = {"hex": "a00004", "alt_baro": 3000, "gs": 120}
+
+
+class TestAircraftJsonSource:
+    """Tests for reading a local receiver's aircraft.json"""
+
+    def test_region_filter(self, tmp_path):
+        aircraft_path = tmp_path / "aircraft.json"
+        aircraft_path.write_text(json.dumps(receiver_json(NEARBY, NORTH, FAR_AWAY, STALE,
+                                                          NO_POSITION)))
+        source = AircraftJsonSource(str(aircraft_path), REGIONS)
+        assert [(raw['hex'], region) for raw, region in source.fetch()] == \
+               [('a1b2c3', 'main'), ('a00001', 'north')]
+
+    def test_reload_only_on_mtime_change(self, tmp_path, monkeypatch):
+        aircraft_path = tmp_path / "aircraft.json"
+        aircraft_path.write_text(json.dumps(receiver_json(NEARBY)))
+        source = AircraftJsonSource(str(aircraft_path), REGIONS)
+        first = source.fetch()
+        loads = []
+        monkeypatch.setattr(airspotbot.sources.json, 'loads',
+                            lambda data: loads.append(data) or json.JSONDecoder().decode(
+                                data.decode()))
+        assert source.fetch() == first
+        assert loads == []
+        aircraft_path.write_text(json.dumps(receiver_json(NEARBY, NORTH)))
+        os.utime(aircraft_path, ns=(0, source._modified + 1_000_000_000))
+        assert len(source.fetch()) == 2
+        assert len(loads) == 1
+
+    def test_missing_file(self, tmp_path, caplog):
+        source = AircraftJsonSource(str(tmp_path / "missing.json"), REGIONS)
+        assert source.fetch() == []
+        assert "Error reading aircraft.json at" in caplog.text
+
+    def test_stale_snapshot(self, tmp_path, caplog):
+        aircraft_path = tmp_path / "aircraft.json"
+        aircraft_path.write_text(json.dumps(receiver_json(NEARBY, now=1700000000.0)))
+        clock_time = [1700000010.0]
+        source = AircraftJsonSource(str(aircraft_path), REGIONS, max_snapshot_age=30,
+                                    clock=lambda: clock_time[0])
+        assert len(source.fetch()) == 1
+        assert source.snapshot_time == 1700000000.0
+        # the receiver stops writing the file, so it is not re-read but its snapshot ages
+        clock_time[0] = 1700000031.0
+        assert source.fetch() == []
+        assert "has not been updated for 31 seconds" in caplog.text
+        aircraft_path.write_text(json.dumps(receiver_json(NEARBY, now=1700000030.0)))
+        os.utime(aircraft_path, ns=(0, source._modified + 1_000_000_000))
+        assert len(source.fetch()) == 1
+
+    def test_http(self, requests_mock):
+        url = "http://receiver.local/tar1090/data/aircraft.json"
+        requests_mock.get(url, json=receiver_json(NEARBY),
+                          headers={'Last-Modified': 'Tue, 14 Nov 2023 22:13:20 GMT'})
+        source = AircraftJsonSource(url, REGIONS)
+        assert len(source.fetch()) == 1
+        assert 'If-Modified-Since' not in requests_mock.last_request.headers
+        requests_mock.get(url, status_code=304)
+        assert len(source.fetch()) == 1
+        assert requests_mock.last_request.headers['If-Modified-Since'] == \
+               'Tue, 14 Nov 2023 22:13:20 GMT'
+
+
+class StaticSource(AircraftSource):
+    """Stands in for an aircraft source returning a fixed snapshot"""
+
+    def __init__(self, description, *aircraft):
+        self.description = description
+        self.aircraft = list(aircraft)
+
+    def fetch(self):
+        return self.aircraft
+
+
+# the same helicopter as NEARBY, as returned by the ADSBx API a few seconds behind the receiver
+NEARBY_ADSBX = {"hex": "a1b2c3", "flight": "N911AZ  ", "r": "N911AZ", "t": "B429", "dbFlags": 1,
+                "desc": "BELL 429", "alt_baro": 2400, "gs": 108.0, "lat": 33.49, "lon": -112.11,
+                "seen_pos": 6.2, "squawk": "1200"}
+
+
+class TestFusedSource:
+    """Tests for merging the observations of several sources"""
+
+    def test_one_candidate_per_aircraft(self):
+        receiver = dict(NEARBY, r=None, t=None)
+        del receiver['dbFlags']
+        source = FusedSource([StaticSource('adsbx', (NEARBY_ADSBX, 'main'), (NORTH, 'north')),
+                              StaticSource('receiver', (receiver, 'main'))])
+        aircraft = source.fetch()
+        assert [(raw['hex'], region) for raw, region in aircraft] == \
+               [('a1b2c3', 'main'), ('a00001', 'north')]
+        merged = aircraft[0][0]
+        # position from the receiver, which saw the aircraft most recently
+        assert (merged['lat'], merged['lon'], merged['alt_baro'], merged['seen_pos']) == \
+               (33.5, -112.1, 2500, 0.4)
+        # metadata from ADSBx, and keys only ADSBx has are filled in
+        assert (merged['r'], merged['t'], merged['dbFlags'], merged['desc']) == \
+               ('N911AZ', 'B429', 1, 'BELL 429')
+        assert merged['squawk'] == '1200'
+
+    def test_metadata_priority(self):
+        receiver = dict(NEARBY, t='B06')
+        source = FusedSource([StaticSource('adsbx', (NEARBY_ADSBX, 'main')),
+                              StaticSource('receiver', (receiver, 'main'))])
+        assert source.fetch()[0][0]['t'] == 'B429'
+        source = FusedSource([StaticSource('receiver', (receiver, 'main')),
+                              StaticSource('adsbx', (NEARBY_ADSBX, 'main'))])
+        assert source.fetch()[0][0]['t'] == 'B06'
+
+    def test_region_of_freshest_observation(self):
+        moved = dict(NEARBY, lat=35.21, lon=-111.66, seen_pos=0.1)
+        source = FusedSource([StaticSource('adsbx', (NEARBY, 'main')),
+                              StaticSource('receiver', (moved, 'north'))])
+        assert source.fetch() == [(dict(moved, r='N911AZ', t='B429', dbFlags=0), 'north')]
+
+    def test_freshest_by_absolute_time(self):
+        # the receiver's snapshot is 10 seconds older than the API's, so its position with the
+        #  lower seen_pos was received 3.8 seconds before the API's
+        receiver = StaticSource('receiver', (NEARBY, 'main'))
+        receiver.snapshot_time = 1700000000.0
+        adsbx = StaticSource('adsbx', (NEARBY_ADSBX, 'main'))
+        adsbx.snapshot_time = 1700000010.0
+        merged = FusedSource([adsbx, receiver]).fetch()[0][0]
+        assert (merged['lat'], merged['lon'], merged['seen_pos']) == (33.49, -112.11, 6.2)
+        receiver.snapshot_time = 1700000008.0
+        merged = FusedSource([adsbx, receiver]).fetch()[0][0]
+        assert (merged['lat'], merged['lon'], merged['seen_pos']) == (33.5, -112.1, 0.4)
+
+    def test_aircraft_without_hex_kept(self):
+        no_hex = {"flight": "UNKNOWN", "lat": 33.5, "lon": -112.1}
+        source = FusedSource([StaticSource('adsbx', (no_hex, 'main')),
+                              StaticSource('receiver', (no_hex, 'main'))])
+        assert len(source.fetch()) == 2
+
+
+class TestSpotterSource:
+    """Tests for selecting the Spotter's aircraft source"""
+
+    def test_aircraft_json_source(self, generate_valid_adsb_config, tmp_path):
+        aircraft_path = tmp_path / "aircraft.json"
+        # both aircraft are military, but only one is inside the spotting area
+        aircraft_path.write_text(json.dumps(receiver_json(dict(NEARBY, dbFlags=1),
+                                                          dict(FAR_AWAY, dbFlags=1))))
+        config = generate_valid_adsb_config
+        config['ADSB']['lat'], config['ADSB']['long'], config['ADSB']['radius'] = \
+            "33.45", "-112.07", "30"
+        config['ADSB']['adsb_source'] = "aircraft_json"
+        config['ADSB']['aircraft_json'] = str(aircraft_path)
+        del config['ADSB']['adsb_api_key']
+        spots = airspotbot.adsbget.Spotter(config_parsed=config,
+                                           watchlist_path=VALID_WATCHLIST,
+                                           image_dir=DEFAULT_IMAGE_DIRECTORY,
+                                           user_agent=USER_AGENT)
+        assert isinstance(spots.source, AircraftJsonSource)
+        spots.check_spots()
+        assert [p.hex_code for p in spots.spot_queue] == ['a1b2c3']
+        assert spots.spot_queue[0].region == 'main'
+
+    def test_fused_sources(self, generate_valid_adsb_config, tmp_path, requests_mock):
+        aircraft_path = tmp_path / "aircraft.json"
+        # the local receiver has no aircraft database, so only ADSBx knows the aircraft is
+        #  military
+        aircraft_path.write_text(json.dumps(receiver_json(NEARBY)))
+        config = generate_valid_adsb_config
+        config['ADSB']['lat'], config['ADSB']['long'], config['ADSB']['radius'] = \
+            "33.45", "-112.07", "30"
+        config['ADSB']['adsb_source'] = "rapidapi, aircraft_json"
+        config['ADSB']['aircraft_json'] = str(aircraft_path)
+        spots = airspotbot.adsbget.Spotter(config_parsed=config,
+                                           watchlist_path=VALID_WATCHLIST,
+                                           image_dir=DEFAULT_IMAGE_DIRECTORY,
+                                           user_agent=USER_AGENT)
+        assert isinstance(spots.source, FusedSource)
+        requests_mock.get(spots.url, json={"ac": [NEARBY_ADSBX]})
+        spots.check_spots()
+        assert len(spots.spot_queue) == 1
+        spot = spots.spot_queue[0]
+        assert (spot.hex_code, spot.coordinates.latitude, spot.type_code) == \
+               ('a1b2c3', 33.5, 'B429')
+
+    def test_source_listed_twice(self, generate_valid_adsb_config):
+        generate_valid_adsb_config['ADSB']['adsb_source'] = "rapidapi,rapidapi"
+        with pytest.raises(ValueError):
+            airspotbot.adsbget.Spotter(config_parsed=generate_valid_adsb_config,
+                                       watchlist_path=VALID_WATCHLIST,
+                                       image_dir=DEFAULT_IMAGE_DIRECTORY,
+                                       user_agent=USER_AGENT)
+
+    def test_bad_source(self, generate_valid_adsb_config):
+        generate_valid_adsb_config['ADSB']['adsb_source'] = "carrier_pigeon"
+        with pytest.raises(ValueError):
+            airspotbot.adsbget.Spotter(config_parsed=generate_valid_adsb_config,
+                                       watchlist_path=VALID_WATCHLIST,
+                                       image_dir=DEFAULT_IMAGE_DIRECTORY,
+                                       user_agent=USER_AGENT)
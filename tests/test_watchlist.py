@@ -0,0 +1,136 @@
+"""
+Tests for the watchlist.py module
+"""
+
+from .context import airspotbot
+
+import sys
+
+import pytest
+
+
+def test_import():
+    """Test whether module to be tested was successfully imported"""
+    assert "airspotbot.watchlist" in sys.modules
+
+
+def make_rules(image_dir='./images/', spot_unknown=False, spot_mil=False,
+               spot_interesting=False):
+    watchlist_ia = {'a1b2c3': {'desc': 'ICAO entry', 'img': ''}}
+    watchlist_rn = {'N12345': {'desc': 'Registration entry', 'img': 'uh72.jpg'}}
+    watchlist_tc = {'C17': {'desc': '', 'img': '', 'mil_only': False},
+                    'H60': {'desc': 'Military helicopter', 'img': 'missing.png',
+                            'mil_only': True}}
+    return airspotbot.watchlist.WatchlistRules(watchlist_ia, watchlist_rn, watchlist_tc,
+                                               image_dir, spot_unknown, spot_mil,
+                                               spot_interesting)
+
+
+class TestWatchlistRules:
+    """Tests for the compiled spotting rules"""
+
+    def test_precedence(self):
+        rules = make_rules(spot_unknown=True, spot_mil=True)
+        # ICAO address beats registration number, which beats type code and the global flags
+        assert rules.match('a1b2c3', 'N12345', 'C17', True, False).reason == \
+               'ICAO address watchlist'
+        assert rules.match('000000', 'N12345', 'C17', True, False).reason == \
+               'registration number watchlist'
+        assert rules.match('000000', 'unknown', 'C17', True, False).reason == \
+               'type code watchlist'
+        assert rules.match('000000', 'unknown', 'B738', True, False).reason == \
+               'unknown registration number'
+        assert rules.match('000000', 'N54321', 'B738', True, False).reason == \
+               'designated military'
+
+    def test_mil_only(self):
+        rules = make_rules(spot_unknown=True)
+        assert rules.match('000000', 'N54321', 'H60', True, False).description == \
+               'Military helicopter'
+        # a mil only type code entry suppresses the global rules for non-military aircraft
+        assert rules.match('000000', 'unknown', 'H60', False, False) is None
+
+    @pytest.mark.parametrize("flags", [(False, False, False), (True, False, False),
+                                       (False, True, False), (False, False, True)])
+    def test_global_flags(self, flags):
+        spot_unknown, spot_mil, spot_interesting = flags
+        rules = make_rules(spot_unknown=spot_unknown, spot_mil=spot_mil,
+                           spot_interesting=spot_interesting)
+        assert (rules.match('000000', 'unknown', 'B738', False, False) is not None) == \
+               spot_unknown
+        assert (rules.match('000000', 'N54321', 'B738', True, False) is not None) == spot_mil
+        assert (rules.match('000000', 'N54321', 'B738', False, True) is not None) == \
+               spot_interesting
+        assert rules.match('000000', 'N54321', 'B738', False, False) is None
+
+    def test_no_filesystem_access_when_matching(self, monkeypatch):
+        rules = make_rules(spot_mil=True)
+        assert set(rules.image_paths) == {'uh72.jpg'}
+        assert set(rules.missing_images) == {'missing.png'}
+
+        def fail_is_file(path):
+            raise AssertionError(f"is_file called for {path} while matching")
+        monkeypatch.setattr(airspotbot.watchlist.Path, 'is_file', fail_is_file)
+        for _ in range(2):
+            assert rules.match('000000', 'N12345', 'B738', False, False).image_path.name == \
+                   'uh72.jpg'
+            assert rules.match('000000', 'N54321', 'H60', True, False).missing_image.name == \
+                   'missing.png'
+
+    def test_image_paths_resolved_once(self):
+        rules = make_rules()
+        assert rules.by_reg['N12345'].image_path.name == 'uh72.jpg'
+        assert rules.by_reg['N12345'].missing_image is None
+        helicopter_match = rules.by_type['H60'][1]
+        assert helicopter_match.image_path is None
+        assert helicopter_match.missing_image.name == 'missing.png'
+
+
+class TestPatternRules:
+    """Tests for ICAO address range, registration prefix and type code wildcard rules"""
+
+    def test_prefix_trie_longest_match(self):
+        trie = airspotbot.watchlist.PrefixTrie()
+        trie.insert('N9', 'short')
+        trie.insert('N91', 'long')
+        assert trie.longest_prefix('N912AB') == 'long'
+        assert trie.longest_prefix('N95') == 'short'
+        assert trie.longest_prefix('G-ABCD') is None
+        assert len(trie) == 2
+        assert dict(trie.items()) == {'N9': 'short', 'N91': 'long'}
+
+    def test_interval_index_narrowest_range(self):
+        index = airspotbot.watchlist.IntervalIndex([(0xAE0000, 0xAFFFFF, 'block'),
+                                                    (0xAE1000, 0xAE1FFF, 'sub block'),
+                                                    (0x400000, 0x43FFFF, 'uk')])
+        assert index.find(0xAE0000) == 'block'
+        assert index.find(0xAE1234) == 'sub block'
+        assert index.find(0xAE2000) == 'block'
+        assert index.find(0xAFFFFF) == 'block'
+        assert index.find(0xB00000) is None
+        assert index.find(0x3FFFFF) is None
+        assert index.find(0x43FFFF) == 'uk'
+        assert len(index) == 4
+
+    def test_match_precedence(self):
+        watchlist_ir = {'AE0000-AFFFFF': {'desc': 'US military', 'img': '',
+                                          'start': 0xAE0000, 'end': 0xAFFFFF}}
+        watchlist_rp = {'N9': {'desc': 'N9 prefix', 'img': ''}}
+        watchlist_tp = {'C13*': {'desc': 'Hercules', 'img': '', 'mil_only': True,
+                                 'prefix': 'C13'}}
+        rules = airspotbot.watchlist.WatchlistRules(
+            {}, {'N9ABC': {'desc': 'Exact reg', 'img': ''}}, {}, './images/',
+            False, False, False, watchlist_ir=watchlist_ir, watchlist_rp=watchlist_rp,
+            watchlist_tp=watchlist_tp)
+        assert rules.match('ae1234', 'N9ABC', 'C130', False, False).description == 'US military'
+        assert rules.match('~ae1234', 'N9ABC', 'C130', False, False).description == 'Exact reg'
+        assert rules.match('a00000', 'N9XYZ', 'C130', False, False).description == 'N9 prefix'
+        assert rules.match('a00000', 'N8XYZ', 'C130', True, False).description == 'Hercules'
+        assert rules.match('a00000', 'N8XYZ', 'C130', False, False) is None
+        assert rules.match('a00000', 'N8XYZ', 'C30J', True, False) is None
+
+
+def test_diff_watchlists():
+    old = {'A': {'desc': 'a', 'img': ''}, 'B': {'desc': 'b', 'img': ''}}
+    new = {'B': {'desc': 'b2', 'img': ''}, 'C': {'desc': 'c', 'img': ''}}
+    assert airspotbot.watchlist.diff_watchlists(old, new) == (['C'], ['A'], ['B'])
@@ -0,0 +1,92 @@
+"""
+Tests for the watchlist_cache.py module
+"""
+
+from .context import airspotbot
+from .conftest import PATTERN_WATCHLIST, DEFAULT_IMAGE_DIRECTORY, USER_AGENT
+
+import logging
+import os
+import shutil
+import sys
+
+from airspotbot.watchlist_cache import CsvFingerprint, load_cache, write_cache
+
+
+def test_import():
+    """Test whether module to be tested was successfully imported"""
+    assert "airspotbot.watchlist_cache" in sys.modules
+
+
+WATCHLISTS = {'watchlist_ia': {'ae1234': {'desc': 'Gov', 'img': ''},
+                               '508035': {'desc': 'Antonov AN-225 Mriya', 'img': ''},
+                               'a00001': {'desc': 'Gov', 'img': ''}},
+              'watchlist_rn': {'N911AZ': {'desc': 'Bell 429 owned by AZ DPS', 'img': 'n911az.png'},
+                               'ÖVAUS': {'desc': '', 'img': ''}},
+              'watchlist_tc': {}}
+
+
+class TestWatchlistCache:
+    """Tests for writing and mapping the compiled watchlist cache"""
+
+    def test_round_trip(self, tmp_path):
+        csv_path = tmp_path / "watchlist.csv"
+        csv_path.write_text("Key,Type,Mil Only,Description,Image\n")
+        cache_path = str(tmp_path / "watchlist.cache")
+        write_cache(cache_path, WATCHLISTS, CsvFingerprint.of_file(str(csv_path)))
+        mapped = load_cache(cache_path, CsvFingerprint.of_file(str(csv_path)))
+        assert set(mapped) == set(WATCHLISTS)
+        for name, watchlist in WATCHLISTS.items():
+            assert dict(mapped[name]) == watchlist
+            assert len(mapped[name]) == len(watchlist)
+        assert list(mapped['watchlist_ia']) == sorted(WATCHLISTS['watchlist_ia'])
+        assert 'ae1234' in mapped['watchlist_ia']
+        assert 'AE1234' not in mapped['watchlist_ia']
+        assert mapped['watchlist_rn'].get('N0000') is None
+        assert mapped['watchlist_tc'].get('H60') is None
+        assert sorted(entry['desc'] for entry in mapped['watchlist_ia'].unique_entries()) == \
+               ['Antonov AN-225 Mriya', 'Gov']
+        assert list(mapped['watchlist_tc'].unique_entries()) == []
+
+    def test_stale_cache(self, tmp_path):
+        csv_path = tmp_path / "watchlist.csv"
+        csv_path.write_text("Key,Type,Mil Only,Description,Image\n")
+        cache_path = str(tmp_path / "watchlist.cache")
+        write_cache(cache_path, WATCHLISTS, CsvFingerprint.of_file(str(csv_path)))
+        # touching the file without changing it keeps the cache valid, since the hash matches
+        os.utime(csv_path, ns=(0, 1_000_000_000))
+        assert load_cache(cache_path, CsvFingerprint.of_file(str(csv_path))) is not None
+        csv_path.write_text("Key,Type,Mil Only,Description,Image\nH60,TC,N,,\n")
+        assert load_cache(cache_path, CsvFingerprint.of_file(str(csv_path))) is None
+
+    def test_missing_or_corrupt_cache(self, tmp_path):
+        csv_path = tmp_path / "watchlist.csv"
+        csv_path.write_text("Key,Type,Mil Only,Description,Image\n")
+        fingerprint = CsvFingerprint.of_file(str(csv_path))
+        assert load_cache(str(tmp_path / "missing.cache"), fingerprint) is None
+        (tmp_path / "corrupt.cache").write_bytes(b'not a cache')
+        assert load_cache(str(tmp_path / "corrupt.cache"), fingerprint) is None
+
+    def test_spotter_uses_cache(self, generate_valid_adsb_config, tmp_path, caplog):
+        caplog.set_level(logging.INFO)
+        watchlist_path = str(tmp_path / "watchlist.csv")
+        shutil.copy(PATTERN_WATCHLIST, watchlist_path)
+        generate_valid_adsb_config['ADSB']['watchlist_cache'] = str(tmp_path / "watchlist.cache")
+        spotters = []
+        for _ in range(2):
+            spotters.append(airspotbot.adsbget.Spotter(config_parsed=generate_valid_adsb_config,
+                                                       watchlist_path=watchlist_path,
+                                                       image_dir=DEFAULT_IMAGE_DIRECTORY,
+                                                       user_agent=USER_AGENT))
+        parsed, mapped = spotters
+        assert "Loading compiled watchlist from" in caplog.text
+        assert isinstance(mapped.watchlist_ir, airspotbot.watchlist_cache.MappedWatchlist)
+        for attribute in airspotbot.adsbget.WATCHLIST_ATTRIBUTES:
+            assert dict(getattr(mapped, attribute)) == getattr(parsed, attribute)
+        for hex_code, reg, type_code in (('410000', 'N5', 'B738'), ('a00000', 'N12X', 'B738'),
+                                         ('a00000', 'G-ABCD', 'EC45'), ('f00000', 'NASA941', '')):
+            for military in (False, True):
+                parsed_match = parsed.rules.match(hex_code, reg, type_code, military, False)
+                mapped_match = mapped.rules.match(hex_code, reg, type_code, military, False)
+                assert (parsed_match and parsed_match.description) == \
+                       (mapped_match and mapped_match.description)